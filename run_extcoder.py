@@ -1,20 +1,20 @@
 import argparse
+import random
 from typing import Optional
 
-from bitstring import Bits, CreationError
-
 from stegano import textanalyser, wtdict, markov, extendedcoder
-from stegano.filehandler import prefix_filename, read_input_file, \
-    write_output_file
+from stegano.filehandler import prefix_filename, write_output_chunks, \
+    read_message_chunks, read_cover_chunks
 from stegano.markov import MarkovChain
+from stegano.pool import resolve_workers
 from stegano.wtdict import WordTypeDictionary
 
 DEFAULT_HEADER_LENGTH = 20
 
 
-def init_wt_dict(filename: str) -> WordTypeDictionary:
+def init_wt_dict(filename: str, word_types=None) -> WordTypeDictionary:
     try:
-        loaded = wtdict.load_dict(filename)
+        loaded = wtdict.load_dict(filename, word_types)
         if loaded is None:
             return WordTypeDictionary({})
         else:
@@ -57,6 +57,11 @@ parser.add_argument("--mappings", metavar="mappings", type=str,
                     help="filename of mappings list")
 parser.add_argument("--dictionary", metavar="dictionary", type=str,
                     help="filename of word-type dictionary")
+parser.add_argument("--format", metavar="format", type=str,
+                    choices=wtdict.DICT_FORMATS,
+                    help="file format of the saved word-type "
+                         "dictionary; defaults to the format of the "
+                         "existing file")
 parser.add_argument("--chain", metavar="chain", type=str,
                     help="filename of Markov chain")
 parser.add_argument("--encodeSpaces", metavar="encodeSpaces",
@@ -73,269 +78,350 @@ parser.add_argument("--output", metavar="output", type=str,
 parser.add_argument("--headerLength", metavar="headerLength",
                     type=int,
                     help="pre-shared length of cover text header")
+parser.add_argument("--framing", metavar="framing", type=str,
+                    choices=extendedcoder.FRAMINGS,
+                    help="how the length of the message is given in "
+                         "the cover text; \"fixed\" (default) for a "
+                         "header of the pre-shared length, or "
+                         "\"chunked\" for blocks of the message "
+                         "which each give their own length, or "
+                         "\"segmented\" for paragraphs which each "
+                         "encode part of the message in chunks")
+parser.add_argument("--workers", metavar="workers", type=int,
+                    default=1,
+                    help="the number of worker processes to encode "
+                         "with, for segmented framing, or to decode "
+                         "with")
+parser.add_argument("--seed", metavar="seed", type=int,
+                    help="seed for the random choices made while "
+                         "encoding, to make the cover text "
+                         "reproducible")
 parser.add_argument("--noOfStates", metavar="noOfStates", type=int,
                     help="the number of placeholder states to add "
                          "to the new Markov chain")
 
-args = parser.parse_args()
-
-operation: str = args.operation
-
-if operation.__eq__("addWordMappings"):
-    """
-    Add a list of mappings (word,bits) to a dictionary.
-    """
-    mappings_filename: str = prefix_filename(args.subfolder,
-                                             args.mappings)
-    dict_filename: str = args.dictionary
-    word_type: str = args.wordType
-    encode_spaces: Optional[bool] = args.encodeSpaces
-
-    if dict_filename is None:
-        raise ValueError(
-            "Filename for word-type dictionary was not provided.")
-    else:
-        dict_filename = prefix_filename(args.subfolder, dict_filename)
-    if word_type is None:
-        raise ValueError(
-            "Name of the word-type for new mappings was not "
-            "provided.")
-    if encode_spaces is None:
-        encode_spaces = True
-
-    if mappings_filename is None:
-        mapping_dict = textanalyser.TextAnalyser.read_mapping_dict(
-            encode_spaces=encode_spaces, delimiter=",")
-    else:
-        mapping_dict = textanalyser.TextAnalyser.read_mapping_dict(
-            mappings_filename=mappings_filename,
-            encode_spaces=encode_spaces, delimiter=",")
-    wt_dict = init_wt_dict(dict_filename)
-    wt_dict.append_word_type({word_type: mapping_dict})
-    print("Added {} mappings under word-type \"{}\"".format(
-        len(mapping_dict.mappings), word_type))
-    wtdict.save_dict(wt_dict, dict_filename)
-    print("Saved to {}".format(dict_filename))
-
-elif operation.__eq__("resetDict"):
-    dict_filename: str = args.dictionary
-
-    if dict_filename is None:
-        raise ValueError(
-            "Filename for word-type dictionary was not provided.")
-    else:
-        dict_filename = prefix_filename(args.subfolder, dict_filename)
-
-    wt_dict = WordTypeDictionary({})
-    print("Word-type dictionary is now empty.")
-    wtdict.save_dict(wt_dict, dict_filename)
-    print("Saved to {}".format(dict_filename))
-
-elif operation.__eq__("removeWordType"):
-    dict_filename: str = args.dictionary
-    word_type: str = args.wordType
-
-    if dict_filename is None:
-        raise ValueError(
-            "Filename for word-type dictionary was not provided.")
-    else:
-        dict_filename = prefix_filename(args.subfolder, dict_filename)
-    if word_type is None:
-        raise ValueError(
-            "Name of the word-type to remove was not provided.")
-    elif word_type.__eq__(""):
-        raise ValueError("Name of the word-type to remove was empty.")
-
-    wt_dict = init_wt_dict(dict_filename)
-    if wt_dict.wt_dict is None:
-        print("Given dictionary was empty.")
-        exit()
-    wt_dict.remove_word_type({word_type})
-    print(
-        "Removed word type \"{}\" from dictionary.".format(word_type))
-    wtdict.save_dict(wt_dict, dict_filename)
-    print("Saved to {}".format(dict_filename))
-
-elif operation.__eq__("createChain"):
-    """
-    Create a placeholder Markov chain and save to file.
-    """
-    chain_filename: str = args.chain
-    no_of_states: int = args.noOfStates
-
-    if chain_filename is None:
-        raise ValueError(
-            "Filename for Markov chain was not provided.")
-    else:
-        chain_filename = prefix_filename(args.subfolder,
-                                         chain_filename)
-    if no_of_states is None:
-        no_of_states = 2
-    elif no_of_states < 2:
-        raise ValueError(
-            "Number of states provided must be at least 2 ("
-            "including start state \"s0\").")
-    elif no_of_states > 100:
-        raise ValueError(
-            "Number of states provided cannot exceed 100.")
-
-    new_states = set()
-    for state_index in range(1, no_of_states):
-        new_states.add(("state_name" + str(state_index),
-                        "word_type" + str(state_index)))
-    markov_chain = MarkovChain(new_states)
-
-    from_state = "s0"
-    to_state = "state_name1"
-    transitions = {(from_state, to_state, 1)}
-    for state_index in range(1, no_of_states - 1):
-        from_state = "state_name" + str(state_index)
-        to_state = "state_name" + str(state_index + 1)
-        transitions.add((from_state, to_state, 1))
-    transitions.add((to_state, "s0", 1))
-    markov_chain.set_transitions(transitions)
-
-    markov.save_markov_chain(markov_chain, chain_filename)
-    print("Saved to {}.".format(chain_filename))
-
-elif operation.__eq__("resetChain"):
-    """
-    Create an empty Markov chain and save to file.
-    """
-    chain_filename: str = args.chain
-
-    if chain_filename is None:
-        raise ValueError(
-            "Filename for Markov chain was not provided.")
-    else:
-        chain_filename = prefix_filename(args.subfolder,
-                                         chain_filename)
-
-    markov_chain = MarkovChain(set())
-    print("Markov chain is now empty.")
-    markov.save_markov_chain(markov_chain, chain_filename)
-    print("Saved to {}.".format(chain_filename))
-
-elif operation.__eq__("encodeBits"):
-    """
-    Use a Markov chain and a corresponding dictionary of word-types 
-    to encode some bits into a cover text.
-    """
-    chain_filename: str = args.chain
-    dict_filename: str = args.dictionary
-    input_filename: str = args.input
-    output_filename: str = args.output
-    header_length: int = args.headerLength
-
-    if chain_filename is None:
-        raise ValueError(
-            "Filename for Markov chain was not provided.")
-    else:
-        chain_filename = prefix_filename(args.subfolder,
-                                         chain_filename)
-    if dict_filename is None:
-        raise ValueError(
-            "Filename for word-type dictionary was not provided.")
-    else:
-        dict_filename = prefix_filename(args.subfolder, dict_filename)
-    if input_filename is None:
-        raise ValueError("Filename for input was not provided.")
-    else:
-        input_filename = prefix_filename(args.subfolder,
-                                         input_filename)
-    if output_filename is None:
-        raise ValueError("Filename for output was not provided.")
-    else:
-        output_filename = prefix_filename(args.subfolder,
-                                          output_filename)
-    if header_length is None:
-        header_length = DEFAULT_HEADER_LENGTH
-    elif header_length < 1:
-        raise ValueError("Header length must be greater than 0.")
-
-    input_message = read_input_file(input_filename)
-    try:
-        message_bits = Bits(bin=input_message)
-    except CreationError:
-        raise ValueError("Provided input was not a valid bitstring.")
-    if message_bits.__eq__(Bits()):
-        raise ValueError("Provided input was empty.")
-
-    markov_chain = markov.load_markov_chain(chain_filename)
-    print("Markov chain loaded.")
-
-    wt_dict = init_wt_dict(dict_filename)
-    print("Word-type dictionary loaded.")
-
-    print("Encoding cover text with header length {}.".format(
-        header_length))
-    cover_text = extendedcoder.encode_message(markov_chain, wt_dict,
-                                              message_bits,
-                                              header_length)
-
-    write_output_file(output_filename, cover_text)
-    print("Cover text written to {}.".format(output_filename))
-
-elif operation.__eq__("decodeCover"):
-    """
-    Use a dictionary of word-types to decode aa cover text into the 
-    corresponding bit string.
-    """
-    dict_filename: str = args.dictionary
-    input_filename: str = args.input
-    output_filename: str = args.output
-    header_length: int = args.headerLength
-
-    if dict_filename is None:
-        raise ValueError(
-            "Filename for word-type dictionary was not provided.")
-    else:
-        dict_filename = prefix_filename(args.subfolder, dict_filename)
-    if input_filename is None:
-        raise ValueError("Filename for input was not provided.")
-    else:
-        input_filename = prefix_filename(args.subfolder,
-                                         input_filename)
-    if output_filename is None:
-        raise ValueError("Filename for output was not provided.")
-    else:
-        output_filename = prefix_filename(args.subfolder,
-                                          output_filename)
-    if header_length is None:
-        header_length = DEFAULT_HEADER_LENGTH
-    elif header_length < 1:
-        raise ValueError("Header length must be greater than 0.")
-
-    input_message = read_input_file(input_filename)
-
-    wt_dict = init_wt_dict(dict_filename)
-    print("Word-type dictionary loaded.")
-
-    print("Decoding cover text with header length {}.".format(
-        header_length))
-    message_bits = extendedcoder.decode_cover_text(wt_dict,
-                                                   input_message,
-                                                   header_length)
-
-    write_output_file(output_filename, message_bits.bin)
-    print("Decoded message written to {}.".format(output_filename))
-
-elif operation.__eq__("analyseChain"):
-    """
-    Load a Markov chain and print some statistics.
-    """
-    chain_filename: str = args.chain
-
-    if chain_filename is None:
-        raise ValueError(
-            "Filename for Markov chain was not provided.")
-    else:
-        chain_filename = prefix_filename(args.subfolder,
-                                         chain_filename)
-
-    markov_chain = markov.load_markov_chain(chain_filename)
-    print("Markov chain loaded.")
-
-    no_of_paths = markov.get_number_of_paths(markov_chain)
-    print_with_heading("{}".format(no_of_paths),
-                       "Number of paths through chain")
+
+def main():
+    args = parser.parse_args()
+
+    operation: str = args.operation
+    dict_format: Optional[str] = args.format
+    framing: str = args.framing
+    if framing is None:
+        framing = extendedcoder.FRAMING_FIXED
+
+    if operation.__eq__("addWordMappings"):
+        """
+        Add a list of mappings (word,bits) to a dictionary.
+        """
+        mappings_filename: str = prefix_filename(args.subfolder,
+                                                 args.mappings)
+        dict_filename: str = args.dictionary
+        word_type: str = args.wordType
+        encode_spaces: Optional[bool] = args.encodeSpaces
+
+        if dict_filename is None:
+            raise ValueError(
+                "Filename for word-type dictionary was not provided.")
+        else:
+            dict_filename = prefix_filename(args.subfolder, dict_filename)
+        if word_type is None:
+            raise ValueError(
+                "Name of the word-type for new mappings was not "
+                "provided.")
+        if encode_spaces is None:
+            encode_spaces = True
+
+        if mappings_filename is None:
+            mapping_dict = textanalyser.TextAnalyser.read_mapping_dict(
+                encode_spaces=encode_spaces, delimiter=",")
+        else:
+            mapping_dict = textanalyser.TextAnalyser.read_mapping_dict(
+                mappings_filename=mappings_filename,
+                encode_spaces=encode_spaces, delimiter=",")
+        wt_dict = init_wt_dict(dict_filename)
+        wt_dict.append_word_type({word_type: mapping_dict})
+        print("Added {} mappings under word-type \"{}\"".format(
+            len(mapping_dict.mappings), word_type))
+        if dict_format is None:
+            dict_format = wtdict.get_dict_format(dict_filename)
+        wtdict.save_dict(wt_dict, dict_filename, dict_format)
+        print("Saved to {}".format(dict_filename))
+
+    elif operation.__eq__("resetDict"):
+        dict_filename: str = args.dictionary
+
+        if dict_filename is None:
+            raise ValueError(
+                "Filename for word-type dictionary was not provided.")
+        else:
+            dict_filename = prefix_filename(args.subfolder, dict_filename)
+
+        wt_dict = WordTypeDictionary({})
+        print("Word-type dictionary is now empty.")
+        if dict_format is None:
+            dict_format = wtdict.get_dict_format(dict_filename)
+        wtdict.save_dict(wt_dict, dict_filename, dict_format)
+        print("Saved to {}".format(dict_filename))
+
+    elif operation.__eq__("removeWordType"):
+        dict_filename: str = args.dictionary
+        word_type: str = args.wordType
+
+        if dict_filename is None:
+            raise ValueError(
+                "Filename for word-type dictionary was not provided.")
+        else:
+            dict_filename = prefix_filename(args.subfolder, dict_filename)
+        if word_type is None:
+            raise ValueError(
+                "Name of the word-type to remove was not provided.")
+        elif word_type.__eq__(""):
+            raise ValueError("Name of the word-type to remove was empty.")
+
+        wt_dict = init_wt_dict(dict_filename)
+        if wt_dict.wt_dict is None:
+            print("Given dictionary was empty.")
+            exit()
+        wt_dict.remove_word_type({word_type})
+        print(
+            "Removed word type \"{}\" from dictionary.".format(word_type))
+        if dict_format is None:
+            dict_format = wtdict.get_dict_format(dict_filename)
+        wtdict.save_dict(wt_dict, dict_filename, dict_format)
+        print("Saved to {}".format(dict_filename))
+
+    elif operation.__eq__("createChain"):
+        """
+        Create a placeholder Markov chain and save to file.
+        """
+        chain_filename: str = args.chain
+        no_of_states: int = args.noOfStates
+
+        if chain_filename is None:
+            raise ValueError(
+                "Filename for Markov chain was not provided.")
+        else:
+            chain_filename = prefix_filename(args.subfolder,
+                                             chain_filename)
+        if no_of_states is None:
+            no_of_states = 2
+        elif no_of_states < 2:
+            raise ValueError(
+                "Number of states provided must be at least 2 ("
+                "including start state \"s0\").")
+        elif no_of_states > 100:
+            raise ValueError(
+                "Number of states provided cannot exceed 100.")
+
+        new_states = set()
+        for state_index in range(1, no_of_states):
+            new_states.add(("state_name" + str(state_index),
+                            "word_type" + str(state_index)))
+        markov_chain = MarkovChain(new_states)
+
+        from_state = "s0"
+        to_state = "state_name1"
+        transitions = {(from_state, to_state, 1)}
+        for state_index in range(1, no_of_states - 1):
+            from_state = "state_name" + str(state_index)
+            to_state = "state_name" + str(state_index + 1)
+            transitions.add((from_state, to_state, 1))
+        transitions.add((to_state, "s0", 1))
+        markov_chain.set_transitions(transitions)
+
+        markov.save_markov_chain(markov_chain, chain_filename)
+        print("Saved to {}.".format(chain_filename))
+
+    elif operation.__eq__("resetChain"):
+        """
+        Create an empty Markov chain and save to file.
+        """
+        chain_filename: str = args.chain
+
+        if chain_filename is None:
+            raise ValueError(
+                "Filename for Markov chain was not provided.")
+        else:
+            chain_filename = prefix_filename(args.subfolder,
+                                             chain_filename)
+
+        markov_chain = MarkovChain(set())
+        print("Markov chain is now empty.")
+        markov.save_markov_chain(markov_chain, chain_filename)
+        print("Saved to {}.".format(chain_filename))
+
+    elif operation.__eq__("encodeBits"):
+        """
+        Use a Markov chain and a corresponding dictionary of word-types 
+        to encode some bits into a cover text.
+        """
+        chain_filename: str = args.chain
+        dict_filename: str = args.dictionary
+        input_filename: str = args.input
+        output_filename: str = args.output
+        header_length: int = args.headerLength
+        seed: Optional[int] = args.seed
+        workers = resolve_workers(args.workers)
+
+        if chain_filename is None:
+            raise ValueError(
+                "Filename for Markov chain was not provided.")
+        else:
+            chain_filename = prefix_filename(args.subfolder,
+                                             chain_filename)
+        if dict_filename is None:
+            raise ValueError(
+                "Filename for word-type dictionary was not provided.")
+        else:
+            dict_filename = prefix_filename(args.subfolder, dict_filename)
+        if input_filename is None:
+            raise ValueError("Filename for input was not provided.")
+        else:
+            input_filename = prefix_filename(args.subfolder,
+                                             input_filename)
+        if output_filename is None:
+            raise ValueError("Filename for output was not provided.")
+        else:
+            output_filename = prefix_filename(args.subfolder,
+                                              output_filename)
+        if header_length is None:
+            header_length = DEFAULT_HEADER_LENGTH
+        elif header_length < 1:
+            raise ValueError("Header length must be greater than 0.")
+        if workers > 1 and framing != extendedcoder.FRAMING_SEGMENTED:
+            raise ValueError(
+                "More than one worker can only be used with segmented "
+                "framing.")
+
+        # With fixed framing, the message is read once to find its length
+        # for the header, and then again while encoding
+        message_length = None
+        if framing == extendedcoder.FRAMING_FIXED:
+            message_length = sum(
+                len(bits) for bits in read_message_chunks(input_filename))
+
+        markov_chain = markov.load_markov_chain(chain_filename)
+        print("Markov chain loaded.")
+
+        # Only the word-types referenced by the chain are needed
+        wt_dict = init_wt_dict(dict_filename,
+                               set(markov_chain.wt_refs.values()))
+        print("Word-type dictionary loaded.")
+
+        if framing == extendedcoder.FRAMING_FIXED:
+            print("Encoding cover text with header length {}.".format(
+                header_length))
+        else:
+            print("Encoding cover text with {} framing.".format(framing))
+        rng = None if seed is None else random.Random(seed)
+        if framing == extendedcoder.FRAMING_SEGMENTED:
+            sentences = extendedcoder.encode_message_segments(
+                markov_chain, wt_dict, read_message_chunks(input_filename),
+                rng, workers)
+        else:
+            sentences = extendedcoder.encode_message_stream(
+                markov_chain, wt_dict, read_message_chunks(input_filename),
+                message_length, header_length, rng, framing=framing)
+
+        write_output_chunks(output_filename, sentences)
+        print("Cover text written to {}.".format(output_filename))
+
+    elif operation.__eq__("decodeCover"):
+        """
+        Use a dictionary of word-types to decode aa cover text into the 
+        corresponding bit string.
+        """
+        dict_filename: str = args.dictionary
+        input_filename: str = args.input
+        output_filename: str = args.output
+        header_length: int = args.headerLength
+
+        if dict_filename is None:
+            raise ValueError(
+                "Filename for word-type dictionary was not provided.")
+        else:
+            dict_filename = prefix_filename(args.subfolder, dict_filename)
+        if input_filename is None:
+            raise ValueError("Filename for input was not provided.")
+        else:
+            input_filename = prefix_filename(args.subfolder,
+                                             input_filename)
+        if output_filename is None:
+            raise ValueError("Filename for output was not provided.")
+        else:
+            output_filename = prefix_filename(args.subfolder,
+                                              output_filename)
+        if header_length is None:
+            header_length = DEFAULT_HEADER_LENGTH
+        elif header_length < 1:
+            raise ValueError("Header length must be greater than 0.")
+        workers = resolve_workers(args.workers)
+
+        wt_dict = init_wt_dict(dict_filename)
+        print("Word-type dictionary loaded.")
+
+        if framing == extendedcoder.FRAMING_FIXED:
+            print("Decoding cover text with header length {}.".format(
+                header_length))
+        else:
+            print("Decoding cover text with {} framing.".format(framing))
+        cover_chunks = read_cover_chunks(input_filename)
+        if workers > 1:
+            print("Decoding with {} worker processes.".format(workers))
+            message = extendedcoder.decode_cover_text_parallel(
+                wt_dict, cover_chunks, header_length, framing, workers)
+        else:
+            message = extendedcoder.decode_cover_text_stream(
+                wt_dict, cover_chunks, header_length, framing=framing)
+        write_output_chunks(output_filename,
+                            (bits.bin for bits in message))
+        print("Decoded message written to {}.".format(output_filename))
+
+    elif operation.__eq__("analyseChain"):
+        """
+        Load a Markov chain and print some statistics.
+        """
+        chain_filename: str = args.chain
+        dict_filename: str = args.dictionary
+
+        if chain_filename is None:
+            raise ValueError(
+                "Filename for Markov chain was not provided.")
+        else:
+            chain_filename = prefix_filename(args.subfolder,
+                                             chain_filename)
+
+        markov_chain = markov.load_markov_chain(chain_filename)
+        print("Markov chain loaded.")
+
+        no_of_paths = markov.get_number_of_paths(markov_chain)
+        print_with_heading("{}".format(no_of_paths),
+                           "Number of paths through chain")
+
+        if dict_filename is None:
+            expected_words = markov.get_expected_total(markov_chain,
+                                                       lambda state: 1)
+            print_with_heading("{}".format(expected_words),
+                               "Expected words per sentence")
+        else:
+            dict_filename = prefix_filename(args.subfolder, dict_filename)
+            wt_dict = init_wt_dict(dict_filename,
+                                   set(markov_chain.wt_refs.values()))
+            print("Word-type dictionary loaded.")
+
+            expected_words, expected_bits, expected_chars = \
+                extendedcoder.get_expected_sentence_statistics(
+                    markov_chain, wt_dict)
+            print_with_heading("{}".format(expected_words),
+                               "Expected words per sentence")
+            print_with_heading("{}".format(expected_bits),
+                               "Expected bits encoded per sentence")
+            print_with_heading("{}".format(expected_chars),
+                               "Expected characters per sentence")
+            print_with_heading("{}".format(expected_bits / expected_chars),
+                               "Expected bits encoded per character")
+
+
+if __name__ == "__main__":
+    main()
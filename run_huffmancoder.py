@@ -1,10 +1,9 @@
 import argparse
 
-from bitstring import Bits, CreationError
-
 from stegano import huffman
-from stegano.filehandler import prefix_filename, read_input_file, \
-    write_output_file
+from stegano.filehandler import prefix_filename, write_output_file, \
+    write_output_chunks, read_message_chunks, read_cover_chunks
+from stegano.pool import resolve_workers
 
 
 def print_with_heading(message: str, heading: str):
@@ -35,180 +34,238 @@ parser.add_argument("--output", metavar="output", type=str,
                     help="filename of output")
 parser.add_argument("--symbolLen", metavar="symbolLen", type=int,
                     help="symbol length of cover text")
-
-args = parser.parse_args()
-
-operation: str = args.operation
-
-if operation.__eq__("createTree"):
-    """
-    Create a tree from a word analysis.
-    """
-    analysis_filename: str = prefix_filename(args.subfolder,
-                                             args.analysis)
-    tree_filename: str = args.tree
-
-    if tree_filename is None:
-        raise ValueError(
-            "Filename for Huffman tree was not provided.")
-    else:
-        tree_filename = prefix_filename(args.subfolder, tree_filename)
-
-    if analysis_filename is None:
-        raise ValueError(
-            "Filename for frequency analysis was not provided.")
-
-    tree = huffman.create_from_analysis(analysis_filename)
-    huffman.allocate_path_bits(tree)
-    print("Huffman tree created.")
-
-    huffman.save_tree(tree[1], tree_filename)
-    print("Saved to {}.".format(tree_filename))
-
-elif operation.__eq__("encodeBits"):
-    """
-    Use a Huffman tree to encode some bits into a cover text.
-    """
-    tree_filename: str = args.tree
-    input_filename: str = args.input
-    output_filename: str = args.output
-
-    if tree_filename is None:
-        raise ValueError(
-            "Filename for Huffman tree was not provided.")
-    else:
-        tree_filename = prefix_filename(args.subfolder, tree_filename)
-    if input_filename is None:
-        raise ValueError("Filename for input was not provided.")
-    else:
-        input_filename = prefix_filename(args.subfolder,
-                                         input_filename)
-    if output_filename is None:
-        raise ValueError("Filename for output was not provided.")
-    else:
-        output_filename = prefix_filename(args.subfolder,
-                                          output_filename)
-
-    input_message = read_input_file(input_filename)
-    try:
-        message_bits = Bits(bin=input_message)
-    except CreationError:
-        raise ValueError("Provided input was not a valid bitstring.")
-    if message_bits.__eq__(Bits()):
-        raise ValueError("Provided input was empty.")
-
-    huffman_tree = huffman.load_tree(tree_filename)
-    if huffman_tree is None or huffman_tree[1] is None:
-        print("Given Huffman tree was empty.")
-        exit()
-    print("Huffman tree loaded.")
-
-    _, cover_text = huffman.encode_bits_as_strings(huffman_tree[1],
-                                                   message_bits)
-    write_output_file(output_filename, cover_text)
-    print("Cover text written to {}.".format(output_filename))
-
-elif operation.__eq__("decodeCover"):
-    """
-    Decode a cover text into the original text using the same 
-    Huffman tree it was encoded with.
-    """
-    tree_filename: str = args.tree
-    input_filename: str = args.input
-    output_filename: str = args.output
-    symbol_length: int = args.symbolLen
-
-    if tree_filename is None:
-        raise ValueError(
-            "Filename for Huffman tree was not provided.")
-    else:
-        tree_filename = prefix_filename(args.subfolder, tree_filename)
-    if input_filename is None:
-        raise ValueError("Filename for input was not provided.")
-    else:
-        input_filename = prefix_filename(args.subfolder,
-                                         input_filename)
-    if output_filename is None:
-        raise ValueError("Filename for output was not provided.")
-    else:
-        output_filename = prefix_filename(args.subfolder,
-                                          output_filename)
-    if symbol_length is None or symbol_length < 1:
-        raise ValueError("Symbol length provided was not valid.")
-
-    input_cover = read_input_file(input_filename)
-    if input_cover.__eq__(""):
-        raise ValueError("Provided input was empty.")
-
-    huffman_tree = huffman.load_tree(tree_filename)
-    print("Huffman tree loaded.")
-
-    if not huffman.has_given_symbol_length(huffman_tree,
-                                           symbol_length):
-        raise ValueError(
-            "Given Huffman tree did not contain symbols matching "
-            "the given symbol length.")
-
-    message_bits = huffman.encode_string_as_bits(huffman_tree[1],
-                                                 input_cover,
-                                                 symbol_length)
-    write_output_file(output_filename, message_bits.bin)
-    print("Secret message written to {}.".format(output_filename))
-
-elif operation.__eq__("exportMappings"):
-    """
-    Load a Huffman tree, search it for all word-bit mappings, 
-    and export them as a list.
-    """
-    tree_filename: str = args.tree
-    output_filename: str = args.output
-
-    if tree_filename is None:
-        raise ValueError(
-            "Filename for Huffman tree was not provided.")
-    else:
-        tree_filename = prefix_filename(args.subfolder, tree_filename)
-    if output_filename is None:
-        raise ValueError("Filename for output was not provided.")
-    else:
-        output_filename = prefix_filename(args.subfolder,
-                                          output_filename)
-
-    huffman_tree = huffman.load_tree(tree_filename)
-    print("Huffman tree loaded.")
-
-    symbol_list = huffman.tree_to_symbols(huffman_tree)
-    mappings = sorted(((x.lower(), z) for x, y, z in symbol_list),
-                      key=lambda m: (m[1].bin.__len__(), m[1].uint))
-    output = ""
-    for value, bits in mappings:
-        output = output + value + "," + bits.bin + "\n"
-    write_output_file(output_filename, output)
-    print("Mappings written to {}.".format(output_filename))
-
-elif operation.__eq__("analyseTree"):
-    """
-    Load a Huffman tree and print some statistics.
-    """
-    tree_filename: str = args.tree
-
-    if tree_filename is None:
-        raise ValueError(
-            "Filename for Huffman tree was not provided.")
-    else:
-        tree_filename = prefix_filename(args.subfolder, tree_filename)
-
-    huffman_tree = huffman.load_tree(tree_filename)
-    if huffman_tree is None or huffman_tree[1] is None:
-        raise ValueError("Provided Huffman tree was empty.")
-    print("Huffman tree loaded.")
-
-    path_codes = huffman.get_tree_leaf_codes(huffman_tree)
-    print_with_heading("{}".format(len(path_codes)),
-                       "Number of Symbols in Tree")
-    expected_length = huffman.get_set_expected_length(path_codes)
-    print_with_heading("{}".format(expected_length),
-                       "Expected Length of Path Codes in Tree")
-    average_length = huffman.get_set_average_length(path_codes)
-    print_with_heading("{}".format(average_length),
-                       "Average Length of Path Codes in Tree")
+parser.add_argument("--format", metavar="format", type=str,
+                    choices=huffman.TREE_FORMATS,
+                    help="file format of the created Huffman tree")
+parser.add_argument("--presorted", action="store_true",
+                    help="frequency analysis is sorted by frequency")
+parser.add_argument("--maxCodeLen", metavar="maxCodeLen", type=int,
+                    help="maximum path code length of the created "
+                         "Huffman tree")
+parser.add_argument("--framing", metavar="framing", type=str,
+                    choices=huffman.FRAMINGS,
+                    help="how the message is split in the cover text; "
+                         "\"none\" (default) for a single stream of "
+                         "symbols, or \"chunked\" for independent "
+                         "blocks")
+parser.add_argument("--workers", metavar="workers", type=int,
+                    default=1,
+                    help="the number of worker processes to encode "
+                         "with, for chunked framing, or to decode "
+                         "with")
+
+
+def main():
+    args = parser.parse_args()
+
+    operation: str = args.operation
+    framing: str = args.framing
+    if framing is None:
+        framing = huffman.FRAMING_NONE
+
+    if operation.__eq__("createTree"):
+        """
+        Create a tree from a word analysis.
+        """
+        analysis_filename: str = prefix_filename(args.subfolder,
+                                                 args.analysis)
+        tree_filename: str = args.tree
+
+        if tree_filename is None:
+            raise ValueError(
+                "Filename for Huffman tree was not provided.")
+        else:
+            tree_filename = prefix_filename(args.subfolder, tree_filename)
+
+        if analysis_filename is None:
+            raise ValueError(
+                "Filename for frequency analysis was not provided.")
+
+        tree_format: str = args.format
+        if tree_format is None:
+            tree_format = huffman.TREE_FORMAT_JSON
+
+        max_code_length: int = args.maxCodeLen
+        if max_code_length is not None and max_code_length < 1:
+            raise ValueError("Maximum code length provided was not valid.")
+
+        tree = huffman.create_from_analysis(analysis_filename,
+                                            args.presorted)
+        if max_code_length is not None:
+            huffman.allocate_path_bits(tree)
+            unconstrained_length = huffman.get_set_expected_length(
+                huffman.get_tree_leaf_codes(tree))
+            tree = huffman.limit_tree_depth(tree, max_code_length)
+            huffman.allocate_path_bits(tree)
+            limited_length = huffman.get_set_expected_length(
+                huffman.get_tree_leaf_codes(tree))
+            print_with_heading("{}".format(unconstrained_length),
+                               "Expected Length of Unconstrained Path Codes")
+            print_with_heading("{}".format(limited_length),
+                               "Expected Length of Limited Path Codes")
+        huffman.allocate_path_bits(
+            tree, canonical=tree_format == huffman.TREE_FORMAT_CANONICAL)
+        print("Huffman tree created.")
+
+        huffman.save_tree(tree[1], tree_filename, tree_format)
+        print("Saved to {}.".format(tree_filename))
+
+    elif operation.__eq__("encodeBits"):
+        """
+        Use a Huffman tree to encode some bits into a cover text.
+        """
+        tree_filename: str = args.tree
+        input_filename: str = args.input
+        output_filename: str = args.output
+
+        if tree_filename is None:
+            raise ValueError(
+                "Filename for Huffman tree was not provided.")
+        else:
+            tree_filename = prefix_filename(args.subfolder, tree_filename)
+        if input_filename is None:
+            raise ValueError("Filename for input was not provided.")
+        else:
+            input_filename = prefix_filename(args.subfolder,
+                                             input_filename)
+        if output_filename is None:
+            raise ValueError("Filename for output was not provided.")
+        else:
+            output_filename = prefix_filename(args.subfolder,
+                                              output_filename)
+
+        workers = resolve_workers(args.workers)
+        if workers > 1 and framing != huffman.FRAMING_CHUNKED:
+            raise ValueError(
+                "More than one worker can only be used with chunked "
+                "framing.")
+
+        huffman_tree = huffman.load_tree(tree_filename)
+        if huffman_tree is None or huffman_tree[1] is None:
+            print("Given Huffman tree was empty.")
+            exit()
+        print("Huffman tree loaded.")
+
+        encoder = huffman.HuffmanEncoder(huffman_tree[1])
+        message_chunks = read_message_chunks(input_filename)
+        if framing == huffman.FRAMING_CHUNKED:
+            if workers > 1:
+                print("Encoding with {} worker processes.".format(workers))
+            cover_text = encoder.encode_chunked(message_chunks, workers)
+        else:
+            cover_text = encoder.encode_stream(message_chunks)
+        write_output_chunks(output_filename, cover_text)
+        print("Cover text written to {}.".format(output_filename))
+
+    elif operation.__eq__("decodeCover"):
+        """
+        Decode a cover text into the original text using the same 
+        Huffman tree it was encoded with.
+        """
+        tree_filename: str = args.tree
+        input_filename: str = args.input
+        output_filename: str = args.output
+        symbol_length: int = args.symbolLen
+
+        if tree_filename is None:
+            raise ValueError(
+                "Filename for Huffman tree was not provided.")
+        else:
+            tree_filename = prefix_filename(args.subfolder, tree_filename)
+        if input_filename is None:
+            raise ValueError("Filename for input was not provided.")
+        else:
+            input_filename = prefix_filename(args.subfolder,
+                                             input_filename)
+        if output_filename is None:
+            raise ValueError("Filename for output was not provided.")
+        else:
+            output_filename = prefix_filename(args.subfolder,
+                                              output_filename)
+        if symbol_length is None or symbol_length < 1:
+            raise ValueError("Symbol length provided was not valid.")
+        workers = resolve_workers(args.workers)
+
+        huffman_tree = huffman.load_tree(tree_filename)
+        print("Huffman tree loaded.")
+
+        if not huffman.has_given_symbol_length(huffman_tree,
+                                               symbol_length):
+            raise ValueError(
+                "Given Huffman tree did not contain symbols matching "
+                "the given symbol length.")
+
+        decoder = huffman.HuffmanDecoder(huffman_tree[1], symbol_length)
+        cover_chunks = read_cover_chunks(input_filename)
+        if workers > 1:
+            print("Decoding with {} worker processes.".format(workers))
+        if framing == huffman.FRAMING_CHUNKED:
+            message = decoder.decode_chunked(cover_chunks, workers)
+        elif workers > 1:
+            message = decoder.decode_parallel(cover_chunks, workers)
+        else:
+            message = decoder.decode_stream(cover_chunks)
+        write_output_chunks(output_filename,
+                            (bits.bin for bits in message))
+        print("Secret message written to {}.".format(output_filename))
+
+    elif operation.__eq__("exportMappings"):
+        """
+        Load a Huffman tree, search it for all word-bit mappings, 
+        and export them as a list.
+        """
+        tree_filename: str = args.tree
+        output_filename: str = args.output
+
+        if tree_filename is None:
+            raise ValueError(
+                "Filename for Huffman tree was not provided.")
+        else:
+            tree_filename = prefix_filename(args.subfolder, tree_filename)
+        if output_filename is None:
+            raise ValueError("Filename for output was not provided.")
+        else:
+            output_filename = prefix_filename(args.subfolder,
+                                              output_filename)
+
+        huffman_tree = huffman.load_tree(tree_filename)
+        print("Huffman tree loaded.")
+
+        symbol_list = huffman.tree_to_symbols(huffman_tree)
+        mappings = sorted(((x.lower(), z) for x, y, z in symbol_list),
+                          key=lambda m: (m[1].bin.__len__(), m[1].uint))
+        output = "".join(value + "," + bits.bin + "\n"
+                         for value, bits in mappings)
+        write_output_file(output_filename, output)
+        print("Mappings written to {}.".format(output_filename))
+
+    elif operation.__eq__("analyseTree"):
+        """
+        Load a Huffman tree and print some statistics.
+        """
+        tree_filename: str = args.tree
+
+        if tree_filename is None:
+            raise ValueError(
+                "Filename for Huffman tree was not provided.")
+        else:
+            tree_filename = prefix_filename(args.subfolder, tree_filename)
+
+        huffman_tree = huffman.load_tree(tree_filename)
+        if huffman_tree is None or huffman_tree[1] is None:
+            raise ValueError("Provided Huffman tree was empty.")
+        print("Huffman tree loaded.")
+
+        path_codes = huffman.get_tree_leaf_codes(huffman_tree)
+        print_with_heading("{}".format(len(path_codes)),
+                           "Number of Symbols in Tree")
+        expected_length = huffman.get_set_expected_length(path_codes)
+        print_with_heading("{}".format(expected_length),
+                           "Expected Length of Path Codes in Tree")
+        average_length = huffman.get_set_average_length(path_codes)
+        print_with_heading("{}".format(average_length),
+                           "Average Length of Path Codes in Tree")
+
+
+if __name__ == "__main__":
+    main()
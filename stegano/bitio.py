@@ -0,0 +1,316 @@
+import sys
+from array import array
+from typing import Union, Iterable, Iterator, BinaryIO, TextIO, \
+    Tuple, Type
+
+from bitstring import Bits
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+def int_to_bits(value: int, length: int) -> Bits:
+    """
+    :param value: bits as an unsigned integer
+    :param length: the number of bits, which may be 0
+    :return: the bits as Bits
+    """
+    if length == 0:
+        return Bits()
+    return Bits(uint=value, length=length)
+
+
+def read_array(buffer, position: int, typecode: str, count: int,
+               error_type: Type[Exception] = ValueError) -> \
+        Tuple[Union[memoryview, array], int]:
+    """
+    View an array of little-endian integers in the given buffer,
+    without copying it where the platform allows.
+
+    :param buffer: the buffer, such as a memory-mapped file
+    :param position: the offset of the array in the buffer, in bytes
+    :param typecode: the array typecode of the integers
+    :param count: the number of integers
+    :param error_type: the type of exception to raise if the buffer
+    ends before the array does
+    :return: a tuple of the array and the position after its end
+    """
+    item_size = array(typecode).itemsize
+    end = position + item_size * count
+    if end > len(buffer):
+        raise error_type("The binary file was truncated.")
+    if sys.byteorder == "little":
+        return memoryview(buffer)[position:end].cast(typecode), end
+    values = array(typecode, bytes(buffer[position:end]))
+    values.byteswap()
+    return values, end
+
+
+class BitReader:
+    """
+    A cursor over a sequence of bits, stored as bytes.
+
+    Reading moves the cursor without copying or slicing the
+    underlying data, and more bits can be appended with feed, so the
+    same reader can consume a stream chunk by chunk.
+    """
+
+    def __init__(self, data: BytesLike = b"", bit_length: int = None):
+        """
+        :param data: the bits to read, packed into bytes
+        :param bit_length: the number of bits of data to read, if not
+        all of them
+        """
+        self._data = bytearray()
+        self.bit_length = 0
+        self.position = 0
+        self.feed(data, bit_length)
+
+    @classmethod
+    def from_bits(cls, bits: Bits) -> "BitReader":
+        """
+        :param bits: the bits to read
+        :return: a reader over the given bits
+        """
+        return cls(bits.tobytes(), len(bits))
+
+    def remaining(self) -> int:
+        """
+        :return: the number of bits after the cursor
+        """
+        return self.bit_length - self.position
+
+    def feed(self, data: Union[BytesLike, Bits], bit_length: int = None):
+        """
+        Append more bits to the end of the reader. Whole bytes that
+        have already been read are discarded.
+
+        :param data: the bits to append, either as Bits or packed into
+        bytes
+        :param bit_length: the number of bits of data to append, if
+        not all of them
+        """
+        if isinstance(data, Bits):
+            data, bit_length = data.tobytes(), len(data)
+        if bit_length is None:
+            bit_length = len(data) << 3
+        elif bit_length > len(data) << 3 or bit_length < 0:
+            raise ValueError("Bit length was out of range of the data.")
+        data = bytes(data[:(bit_length + 7) >> 3])
+        # Bits past the end must be 0, so that peeking past the end
+        # reads as padding
+        if bit_length & 7:
+            data = data[:-1] + bytes(
+                [data[-1] & (0xFF << (8 - (bit_length & 7))) & 0xFF])
+
+        consumed = self.position >> 3
+        if consumed:
+            del self._data[:consumed]
+            self.position -= consumed << 3
+            self.bit_length -= consumed << 3
+
+        tail_length = self.bit_length & 7
+        if tail_length == 0:
+            self._data += data
+        elif data:
+            # Realign the new bits after the partial last byte
+            tail = self._data.pop() >> (8 - tail_length)
+            combined = (tail << (len(data) << 3)) | \
+                int.from_bytes(data, "big")
+            combined_length = tail_length + (len(data) << 3)
+            padding_length = -combined_length % 8
+            self._data += (combined << padding_length).to_bytes(
+                (combined_length + padding_length) >> 3, "big")
+        self.bit_length += bit_length
+        # Realigning may leave a byte of padding past the end
+        del self._data[(self.bit_length + 7) >> 3:]
+
+    def peek(self, count: int, offset=0) -> int:
+        """
+        Read bits after the cursor, without moving it. Any bits past
+        the end of the reader are read as 0.
+
+        :param count: the number of bits to read
+        :param offset: the number of bits to skip after the cursor
+        :return: the bits as an unsigned integer
+        """
+        start = self.position + offset
+        end = start + count
+        last_byte = (end + 7) >> 3
+        data = self._data
+        value = int.from_bytes(data[start >> 3:last_byte], "big")
+        if last_byte > len(data):
+            value <<= (last_byte - max(len(data), start >> 3)) << 3
+        return (value >> ((last_byte << 3) - end)) & ((1 << count) - 1)
+
+    def read(self, count: int) -> int:
+        """
+        Read bits after the cursor, and move the cursor past them.
+
+        :param count: the number of bits to read
+        :return: the bits as an unsigned integer
+        """
+        if count > self.remaining():
+            raise ValueError(
+                "Cannot read {} bits with only {} remaining.".format(
+                    count, self.remaining()))
+        value = self.peek(count)
+        self.position += count
+        return value
+
+    def skip(self, count: int):
+        """
+        Move the cursor forward, past at most all remaining bits.
+
+        :param count: the number of bits to skip
+        """
+        self.position = min(self.position + count, self.bit_length)
+
+    def to_bits(self) -> Bits:
+        """
+        :return: the bits after the cursor
+        """
+        return Bits(bytes=bytes(self._data), length=self.remaining(),
+                    offset=self.position)
+
+
+class BitWriter:
+    """
+    An append-only sequence of bits. Complete bytes are kept in a
+    bytearray, and the bits of the last incomplete byte in a small
+    integer, so that writing never copies what was already written.
+    """
+
+    def __init__(self):
+        self._output = bytearray()
+        self._buffer = 0
+        self._buffer_length = 0
+        self.bit_length = 0
+
+    def __len__(self):
+        return self.bit_length
+
+    def write(self, value: int, length: int):
+        """
+        Append the given number of bits.
+
+        :param value: the bits as an unsigned integer
+        :param length: the number of bits to append
+        """
+        buffer = (self._buffer << length) | value
+        buffer_length = self._buffer_length + length
+        self.bit_length += length
+        if buffer_length >= 64:
+            whole_bytes = buffer_length >> 3
+            buffer_length &= 7
+            self._output += (buffer >> buffer_length).to_bytes(
+                whole_bytes, "big")
+            buffer &= (1 << buffer_length) - 1
+        self._buffer = buffer
+        self._buffer_length = buffer_length
+
+    def write_bits(self, bits: Bits):
+        """
+        Append the given bits.
+
+        :param bits: the bits to append
+        """
+        if len(bits) > 0:
+            self.write(bits.uint, len(bits))
+
+    def flush(self) -> bytes:
+        """
+        Remove every complete byte written so far.
+
+        :return: the complete bytes, in the order they were written
+        """
+        whole_bytes = self._buffer_length >> 3
+        if whole_bytes:
+            self._buffer_length &= 7
+            self._output += (self._buffer >> self._buffer_length) \
+                .to_bytes(whole_bytes, "big")
+            self._buffer &= (1 << self._buffer_length) - 1
+        output = bytes(self._output)
+        self._output.clear()
+        return output
+
+    def to_bits(self) -> Bits:
+        """
+        :return: every bit written and not yet flushed
+        """
+        padding_length = -self._buffer_length % 8
+        tail = (self._buffer << padding_length).to_bytes(
+            (self._buffer_length + padding_length) >> 3, "big")
+        return Bits(bytes=bytes(self._output) + tail,
+                    length=(len(self._output) << 3) + self._buffer_length)
+
+
+def read_chunks(source: Union[BinaryIO, TextIO, Iterable],
+                chunk_size: int) -> Iterator:
+    """
+    Iterate over the chunks of a file object, or of any other iterable
+    of chunks.
+
+    :param source: a binary or text file object, or an iterable of
+    chunks
+    :param chunk_size: the number of bytes or characters to read from
+    a file object at a time
+    :return: an iterator over the chunks
+    """
+    if hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        yield from source
+
+
+def split_bits(chunks: Iterable[Union[Bits, BytesLike]],
+               length: int) -> Iterator[Bits]:
+    """
+    Split a stream of bits into pieces of the given length, and a
+    shorter last piece.
+
+    :param chunks: an iterable of Bits or bytes
+    :param length: the number of bits in each piece but the last
+    :return: an iterator over the pieces
+    """
+    reader = BitReader()
+    for chunk in chunks:
+        reader.feed(chunk)
+        while reader.remaining() >= length:
+            yield int_to_bits(reader.read(length), length)
+    if reader.remaining() > 0:
+        yield reader.to_bits()
+
+
+def align_bits(pieces: Iterable[Bits]) -> Iterator[Bits]:
+    """
+    Join consecutive pieces of bits, yielding every complete byte as
+    soon as it is available, and any incomplete byte last.
+
+    :param pieces: an iterable of Bits
+    :return: an iterator over the same bits, in whole bytes but the
+    last
+    """
+    writer = BitWriter()
+    for bits in pieces:
+        writer.write_bits(bits)
+        output = writer.flush()
+        if output:
+            yield Bits(bytes=output)
+    remainder = writer.to_bits()
+    if len(remainder) > 0:
+        yield remainder
+
+
+def join_bits(pieces: Iterable[Bits]) -> Bits:
+    """
+    :param pieces: an iterable of Bits
+    :return: the pieces joined into one Bits
+    """
+    writer = BitWriter()
+    for bits in pieces:
+        writer.write_bits(bits)
+    return writer.to_bits()
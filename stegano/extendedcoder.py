@@ -1,13 +1,45 @@
 import random
+import re
+from abc import ABC, abstractmethod
 from functools import reduce
-from typing import List, Tuple
+from itertools import chain as chain_iterables
+from typing import List, Tuple, Union, Iterable, Iterator, BinaryIO, \
+    TextIO, Optional
 
 from bitstring import Bits
 
-from stegano.markov import MarkovChain, START_STATE_LABEL
-from stegano.wtdict import WordTypeDictionary, MappingDictionary
+from stegano.bitio import BitReader, BitWriter, int_to_bits, read_chunks, split_bits, align_bits, \
+    join_bits
+from stegano.markov import MarkovChain, ChainWalker, START_STATE_ID, \
+    get_expected_totals
+from stegano.pool import map_in_order, resolve_workers
+from stegano.wtdict import WordTypeDictionary, MappingDictionary, \
+    WordAutomaton
 
 DEFAULT_HEADER_LENGTH = 20
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+FRAMING_FIXED = "fixed"
+FRAMING_CHUNKED = "chunked"
+FRAMING_SEGMENTED = "segmented"
+FRAMINGS = [FRAMING_FIXED, FRAMING_CHUNKED, FRAMING_SEGMENTED]
+# In chunked framing, the message is sent in blocks of BLOCK_LENGTH bits,
+# each after a header of its length, and ends with a header of length 0
+BLOCK_HEADER_LENGTH = 16
+BLOCK_LENGTH = 1 << 12
+# In segmented framing, the message is split into segments of
+# DEFAULT_SEGMENT_LENGTH bits, each encoded separately with chunked
+# framing, and the cover text of each is a paragraph
+DEFAULT_SEGMENT_LENGTH = 1 << 16
+SEGMENT_SEPARATOR = "\n\n"
+# The number of characters of cover text in each partition decoded by
+# a worker process
+DEFAULT_PARTITION_SIZE = 1 << 18
+
+BitSource = Union[BinaryIO, Iterable[Union[Bits, bytes]]]
+TextSource = Union[TextIO, Iterable[str]]
+
+_WHITESPACE = re.compile(r"\s*")
 
 
 class ExtendedCoderError(Exception):
@@ -16,61 +48,575 @@ class ExtendedCoderError(Exception):
 
 
 def encode_message(chain: MarkovChain, wt_dict: WordTypeDictionary, bits: Bits,
-                   header_length=DEFAULT_HEADER_LENGTH
-                   ) -> str:
+                   header_length=DEFAULT_HEADER_LENGTH, rng: random.Random = None,
+                   framing=FRAMING_FIXED) -> str:
     """
     Given a header length, a secret message as bits, a Markov chain, and a word-type dictionary, encode a cover text
     including a header which contains the length of the message.
-    The message may be no more than (2^header_length) bits long.
+    With fixed framing, the message may be no more than (2^header_length) bits long. With chunked framing, the message
+    is instead split into blocks which each give their own length, followed by an end marker, and may be of any length.
+    Segmented framing splits the message into segments, and encodes each with chunked framing as its own paragraph.
     :param chain: a Markov chain with states
     :param wt_dict: a corresponding dictionary of word-types
     :param bits: the input bits
-    :param header_length: the pre-shared length, in bits, of the header
+    :param header_length: the pre-shared length, in bits, of the header; unused with chunked framing
+    :param rng: the source of random numbers; by default, the shared random module
+    :param framing: how the length of the message is given; FRAMING_FIXED, FRAMING_CHUNKED or FRAMING_SEGMENTED
     :return: the cover text as a string
     """
     if bits is None or bits.__eq__(Bits()):
         raise ValueError("Bits cannot be None or empty.")
-    message_length = len(bits)
-    header = get_fixed_length_header(message_length, header_length)
-    full_message = header + bits
-    words = encode_bits_as_words(chain, wt_dict, full_message)
-    cover_text = words_to_cover_text(words, True)
-    return cover_text
+    return "".join(encode_message_stream(chain, wt_dict, [bits], len(bits), header_length, rng, framing=framing))
+
+
+def encode_message_stream(chain: MarkovChain, wt_dict: WordTypeDictionary, source: BitSource,
+                          message_length: Optional[int], header_length=DEFAULT_HEADER_LENGTH,
+                          rng: random.Random = None, chunk_size=DEFAULT_CHUNK_SIZE,
+                          framing=FRAMING_FIXED) -> Iterator[str]:
+    """
+    Encode a cover text as in encode_message, reading the secret message from a stream and producing the cover text
+    one sentence at a time, as soon as the Markov chain returns to s0. Only a few bits of the message are held at once,
+    so a message of any length can be encoded in bounded memory. Joining the sentences gives the same cover text as
+    encode_message.
+    :param chain: a Markov chain with states
+    :param wt_dict: a corresponding dictionary of word-types
+    :param source: a binary file object, or an iterable of chunks of the message as Bits or bytes
+    :param message_length: the number of bits in the message, which must be known in advance for fixed framing; the
+    stream is read no further. With other framing it may be None, to read the whole stream
+    :param header_length: the pre-shared length, in bits, of the header; unused with chunked framing
+    :param rng: the source of random numbers; by default, the shared random module
+    :param chunk_size: the number of bytes to read from a file object at a time
+    :param framing: how the length of the message is given; FRAMING_FIXED, FRAMING_CHUNKED or FRAMING_SEGMENTED
+    :return: an iterator of the sentences of the cover text
+    """
+    if framing == FRAMING_FIXED:
+        if message_length is None:
+            raise ValueError("Message length must be given for fixed framing.")
+        header = get_fixed_length_header(message_length, header_length)
+        chunks = chain_iterables([header], _read_bit_chunks(source, message_length, chunk_size))
+    elif framing == FRAMING_CHUNKED:
+        chunks = _frame_bit_chunks(_read_bit_chunks(source, message_length, chunk_size))
+    elif framing == FRAMING_SEGMENTED:
+        yield from encode_message_segments(chain, wt_dict, _read_bit_chunks(source, message_length, chunk_size), rng)
+        return
+    else:
+        raise ValueError("Unknown framing \"{}\".".format(framing))
+    walker = ChainWalker(chain, rng)
+    sentences = _encode_sentences(walker, wt_dict, BitReader(), chunks)
+    for index, words in enumerate(sentences):
+        yield words_to_cover_text(words, True) if index == 0 else "".join(
+            " " + word if encode_spaces else word for word, encode_spaces in words)
+
+
+def encode_message_segments(chain: MarkovChain, wt_dict: WordTypeDictionary, source: BitSource,
+                            rng: random.Random = None, workers=1, segment_length=DEFAULT_SEGMENT_LENGTH,
+                            chunk_size=DEFAULT_CHUNK_SIZE, mp_context=None) -> Iterator[str]:
+    """
+    Encode a cover text with segmented framing, reading the secret message from a stream. The message is split into
+    segments, and each is encoded with chunked framing from s0, independently of the others, so that segments can be
+    encoded in parallel by a pool of worker processes. Each segment is encoded with its own random numbers, drawn in
+    order from rng, so the cover text is the same for any number of workers.
+    :param chain: a Markov chain with states
+    :param wt_dict: a corresponding dictionary of word-types
+    :param source: a binary file object, or an iterable of chunks of the message as Bits or bytes
+    :param rng: the source of random numbers; by default, the shared random module
+    :param workers: the number of worker processes; if 1, the segments are encoded in this process, and if None, one
+    worker is started for every CPU
+    :param segment_length: the number of bits of the message in each segment
+    :param chunk_size: the number of bytes to read from a file object at a time
+    :param mp_context: the multiprocessing context used to start the worker processes, if not the default
+    :return: an iterator of the cover text of each segment in order, with a separator before each but the first
+    """
+    if segment_length < 1:
+        raise ValueError("Segment length must be greater than 0.")
+    workers = resolve_workers(workers)
+    if rng is None:
+        rng = random
+    segments = ((bits, rng.getrandbits(64)) for bits in
+                split_bits(read_chunks(source, chunk_size), segment_length))
+    cover_texts = map_in_order(_encode_segment, segments, (chain, wt_dict), workers, mp_context)
+    for index, cover_text in enumerate(cover_texts):
+        yield cover_text if index == 0 else SEGMENT_SEPARATOR + cover_text
+
+
+def _encode_segment(chain: MarkovChain, wt_dict: WordTypeDictionary, bits: Bits, seed: int) -> str:
+    """
+    Encode one segment of a message with chunked framing.
+    :return: the cover text of the segment
+    """
+    return "".join(encode_message_stream(chain, wt_dict, [bits], None, rng=random.Random(seed),
+                                         framing=FRAMING_CHUNKED))
+
+
+def _read_bit_chunks(source: BitSource, length: Optional[int], chunk_size: int) -> Iterator[Union[Bits, bytes]]:
+    """
+    Read exactly the given number of bits from a stream of chunks, or every bit if the length is None.
+    :return: an iterator of chunks, as Bits or bytes
+    """
+    chunks = read_chunks(source, chunk_size)
+    if length is None:
+        yield from chunks
+        return
+    remaining = length
+    for chunk in chunks:
+        if remaining <= 0:
+            return
+        chunk_length = len(chunk) if isinstance(chunk, Bits) else len(chunk) << 3
+        if chunk_length > remaining:
+            chunk = chunk[:remaining] if isinstance(chunk, Bits) else Bits(bytes=chunk, length=remaining)
+            chunk_length = remaining
+        remaining -= chunk_length
+        yield chunk
+    if remaining > 0:
+        raise ValueError("Message was {} bits shorter than the given message length.".format(remaining))
+
+
+def _frame_bit_chunks(chunks: Iterable[Union[Bits, bytes]]) -> Iterator[Bits]:
+    """
+    Split a stream of chunks into blocks of BLOCK_LENGTH bits, each after a header of its length, and finish with a
+    header of length 0.
+    :return: an iterator of the headers and blocks
+    """
+    for block in split_bits(chunks, BLOCK_LENGTH):
+        yield get_block_header(len(block))
+        yield block
+    yield get_block_header(0)
 
 
 def decode_cover_text(wt_dict: WordTypeDictionary, cover_text: str,
-                      header_length=DEFAULT_HEADER_LENGTH) -> Bits:
+                      header_length=DEFAULT_HEADER_LENGTH, framing=FRAMING_FIXED) -> Bits:
     """
     Given a valid cover text containing a header, and the correct header length and word-type dictionary, retrieve the
     secret message.
     :param wt_dict: a dictionary of word-types
     :param cover_text: the cover text consisting of a header and message
-    :param header_length: the pre-shared length, in bits, of the header
+    :param header_length: the pre-shared length, in bits, of the header; unused with chunked framing
+    :param framing: how the length of the message was given; FRAMING_FIXED, FRAMING_CHUNKED or FRAMING_SEGMENTED
     :return: the retrieved secret message as bits
     """
     if cover_text is None:
         raise ValueError("Cover text cannot be None.")
-    message = Bits()
     if cover_text.__len__() == 0:
-        return message
-
-    header_bits, trailing_bits, cover_text = fixed_size_decode(wt_dict,
-                                                               cover_text,
-                                                               header_length)
-    message_length = get_message_length_from_header(header_bits) - len(
-        trailing_bits)
-    message = message.__add__(trailing_bits)
-
-    message_bits, trailing_bits, cover_text = fixed_size_decode(wt_dict,
-                                                                cover_text,
-                                                                message_length)
-    if len(cover_text) > 0:
+        return Bits()
+    return join_bits(decode_cover_text_stream(wt_dict, [cover_text], header_length, framing=framing))
+
+
+def decode_cover_text_stream(wt_dict: WordTypeDictionary, source: TextSource,
+                             header_length=DEFAULT_HEADER_LENGTH, chunk_size=DEFAULT_CHUNK_SIZE,
+                             framing=FRAMING_FIXED) -> Iterator[Bits]:
+    """
+    Decode a cover text as in decode_cover_text, reading it from a stream and yielding the secret message as it is
+    recovered. The header is read from the first few words, and no more of the cover text is held than the end of a
+    chunk which might be the start of a word continuing into the next one, so a cover text of any length can be decoded
+    in bounded memory. Every yielded Bits but the last is a whole number of bytes.
+    With chunked framing, decoding stops at the end marker after the last block. With segmented framing, decoding
+    skips from the end marker of each segment to the next paragraph.
+    :param wt_dict: a dictionary of word-types
+    :param source: a text file object, or an iterable of strings of the cover text
+    :param header_length: the pre-shared length, in bits, of the header; unused with chunked framing
+    :param chunk_size: the number of characters to read from a file object at a time, and roughly the number of bits
+    to recover before yielding them
+    :param framing: how the length of the message was given; FRAMING_FIXED, FRAMING_CHUNKED or FRAMING_SEGMENTED
+    :return: an iterator over consecutive pieces of the secret message
+    """
+    if not wt_dict.wt_dict:
+        raise ValueError("Given word-type dictionary was empty.")
+    if framing not in FRAMINGS:
+        raise ValueError("Unknown framing \"{}\".".format(framing))
+    reader = _CoverTextReader(wt_dict.get_word_automaton(), read_chunks(source, chunk_size))
+    if reader.at_end():
+        return
+    yield from _decode_framed(reader, header_length, chunk_size, framing)
+
+    left_over = reader.skip_remaining()
+    # The end of a chunked or segmented message is marked, so the rest
+    # can only be padding
+    if left_over > 0 and framing == FRAMING_FIXED:
         print("Warning: there were {} characters left over in the cover text. "
-              "Please verify the provided header length.".format(
-            len(cover_text)))
-    message = message.__add__(message_bits)
+              "Please verify the provided header length.".format(left_over))
+
+
+def decode_cover_text_parallel(wt_dict: WordTypeDictionary, source: TextSource,
+                               header_length=DEFAULT_HEADER_LENGTH, framing=FRAMING_FIXED, workers: int = None,
+                               partition_size=DEFAULT_PARTITION_SIZE, chunk_size=DEFAULT_CHUNK_SIZE,
+                               mp_context=None) -> Iterator[Bits]:
+    """
+    Decode a cover text as in decode_cover_text_stream, splitting it into partitions which are decoded by a pool of
+    worker processes, and joining the results in order.
+    With segmented framing, each segment is decoded entirely by one worker. Otherwise, the cover text is split at
+    whitespace, which no word can contain, so that each worker finds exactly the words that decode_cover_text would in
+    its partition. The header and message are then read from the joined bits of the words. Any unknown word is only
+    reported if the message would need its bits.
+    :param wt_dict: a dictionary of word-types
+    :param source: a text file object, or an iterable of strings of the cover text
+    :param header_length: the pre-shared length, in bits, of the header; unused with chunked or segmented framing
+    :param framing: how the length of the message was given; FRAMING_FIXED, FRAMING_CHUNKED or FRAMING_SEGMENTED
+    :param workers: the number of worker processes; if 1, the partitions are decoded in this process, and if None, one
+    worker is started for every CPU
+    :param partition_size: the least number of characters in each partition, unless it is the last, with fixed or
+    chunked framing
+    :param chunk_size: the number of characters to read from a file object at a time
+    :param mp_context: the multiprocessing context used to start the worker processes, if not the default
+    :return: an iterator over consecutive pieces of the secret message
+    """
+    if not wt_dict.wt_dict:
+        raise ValueError("Given word-type dictionary was empty.")
+    if framing not in FRAMINGS:
+        raise ValueError("Unknown framing \"{}\".".format(framing))
+    workers = resolve_workers(workers)
+    chunks = read_chunks(source, chunk_size)
+
+    if framing == FRAMING_SEGMENTED:
+        segments = ((cover_text,) for cover_text in _read_segment_texts(chunks))
+        yield from align_bits(map_in_order(_decode_segment, segments, (None, wt_dict), workers, mp_context))
+        return
+
+    partitions = ((cover_text,) for cover_text in _read_partitions(chunks, partition_size))
+    reader = _FragmentReader(map_in_order(_tokenise_partition, partitions, (None, wt_dict), workers, mp_context))
+    if reader.at_end():
+        return
+    yield from _decode_framed(reader, header_length, chunk_size, framing)
+
+    left_over = reader.skip_remaining()
+    if left_over > 0 and framing == FRAMING_FIXED:
+        print("Warning: there were {} bits left over in the cover text. "
+              "Please verify the provided header length.".format(left_over))
+
+
+def _read_segment_texts(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Split a stream of cover text into segments at every separator.
+    """
+    separator_length = SEGMENT_SEPARATOR.__len__()
+    segment = []
+    carry = ""
+    for chunk in chunks:
+        parts = (carry + chunk).split(SEGMENT_SEPARATOR)
+        for part in parts[:-1]:
+            segment.append(part)
+            yield "".join(segment)
+            segment = []
+        # The end of the text may be the start of a separator
+        # continuing into the next chunk
+        last = parts[-1]
+        split = max(last.__len__() - separator_length + 1, 0)
+        segment.append(last[:split])
+        carry = last[split:]
+    segment.append(carry)
+    cover_text = "".join(segment)
+    if cover_text:
+        yield cover_text
+
+
+def _read_partitions(chunks: Iterable[str], partition_size: int) -> Iterator[str]:
+    """
+    Split a stream of cover text into partitions of at least the given number of characters, unless it is the last,
+    each ending just before a space or line break.
+    """
+    pending = []
+    pending_length = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_length += chunk.__len__()
+        if pending_length >= partition_size:
+            cover_text = "".join(pending)
+            end = max(cover_text.rfind(" "), cover_text.rfind("\n"))
+            if end > 0:
+                yield cover_text[:end]
+                cover_text = cover_text[end:]
+            pending = [cover_text]
+            pending_length = cover_text.__len__()
+    cover_text = "".join(pending)
+    if cover_text:
+        yield cover_text
+
+
+def _decode_segment(chain: Optional[MarkovChain], wt_dict: WordTypeDictionary, cover_text: str) -> Bits:
+    """
+    Decode one segment of a cover text with segmented framing.
+    :return: the part of the message in the segment
+    """
+    return decode_cover_text(wt_dict, cover_text, framing=FRAMING_CHUNKED)
+
+
+def _tokenise_partition(chain: Optional[MarkovChain], wt_dict: WordTypeDictionary,
+                        cover_text: str) -> Tuple[Bits, Optional[str]]:
+    """
+    Find every word in a partition of a cover text.
+    :return: a tuple of the joined bits of the words, and the error raised at the first unknown word, if any
+    """
+    reader = _CoverTextReader(wt_dict.get_word_automaton(), [cover_text])
+    words = BitWriter()
+    try:
+        bits = reader.read_word()
+        while bits is not None:
+            words.write_bits(bits)
+            bits = reader.read_word()
+    except ExtendedCoderError as error:
+        return words.to_bits(), str(error)
+    return words.to_bits(), None
+
+
+def _decode_framed(reader: "_WordBitsReader", header_length: int, chunk_size: int,
+                   framing: str) -> Iterator[Bits]:
+    """
+    Read the header and message from the bits of the words of a cover text.
+    :return: an iterator over consecutive pieces of the secret message
+    """
+    message = BitWriter()
+    if framing == FRAMING_FIXED:
+        header = int_to_bits(reader.read_bits(header_length), header_length)
+        message_length = remaining = get_message_length_from_header(header)
+        while remaining > 0:
+            count = min(remaining, chunk_size)
+            reader.copy_bits(count, message, message_length)
+            remaining -= count
+            output = message.flush()
+            if output:
+                yield Bits(bytes=output)
+    elif framing == FRAMING_CHUNKED:
+        yield from _decode_blocks(reader, message)
+    else:
+        yield from _decode_blocks(reader, message)
+        while reader.skip_past(SEGMENT_SEPARATOR) and not reader.at_end():
+            yield from _decode_blocks(reader, message)
+
+    remainder = message.to_bits()
+    if len(remainder) > 0:
+        yield remainder
+
+
+def _decode_blocks(reader: "_WordBitsReader", message: BitWriter) -> Iterator[Bits]:
+    """
+    Decode blocks of a message with chunked framing, up to and including the end marker, writing them to the given
+    writer.
+    :return: an iterator over the whole bytes of the message written after each block
+    """
+    while True:
+        header = int_to_bits(reader.read_bits(BLOCK_HEADER_LENGTH), BLOCK_HEADER_LENGTH)
+        block_length = get_block_length_from_header(header)
+        if block_length == 0:
+            return
+        reader.copy_bits(block_length, message)
+        output = message.flush()
+        if output:
+            yield Bits(bytes=output)
+
+
+class _WordBitsReader(ABC):
+    """
+    A cursor over the bits of the words of a cover text. Subclasses find the words, and bits of the last word found
+    which have not yet been read are kept as an integer.
+    """
 
-    return message
+    def __init__(self):
+        self.bits = 0
+        self.bits_length = 0
+
+    @abstractmethod
+    def read_word(self) -> Optional[Bits]:
+        """
+        :return: the bit-string of the next word, or None at the end of the cover text
+        """
+
+    @abstractmethod
+    def at_end(self) -> bool:
+        """
+        :return: whether there are no more words in the cover text, and no bits left of the last word
+        """
+
+    @abstractmethod
+    def skip_remaining(self) -> int:
+        """
+        Read the rest of the cover text.
+        :return: the amount of the cover text left
+        """
+
+    def read_bits(self, count: int) -> int:
+        """
+        Read the given number of bits of the words in the cover text.
+        :param count: the number of bits to read
+        :return: the bits as an unsigned integer
+        """
+        while self.bits_length < count:
+            bits = self.read_word()
+            if bits is None:
+                raise ValueError("Cover text was too short for expected {} bits of data".format(count))
+            if len(bits) > 0:
+                self.bits = (self.bits << len(bits)) | bits.uint
+                self.bits_length += len(bits)
+        self.bits_length -= count
+        value = self.bits >> self.bits_length
+        self.bits &= (1 << self.bits_length) - 1
+        return value
+
+    def copy_bits(self, count: int, writer: BitWriter, expected: Optional[int] = None):
+        """
+        Read the given number of bits of the words in the cover text, and write them to the given writer.
+        :param count: the number of bits to copy
+        :param writer: the writer to write them to
+        :param expected: the total number of bits of data expected, of which these are a part, to report if the cover
+        text is too short; by default, the number of bits to copy
+        """
+        if expected is None:
+            expected = count
+        if self.bits_length > 0:
+            taken = min(count, self.bits_length)
+            writer.write(self.read_bits(taken), taken)
+            count -= taken
+        while count > 0:
+            bits = self.read_word()
+            if bits is None:
+                raise ValueError("Cover text was too short for expected {} bits of data".format(expected))
+            length = len(bits)
+            if length > count:
+                self.bits = bits.uint
+                self.bits_length = length
+                writer.write(self.read_bits(count), count)
+                return
+            writer.write_bits(bits)
+            count -= length
+
+
+class _CoverTextReader(_WordBitsReader):
+    """
+    A cursor over a cover text read in chunks, which finds one word at a time. The end of each chunk is held back until
+    there are enough characters after it to be sure of the longest word starting there.
+    """
+
+    def __init__(self, automaton: WordAutomaton, chunks: Iterable[str]):
+        super().__init__()
+        self.automaton = automaton
+        self.lookahead = automaton.longest
+        self.chunks = iter(chunks)
+        self.text = ""
+        self.offset = 0
+        self.text_length = 0
+        self.finished = False
+
+    def at_end(self) -> bool:
+        """
+        :return: whether there are no more words in the cover text, and no bits left of the last word
+        """
+        offset = _skip_whitespace(self.text, self.offset)
+        while not self.finished and offset >= self.text.__len__():
+            self.offset = offset
+            self._read_chunk()
+            offset = _skip_whitespace(self.text, self.offset)
+        self.offset = offset
+        return self.bits_length == 0 and offset >= self.text.__len__()
+
+    def skip_past(self, separator: str) -> bool:
+        """
+        Move the cursor past the next occurrence of the separator in the cover text, and discard any bits left of the
+        last word found.
+        :param separator: the text to find
+        :return: whether the separator was found
+        """
+        self.bits = 0
+        self.bits_length = 0
+        while True:
+            index = self.text.find(separator, self.offset)
+            if index >= 0:
+                self.offset = index + separator.__len__()
+                return True
+            if self.finished:
+                self.offset = self.text.__len__()
+                return False
+            # Keep the end of the text, which may be the start of a
+            # separator continuing into the next chunk
+            self.offset = max(self.offset, self.text.__len__() - separator.__len__() + 1)
+            self._read_chunk()
+
+    def read_word(self) -> Optional[Bits]:
+        """
+        Find the next word of the cover text, and move the cursor past it.
+        :return: the bit-string of the word, or None at the end of the cover text
+        """
+        text = self.text
+        offset = _skip_whitespace(text, self.offset)
+        while text.__len__() - offset < self.lookahead and not self.finished:
+            self.offset = offset
+            self._read_chunk()
+            text = self.text
+            offset = _skip_whitespace(text, self.offset)
+        if offset >= text.__len__():
+            self.offset = offset
+            return None
+        word, bits = _find_word(self.automaton, text, self.lookahead, offset)
+        self.offset = offset + word.__len__()
+        return bits
+
+    def skip_remaining(self) -> int:
+        """
+        Read the rest of the cover text.
+        :return: the number of characters after the cursor, not counting leading whitespace
+        """
+        left_over = self.text.__len__() - _skip_whitespace(self.text, self.offset)
+        if not self.finished:
+            for chunk in self.chunks:
+                if left_over == 0:
+                    chunk = chunk[_skip_whitespace(chunk, 0):]
+                left_over += chunk.__len__()
+            self.finished = True
+        self.text = ""
+        self.offset = 0
+        return left_over
+
+    def _read_chunk(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.finished = True
+            return
+        self.text_length += chunk.__len__()
+        self.text = self.text[self.offset:] + chunk
+        self.offset = 0
+
+
+class _FragmentReader(_WordBitsReader):
+    """
+    A cursor over the bits of the words of a cover text, given as the joined bits of the words of each partition.
+    """
+
+    def __init__(self, fragments: Iterable[Tuple[Bits, Optional[str]]]):
+        super().__init__()
+        self.fragments = iter(fragments)
+        self.error = None
+
+    def read_word(self) -> Optional[Bits]:
+        """
+        :return: the joined bits of the words of the next partition, or None at the end of the cover text
+        """
+        if self.error is not None:
+            raise ExtendedCoderError(self.error)
+        fragment = next(self.fragments, None)
+        if fragment is None:
+            return None
+        bits, self.error = fragment
+        return bits
+
+    def at_end(self) -> bool:
+        """
+        :return: whether there are no more words in the cover text, and no bits left of the last word
+        """
+        while self.bits_length == 0:
+            bits = self.read_word()
+            if bits is None:
+                return True
+            if len(bits) > 0:
+                self.bits = bits.uint
+                self.bits_length = len(bits)
+        return False
+
+    def skip_remaining(self) -> int:
+        """
+        Read the rest of the cover text.
+        :return: the number of bits left, including the bits of any words after an unknown word
+        """
+        left_over = self.bits_length + sum(len(bits) for bits, _ in self.fragments)
+        self.bits = 0
+        self.bits_length = 0
+        return left_over
 
 
 def fixed_size_decode(wt_dict: WordTypeDictionary, cover_text: str,
@@ -84,20 +630,45 @@ def fixed_size_decode(wt_dict: WordTypeDictionary, cover_text: str,
     :return: a tuple containing the retrieved message bits; trailing bits from the last word decoded (if any); and the
     remaining cover text after decoding
     """
-    message = Bits()
-    longest_word_length = len(get_longest_word_in_dictionary(wt_dict))
-    while message.len < data_length:
-        if cover_text.__len__() == 0:
+    message, trailing_bits, offset = fixed_size_decode_at(wt_dict, cover_text, data_length)
+    return message, trailing_bits, cover_text[offset:]
+
+
+def fixed_size_decode_at(wt_dict: WordTypeDictionary, cover_text: str,
+                         data_length: int, offset=0) -> \
+        Tuple[Bits, Bits, int]:
+    """
+    Given a valid cover text and word-type dictionary, retrieve the message of the desired length, starting at the given
+    offset. The cover text is scanned once, with a cursor, and is never sliced.
+    :param wt_dict: a dictionary of word-types
+    :param cover_text: a full or partial cover text containing the message
+    :param data_length: the exact number of bits that should be decoded from the cover text
+    :param offset: the position in the cover text at which to start decoding
+    :return: a tuple containing the retrieved message bits; trailing bits from the last word decoded (if any); and the
+    offset of the remaining cover text after decoding
+    """
+    if not wt_dict.wt_dict:
+        raise ValueError("Given word-type dictionary was empty.")
+    message = BitWriter()
+    automaton = wt_dict.get_word_automaton()
+    cover_text_length = len(cover_text)
+    offset = _skip_whitespace(cover_text, offset)
+    while message.bit_length < data_length:
+        if offset >= cover_text_length:
             raise ValueError(
                 "Cover text was too short for expected {} bits of data".format(
                     data_length))
-        word, bits = get_word_from_cover_text(wt_dict, cover_text,
-                                              longest_word_length)
-        message = message.__add__(bits)
-        cover_text = (cover_text[len(word):]).lstrip()
+        word, bits = _find_word(automaton, cover_text, automaton.longest, offset)
+        message.write_bits(bits)
+        offset = _skip_whitespace(cover_text, offset + len(word))
+    message = message.to_bits()
     trailing_bits = message[data_length:]
     message = message[:data_length]
-    return message, trailing_bits, cover_text
+    return message, trailing_bits, offset
+
+
+def _skip_whitespace(cover_text: str, offset: int) -> int:
+    return _WHITESPACE.match(cover_text, offset).end()
 
 
 def get_fixed_length_header(message_length: int, header_length: int) -> Bits:
@@ -123,6 +694,23 @@ def get_message_length_from_header(header: Bits) -> int:
     return message_length
 
 
+def get_block_header(block_length: int) -> Bits:
+    """
+    Encode the length of a block of a message in chunked framing as a binary header. A length of 0 marks the end of
+    the message.
+    :param block_length: the number of bits in the block
+    :return: the header of BLOCK_HEADER_LENGTH bits
+    """
+    if block_length < 0 or block_length >= 1 << BLOCK_HEADER_LENGTH:
+        raise ValueError("Block was too long for the block header to represent.")
+    header = ("{0:0" + str(BLOCK_HEADER_LENGTH) + "b}").format(block_length)
+    return Bits(bin=_stream_randomiser(header))
+
+
+def get_block_length_from_header(header: Bits) -> int:
+    return Bits(bin=_stream_randomiser(header.bin)).uint
+
+
 def _stream_randomiser(bits: str) -> str:
     """
     Randomise the bits in a given string using a pseudo-random stream cipher.
@@ -137,6 +725,31 @@ def _stream_randomiser(bits: str) -> str:
     return "".join(bits)
 
 
+def get_expected_sentence_statistics(chain: MarkovChain, wt_dict: WordTypeDictionary) -> Tuple[float, float, float]:
+    """
+    Calculate the expected number of words, of bits encoded and of characters in a sentence of cover text, that is,
+    on a walk through the Markov chain from s0 back to s0. The bits encoded are assumed to be uniformly random.
+    :param chain: a Markov chain with states
+    :param wt_dict: a corresponding dictionary of word-types
+    :return: a tuple of the expected number of words, bits and characters
+    """
+    word_statistics = {}
+
+    def get_word_statistics(state: str) -> Tuple[float, float]:
+        word_type = chain.get_word_type_for_state(state)
+        if word_type not in word_statistics:
+            mapping_dict = wt_dict.wt_dict.get(word_type) if wt_dict.wt_dict is not None else None
+            if mapping_dict is None:
+                raise ValueError("Unable to find mapping dictionary for word-type {}".format(word_type))
+            word_statistics[word_type] = mapping_dict.get_expected_statistics()
+        return word_statistics[word_type]
+
+    expected_words, expected_bits, expected_chars = get_expected_totals(
+        chain, (lambda state: 1, lambda state: get_word_statistics(state)[0],
+                lambda state: get_word_statistics(state)[1]))
+    return expected_words, expected_bits, expected_chars
+
+
 def get_longest_word_in_dictionary(wt_dict: WordTypeDictionary) -> str:
     """
     Find and return the longest word in the given dictionary, under any word-type. Makes no guarantees which of
@@ -174,21 +787,20 @@ def get_word_from_cover_text(wt_dict: WordTypeDictionary, cover_text: str,
 
     if cover_text[0].__eq__(" "):
         cover_text = cover_text[1:]
-    first_space_index = cover_text.find(" ", 1)
-    if 0 < first_space_index < word_length_bound:
-        word_length_bound = first_space_index
-
-    for i in range(word_length_bound, 0, -1):
-        word = cover_text[:i].lower()
-        for mapping_dict in wt_dict.wt_dict.values():
-            value = mapping_dict.mappings.get(word)
-            if value is not None:
-                return word, value
+    return _find_word(wt_dict.get_word_automaton(), cover_text,
+                      word_length_bound)
 
-    word = cover_text[:word_length_bound]
-    raise ExtendedCoderError(
-        "Unable to find a word in the given cover text (at {}...) with the given parameters".
-        format(word))
+
+def _find_word(automaton: WordAutomaton, cover_text: str,
+               word_length_bound: int, offset=0) -> Tuple[str, Bits]:
+    found = automaton.match(cover_text, offset, word_length_bound)
+    if found is None:
+        word = cover_text[offset:offset + word_length_bound]
+        raise ExtendedCoderError(
+            "Unable to find a word in the given cover text (at {}...) with the given parameters".
+            format(word))
+    word, _, bits = found
+    return word, bits
 
 
 def words_to_cover_text(words: List[Tuple[str, bool]],
@@ -215,8 +827,8 @@ def words_to_cover_text(words: List[Tuple[str, bool]],
     return cover_text
 
 
-def encode_bits_as_words(chain: MarkovChain, wt_dict: WordTypeDictionary,
-                         bits: Bits, pad_text=True) -> list:
+def encode_bits_as_words(chain: Union[MarkovChain, ChainWalker], wt_dict: WordTypeDictionary,
+                         bits: Bits, pad_text=True, rng: random.Random = None) -> list:
     """
     Given a bit stream, a Markov chain, and a word-type dictionary, retrieve a corresponding list of words.
     Every state in the Markov chain, except the start state s0, must have a corresponding word-type in the given
@@ -225,47 +837,79 @@ def encode_bits_as_words(chain: MarkovChain, wt_dict: WordTypeDictionary,
     If the word-type dictionary does not have path bits to match the end of the input exactly, it will append 0s
     until the function can complete.
 
-    :param chain: a Markov chain with states
+    The chain itself is not changed, so one chain can be used for many encodings at once. Given a chain, the walk
+    through it starts at s0; given a walker, it continues from the walker's current state.
+
+    :param chain: a Markov chain with states, or a walker through one
     :param wt_dict: a corresponding dictionary of word-types
     :param bits: the input bits
     :param pad_text: if true, generate cover text from random bits until the Markov chain reaches state s0
+    :param rng: the source of random numbers, if given a chain rather than a walker; by default, the shared random
+    module
     :return: an ordered list of words encoded by the system
     """
     if bits is None or bits.__eq__(Bits()):
         raise ValueError("Bits cannot be None or empty.")
 
+    walker = chain if isinstance(chain, ChainWalker) else ChainWalker(chain, rng)
     words = []
-    prefix = bits
-    while len(prefix) > 0:
-        chain.transition()
-        if chain.current_state.__eq__(START_STATE_LABEL):
-            chain.transition()
-
-        word, word_bits, encode_spaces = _encode_next_word(chain, wt_dict,
-                                                           prefix)
+    for sentence in _encode_sentences(walker, wt_dict, BitReader.from_bits(bits), pad_text=pad_text):
+        words.extend(sentence)
+    return words
+
+
+def _encode_sentences(walker: ChainWalker, wt_dict: WordTypeDictionary, reader: BitReader,
+                      chunks: Iterator[Union[Bits, bytes]] = None,
+                      pad_text=True) -> Iterator[List[Tuple[str, bool]]]:
+    """
+    Encode bits as words, as in encode_bits_as_words, and produce the words of each sentence as soon as the walk
+    returns to s0. If a stream of chunks is given, they are fed to the reader as it runs low, keeping enough bits to
+    match the longest bit-string in the dictionary.
+    :return: an iterator of lists of words and their encode_spaces properties
+    """
+    lookahead = 0
+    if wt_dict.wt_dict is not None:
+        lookahead = max((mapping_dict.get_encoding_index().longest for mapping_dict in wt_dict.wt_dict.values()),
+                        default=0)
+    words = []
+    while True:
+        if chunks is not None and reader.remaining() < max(lookahead, 1):
+            for chunk in chunks:
+                reader.feed(chunk)
+                if reader.remaining() >= lookahead:
+                    break
+            else:
+                chunks = None
+        if reader.remaining() == 0:
+            break
+
+        if walker.transition() == START_STATE_ID:
+            if words:
+                yield words
+                words = []
+            walker.transition()
+
+        word, word_bits, encode_spaces = _encode_next_word(walker.get_current_word_type(), wt_dict, reader)
         words.append((word, encode_spaces))
-        bit_length = len(word_bits)
-        prefix = prefix[bit_length:]
+        reader.skip(len(word_bits))
 
     if pad_text:
         # add filler bits until s0 reached
-        while not chain.current_state.__eq__(START_STATE_LABEL):
-            chain.transition()
-            if chain.current_state.__eq__(START_STATE_LABEL):
+        filler_length = wt_dict.get_longest_word_length()
+        while walker.state != START_STATE_ID:
+            if walker.transition() == START_STATE_ID:
                 break
-            longest_word = get_longest_word_in_dictionary(wt_dict)
-            pseudo_random_bits = Bits(bin="".join(
-                random.choice(["0", "1"]) for _ in range(len(longest_word))))
-            word, word_bits, encode_spaces = _encode_next_word(chain, wt_dict,
-                                                               pseudo_random_bits)
+            pseudo_random_bits = int_to_bits(walker.rng.getrandbits(filler_length), filler_length)
+            word, word_bits, encode_spaces = _encode_next_word(walker.get_current_word_type(), wt_dict,
+                                                               BitReader.from_bits(pseudo_random_bits))
             words.append((word, encode_spaces))
 
-    return words
+    if words:
+        yield words
 
 
-def _encode_next_word(chain: MarkovChain, wt_dict: WordTypeDictionary,
-                      bits: Bits) -> Tuple[str, Bits, bool]:
-    word_type = chain.get_current_word_type()
+def _encode_next_word(word_type: str, wt_dict: WordTypeDictionary,
+                      reader: BitReader) -> Tuple[str, Bits, bool]:
     mapping_dict = wt_dict.wt_dict.get(word_type)
     if mapping_dict is None:
         raise ValueError(
@@ -273,21 +917,21 @@ def _encode_next_word(chain: MarkovChain, wt_dict: WordTypeDictionary,
                 word_type))
 
     try:
-        word = retrieve_word_from_mappings(bits, mapping_dict, True)
+        word = retrieve_word_from_mappings(reader, mapping_dict, True)
     except ValueError:
         raise ValueError(
             "Failed to retrieve a word for word-type {}".format(word_type))
     return word, mapping_dict.mappings.get(word), mapping_dict.encode_spaces
 
 
-def retrieve_word_from_mappings(bits: Bits, mapping_dict: MappingDictionary,
+def retrieve_word_from_mappings(bits: Union[Bits, BitReader], mapping_dict: MappingDictionary,
                                 allow_padding=True) -> str:
     """
     Given a string of bits, attempt to find a word in the given mapping
     dictionary that corresponds to the first
     n bits.
 
-    :param bits: the entire message that needs to be decoded
+    :param bits: the entire message that needs to be decoded, as Bits or as a reader whose cursor is at the next word
     :param mapping_dict: the dictionary of mappings
     :param allow_padding: if true, then 0s will be appended to bits if
     necessary to find a mapping
@@ -299,27 +943,27 @@ def retrieve_word_from_mappings(bits: Bits, mapping_dict: MappingDictionary,
         raise ValueError("Given mappings were empty.")
     if bits is None:
         raise ValueError("Bits cannot be None.")
-
-    reverse_dict = {y: x for x, y in mapping_dict.mappings.items()}
-    f = lambda x, y: x if x > y else y
-    longest_bits = reduce(lambda x, y: f(x, y), map(len, reverse_dict.keys()))
-    prefix = bits[:longest_bits].bin
-    while prefix.__len__() > 0:
-        value = reverse_dict.get(Bits(bin=prefix))
-        if value is not None:
-            return value
-        prefix = prefix[:len(prefix) - 1]
+    reader = BitReader.from_bits(bits) if isinstance(bits, Bits) else bits
+
+    index = mapping_dict.get_encoding_index()
+    remaining = reader.remaining()
+    prefix_length = min(index.longest, remaining)
+    prefix = reader.peek(prefix_length)
+    for length in index.lengths:
+        if 0 < length <= prefix_length:
+            value = index.words.get((length, prefix >> (prefix_length - length)))
+            if value is not None:
+                return value
 
     # No exact match has been found
     if allow_padding:
-        prefix = bits.bin
-        while prefix.__len__() < longest_bits:
-            prefix = prefix + "0"
-            value = reverse_dict.get(Bits(bin=prefix))
-            if value is not None:
-                return value
+        for length in reversed(index.lengths):
+            if length > remaining:
+                value = index.words.get((length, reader.peek(length)))
+                if value is not None:
+                    return value
 
-    prefix = bits[:longest_bits].bin + "..."
+    prefix = int_to_bits(prefix, prefix_length).bin + "..."
     raise ValueError(
         "Unable to find any matches or near-matches in the mapping dictionary "
         "using the given bits, {}."
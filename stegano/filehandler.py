@@ -1,4 +1,9 @@
+from typing import Iterable, Iterator
+
+from bitstring import Bits, CreationError
+
 DEFAULT_ENCODING = "utf_8"
+DEFAULT_CHUNK_SIZE = 1 << 16
 
 
 def prefix_filename(subfolder: str, filename: str) -> str:
@@ -23,4 +28,51 @@ def write_output_file(filename: str, data: str, encoding=DEFAULT_ENCODING):
         with open(filename, "w", encoding=encoding) as handle:
             handle.write(data)
     except IOError:
-        print("Could not write to file {}.".format(filename))
\ No newline at end of file
+        print("Could not write to file {}.".format(filename))
+
+
+def read_input_chunks(filename: str, encoding=DEFAULT_ENCODING,
+                      chunk_size=DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    try:
+        with open(filename, "r", encoding=encoding) as handle:
+            while True:
+                text = handle.read(chunk_size)
+                if text.__eq__(""):
+                    return
+                yield text
+    except IOError:
+        print("Could not read file {}.".format(filename))
+
+
+def write_output_chunks(filename: str, chunks: Iterable[str],
+                        encoding=DEFAULT_ENCODING):
+    try:
+        with open(filename, "w", encoding=encoding) as handle:
+            for data in chunks:
+                handle.write(data)
+    except IOError:
+        print("Could not write to file {}.".format(filename))
+
+
+def read_message_chunks(filename: str) -> Iterator[Bits]:
+    is_empty = True
+    for text in read_input_chunks(filename):
+        try:
+            bits = Bits(bin=text)
+        except CreationError:
+            raise ValueError(
+                "Provided input was not a valid bitstring.")
+        if len(bits) > 0:
+            is_empty = False
+            yield bits
+    if is_empty:
+        raise ValueError("Provided input was empty.")
+
+
+def read_cover_chunks(filename: str) -> Iterator[str]:
+    is_empty = True
+    for text in read_input_chunks(filename):
+        is_empty = False
+        yield text
+    if is_empty:
+        raise ValueError("Provided input was empty.")
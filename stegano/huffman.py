@@ -1,11 +1,19 @@
-import bisect
+import heapq
 import json
-import queue
+import mmap
+import struct
+import sys
 import warnings
-from typing import Tuple, Set, Optional, List
+from array import array
+from typing import Tuple, Set, Optional, List, Dict, Iterable, \
+    Iterator, Union, BinaryIO, TextIO
 
 from bitstring import Bits
 
+from stegano.bitio import BitReader, BitWriter, int_to_bits, \
+    read_chunks, split_bits, align_bits, join_bits, read_array
+from stegano.filehandler import DEFAULT_CHUNK_SIZE
+from stegano.pool import map_in_order, resolve_workers
 from stegano.textanalyser import DEFAULT_ANALYSIS_FILE
 from stegano.textanalyser import DEFAULT_SAMPLE_FILE
 from stegano.textanalyser import TextAnalyser
@@ -15,6 +23,35 @@ Symbol = Tuple[str, Frequency]
 StringDefinitions = Set[Symbol]
 
 DEFAULT_TREE_FILE = "..\\sample\\tree_article.json"
+DEFAULT_LOOKUP_BITS = 8
+MAX_DIRECT_LOOKUP_BITS = 12
+
+TREE_FORMAT_JSON = "json"
+TREE_FORMAT_CANONICAL = "canonical"
+TREE_FORMAT_BINARY = "binary"
+TREE_FORMATS = [TREE_FORMAT_JSON, TREE_FORMAT_CANONICAL,
+                TREE_FORMAT_BINARY]
+CANONICAL_TREE_KEY = "code_lengths"
+
+# Binary tree files start with a header of the magic number, the
+# format version, the number of internal nodes and of leaves, and the
+# reference of the root node; all little-endian
+BINARY_TREE_MAGIC = b"HUFT"
+BINARY_TREE_VERSION = 1
+BINARY_TREE_HEADER = struct.Struct("<4sB3xIIi")
+
+FRAMING_NONE = "none"
+FRAMING_CHUNKED = "chunked"
+FRAMINGS = [FRAMING_NONE, FRAMING_CHUNKED]
+# With chunked framing, each block of the message is encoded on its
+# own after a header of the number of bits in the block and the number
+# of symbols encoding them, each as a 32-bit unsigned integer
+CHUNK_HEADER_FIELD_LENGTH = 32
+CHUNK_HEADER_LENGTH = 2 * CHUNK_HEADER_FIELD_LENGTH
+DEFAULT_BLOCK_LENGTH = 1 << 18
+# The number of characters of cover text in each partition decoded by
+# a worker process
+DEFAULT_PARTITION_SIZE = 1 << 18
 
 zero_bit = Bits(bin="0")
 one_bit = Bits(bin="1")
@@ -29,32 +66,39 @@ class HuffmanTree:
         self.path_code = path_code
 
     def __eq__(self, other):
-        if self is None and other is None:
-            return True
-
-        # Value
-        if self.value is None:
-            if other.value is not None:
-                return False
-        else:
-            if self.value != other.value:
-                return False
-
-        # Path code
-        if self.path_code is None:
-            if other.path_code is not None:
-                return False
-        else:
-            if self.path_code != other.path_code:
+        stack = [(self, other)]
+        while stack:
+            tree, other_tree = stack.pop()
+            if not isinstance(other_tree, HuffmanTree):
                 return False
 
-        # Left tree
-        if not self.left.__eq__(other.left):
-            return False
+            # Value
+            if tree.value is None:
+                if other_tree.value is not None:
+                    return False
+            else:
+                if tree.value != other_tree.value:
+                    return False
 
-        # Right tree
-        if not self.right.__eq__(other.right):
-            return False
+            # Path code
+            if tree.path_code is None:
+                if other_tree.path_code is not None:
+                    return False
+            else:
+                if other_tree.path_code is None or \
+                        tree.path_code != other_tree.path_code:
+                    return False
+
+            # Left and right trees
+            for child, other_child in ((tree.left, other_tree.left),
+                                       (tree.right, other_tree.right)):
+                if child is None or other_child is None:
+                    if child is not other_child:
+                        return False
+                elif child[0] != other_child[0]:
+                    return False
+                else:
+                    stack.append((child[1], other_child[1]))
 
         return True
 
@@ -100,8 +144,636 @@ class HuffmanError(Exception):
     pass
 
 
-def create_tree(string_definitions: StringDefinitions) -> Tuple[
-    int, HuffmanTree]:
+class _HeapEntry:
+    """
+    A subtree and its priority, as held in the heap used to construct
+    a Huffman tree. Entries are ordered by priority alone, so equal
+    priorities are resolved only by the order of the heap operations,
+    as they were with queue.PriorityQueue.
+    """
+    __slots__ = ["priority", "tree"]
+
+    def __init__(self, priority: int, tree: HuffmanTree):
+        self.priority = priority
+        self.tree = tree
+
+    def __lt__(self, other):
+        return self.priority < other.priority
+
+    def pair(self) -> Tuple[int, HuffmanTree]:
+        return self.priority, self.tree
+
+
+LeafCode = Tuple[str, int, int]
+SymbolIndex = Dict[str, Tuple[int, int]]
+BitSource = Union[BinaryIO, Iterable[Union[bytes, Bits]]]
+TextSource = Union[TextIO, Iterable[str]]
+
+
+class MappedHuffmanTree:
+    """
+    A read-only Huffman tree backed by the flat arrays of a binary
+    tree file, which is usually memory-mapped. No node objects are
+    created; leaf codes and symbols are read from the arrays on
+    demand.
+
+    A node is referred to by its index in the arrays of internal
+    nodes, or by the bitwise complement of its index in the arrays of
+    leaves. After the header, the file contains the left and right
+    child references of every internal node (int32), the offset of
+    every leaf's symbol in the string blob followed by the blob's
+    length (uint32), the code length of every leaf (uint16), and the
+    UTF-8 blob of all symbols.
+    """
+
+    def __init__(self, buffer):
+        """
+        :param buffer: the contents of a binary tree file, as a bytes
+        object or memory map
+        """
+        if len(buffer) < BINARY_TREE_HEADER.size:
+            raise HuffmanError("The binary tree file was truncated.")
+        magic, version, node_count, leaf_count, root = \
+            BINARY_TREE_HEADER.unpack_from(buffer)
+        if magic != BINARY_TREE_MAGIC:
+            raise HuffmanError("The given file was not a binary tree.")
+        if version != BINARY_TREE_VERSION:
+            raise HuffmanError(
+                "Unsupported binary tree version {}.".format(version))
+        if leaf_count != node_count + 1:
+            raise HuffmanError(
+                "The binary tree did not have one more leaf than "
+                "internal nodes.")
+
+        self._buffer = buffer
+        self.node_count = node_count
+        self.leaf_count = leaf_count
+        self.root = root
+        position = BINARY_TREE_HEADER.size
+        self.left, position = read_array(buffer, position, "i",
+                                         node_count, HuffmanError)
+        self.right, position = read_array(buffer, position, "i",
+                                          node_count, HuffmanError)
+        self.symbol_offsets, position = read_array(
+            buffer, position, "I", leaf_count + 1, HuffmanError)
+        self.code_lengths, position = read_array(
+            buffer, position, "H", leaf_count, HuffmanError)
+        self._blob_start = position
+        if position + self.symbol_offsets[leaf_count] > len(buffer):
+            raise HuffmanError("The binary tree file was truncated.")
+        self._leaf_codes = None
+
+    def get_symbol(self, leaf: int) -> str:
+        """
+        :param leaf: the index of a leaf
+        :return: the symbol of that leaf
+        """
+        start = self._blob_start + self.symbol_offsets[leaf]
+        end = self._blob_start + self.symbol_offsets[leaf + 1]
+        return bytes(self._buffer[start:end]).decode("utf-8")
+
+    def get_leaf_codes(self) -> List[LeafCode]:
+        """
+        Walk the child arrays and collect the symbol and path code of
+        every leaf, in the same order as get_leaf_codes. The result is
+        cached.
+
+        :return: a list of (symbol, code, code length) tuples
+        """
+        if self._leaf_codes is not None:
+            return self._leaf_codes
+        leaf_codes = []
+        left = self.left
+        right = self.right
+        visited = 0
+        stack = [(self.root, 0, 0)]
+        while stack:
+            node, code, length = stack.pop()
+            if node < 0:
+                leaf = ~node
+                if length != self.code_lengths[leaf]:
+                    raise HuffmanError(
+                        "The binary tree contained an incorrect code "
+                        "length.")
+                leaf_codes.append((self.get_symbol(leaf), code, length))
+            else:
+                visited += 1
+                if visited > self.node_count:
+                    raise HuffmanError(
+                        "The binary tree contained a loop.")
+                stack.append((right[node], (code << 1) | 1, length + 1))
+                stack.append((left[node], code << 1, length + 1))
+        self._leaf_codes = leaf_codes
+        return leaf_codes
+
+    def to_tree(self) -> Tuple[int, HuffmanTree]:
+        """
+        Materialise the mapped tree as Huffman tree objects, with
+        path bits allocated.
+
+        :return: a tuple of 0 and a Huffman tree
+        """
+        _, tree = tree_from_codes([((symbol, 0), code, length)
+                                   for symbol, code, length in
+                                   self.get_leaf_codes()])
+        return 0, tree
+
+    def close(self):
+        """
+        Release the underlying memory map, if any.
+        """
+        self._leaf_codes = None
+        self.left = self.right = None
+        self.symbol_offsets = self.code_lengths = None
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+
+class HuffmanEncoder:
+    """
+    A reverse Huffman encoder compiled once from the leaf path codes
+    of a Huffman tree.
+
+    Rather than walking the tree one bit at a time, the encoder reads
+    the next lookup_bits bits of the message as an integer and uses
+    it to index a lookup table of (symbol, code length) entries.
+    Codes longer than lookup_bits are resolved through nested
+    fallback tables, indexed by the bits that follow. If lookup_bits
+    is not given and no code is longer than MAX_DIRECT_LOOKUP_BITS,
+    such as in a length-limited tree, a single table is used.
+    """
+
+    def __init__(self, huffman_tree: HuffmanTree, lookup_bits=None):
+        leaf_codes = get_leaf_codes(huffman_tree)
+        self.max_code_length = max(
+            length for _, _, length in leaf_codes)
+        if lookup_bits is None:
+            if self.max_code_length <= MAX_DIRECT_LOOKUP_BITS:
+                lookup_bits = self.max_code_length
+            else:
+                lookup_bits = DEFAULT_LOOKUP_BITS
+        if lookup_bits < 1:
+            raise ValueError("Lookup bits must be a positive integer.")
+        self.lookup_bits = min(lookup_bits, self.max_code_length)
+        self.table = _build_lookup_table(leaf_codes, self.lookup_bits,
+                                         0, self.lookup_bits)
+
+    def encode(self, bits: Bits) -> str:
+        """
+        Encode the given bits as a string of symbols.
+
+        If the final symbol's path code is longer than the remaining
+        bits, 0s are appended until a symbol is matched.
+
+        :param bits: the input bits
+        :return: the string of symbols encoding the input
+        """
+        if bits is None or len(bits) == 0:
+            return ""
+        return "".join(self.encode_stream([bits]))
+
+    def encode_stream(self, source: BitSource,
+                      chunk_size=DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+        """
+        Encode a stream of bits as a stream of symbols, yielding the
+        cover text piece by piece as the input is consumed.
+
+        Bits which may be the start of a path code that continues into
+        the next chunk are held back until that chunk is read, so the
+        output is the same as encoding the whole input at once.
+
+        :param source: a binary file object, or an iterable of bytes
+        or Bits chunks
+        :param chunk_size: the number of bytes to read from a file
+        object at a time
+        :return: an iterator over consecutive pieces of the cover text
+        """
+        reader = BitReader()
+        for chunk in read_chunks(source, chunk_size):
+            reader.feed(chunk)
+            symbols = self._encode_symbols(reader, False)
+            if symbols:
+                yield "".join(symbols)
+
+        if reader.remaining() > 0:
+            yield "".join(self._encode_symbols(reader, True))
+
+    def encode_chunked(self, source: BitSource, workers=1,
+                       block_length=DEFAULT_BLOCK_LENGTH,
+                       chunk_size=DEFAULT_CHUNK_SIZE,
+                       mp_context=None) -> Iterator[str]:
+        """
+        Encode a stream of bits with chunked framing. The message is
+        split into blocks which are encoded independently, so they can
+        be encoded in parallel, and each is preceded by a header of
+        its length in bits and in symbols. The last symbol of each
+        header and of each block may be padded with 0s.
+
+        :param source: a binary file object, or an iterable of bytes
+        or Bits chunks
+        :param workers: the number of worker processes; if 1, the
+        blocks are encoded in this process, and if None, one worker is
+        started for every CPU
+        :param block_length: the number of bits in each block but the
+        last
+        :param chunk_size: the number of bytes to read from a file
+        object at a time
+        :param mp_context: the multiprocessing context used to start
+        the worker processes, if not the default
+        :return: an iterator over the cover text of each block in order
+        """
+        if not 0 < block_length < 1 << CHUNK_HEADER_FIELD_LENGTH:
+            raise ValueError("Block length was out of range.")
+        workers = resolve_workers(workers)
+        blocks = ((bits,) for bits in
+                  split_bits(read_chunks(source, chunk_size),
+                             block_length))
+        yield from map_in_order(_encode_block, blocks, (self,),
+                                workers, mp_context)
+
+    def _encode_symbols(self, reader: BitReader,
+                        final: bool) -> List[str]:
+        """
+        Match as many symbols as possible from the cursor of the given
+        reader onwards. Unless the bits are final, stop once fewer bits
+        remain than the longest path code.
+
+        :return: the matched symbols
+        """
+        if final:
+            limit = reader.bit_length
+        else:
+            limit = reader.bit_length - self.max_code_length + 1
+
+        symbols = []
+        peek = reader.peek
+        table = self.table
+        width = self.lookup_bits
+        while reader.position < limit:
+            entry = table[peek(width)]
+            if entry is not None and entry[2] is None:
+                symbol, length, _ = entry
+            else:
+                symbol, length = self._match(reader)
+            symbols.append(symbol)
+            reader.position += length
+        # The last symbol may have been matched against padding
+        reader.skip(0)
+        return symbols
+
+    def _match(self, reader: BitReader) -> Tuple[str, int]:
+        table = self.table
+        width = self.lookup_bits
+        depth = 0
+        while True:
+            entry = table[reader.peek(width, depth)]
+            if entry is None:
+                raise HuffmanError(
+                    "When encoding bits as strings, the bits did not "
+                    "match any path code in the tree")
+            value, length, sub_table = entry
+            if sub_table is None:
+                return value, length
+            depth += width
+            table, width = sub_table, length
+
+
+class HuffmanDecoder:
+    """
+    Decode cover text back into bits, one fixed-length symbol at a
+    time, using the symbol index of a Huffman tree.
+    """
+
+    def __init__(self, huffman_tree: HuffmanTree, symbol_length: int,
+                 symbol_index: SymbolIndex = None):
+        """
+        :param huffman_tree: a Huffman tree with path bits allocated
+        :param symbol_length: the correct symbol length used to encode
+        the text
+        :param symbol_index: the symbol index of the Huffman tree, if
+        already built
+        """
+        if symbol_length < 1:
+            raise ValueError("An invalid symbol length was specified.")
+        if symbol_index is None:
+            symbol_index = get_symbol_index(huffman_tree)
+        self.symbol_length = symbol_length
+        self.symbol_index = symbol_index
+
+    def decode(self, input_string: str) -> Bits:
+        """
+        Decode the given cover text as a single stream of bits.
+
+        :param input_string: the cover text to convert into bits
+        :return: the secret message contained within the cover text
+        """
+        return join_bits(self.decode_stream([input_string]))
+
+    def decode_stream(self, source: TextSource,
+                      chunk_size=DEFAULT_CHUNK_SIZE) -> Iterator[Bits]:
+        """
+        Decode a stream of cover text, yielding the secret message as
+        it is recovered.
+
+        Characters of a symbol which continues into the next chunk are
+        held back until that chunk is read. Every yielded Bits but the
+        last is a whole number of bytes.
+
+        :param source: a text file object, or an iterable of strings
+        :param chunk_size: the number of characters to read from a file
+        object at a time
+        :return: an iterator over consecutive pieces of the message
+        """
+        symbol_length = self.symbol_length
+        pending = ""
+        cover_text_length = 0
+        writer = BitWriter()
+        for text in read_chunks(source, chunk_size):
+            cover_text_length += text.__len__()
+            text = pending + text
+            end = text.__len__() - text.__len__() % symbol_length
+            pending = text[end:]
+            self._decode_symbols(text, end, writer)
+            output = writer.flush()
+            if output:
+                yield Bits(bytes=output)
+
+        if symbol_length > cover_text_length:
+            warnings.warn(
+                "Cover text is smaller than the given symbol length. "
+                "Padding with"
+                " spaces.")
+        elif pending:
+            warnings.warn(
+                "Cover text is not a multiple of the given symbol length."
+                " Padding with spaces.")
+        if symbol_length > cover_text_length or pending:
+            pending += " " * (symbol_length - pending.__len__())
+            self._decode_symbols(pending, symbol_length, writer)
+            output = writer.flush()
+            if output:
+                yield Bits(bytes=output)
+
+        remainder = writer.to_bits()
+        if len(remainder) > 0:
+            yield remainder
+
+    def decode_parallel(self, source: TextSource, workers: int = None,
+                        partition_size=DEFAULT_PARTITION_SIZE,
+                        chunk_size=DEFAULT_CHUNK_SIZE,
+                        mp_context=None) -> Iterator[Bits]:
+        """
+        Decode a stream of cover text as in decode_stream, splitting
+        it at symbol boundaries into partitions which are decoded by a
+        pool of worker processes, and joining the results in order.
+        The message is the same as from decode_stream.
+
+        :param source: a text file object, or an iterable of strings
+        :param workers: the number of worker processes; if 1, the
+        partitions are decoded in this process, and if None, one worker
+        is started for every CPU
+        :param partition_size: the least number of characters in each
+        partition, unless it is the last
+        :param chunk_size: the number of characters to read from a file
+        object at a time
+        :param mp_context: the multiprocessing context used to start
+        the worker processes, if not the default
+        :return: an iterator over consecutive pieces of the message
+        """
+        workers = resolve_workers(workers)
+        partitions = ((text,) for text in self._read_partitions(
+            source, partition_size, chunk_size))
+        yield from align_bits(map_in_order(
+            _decode_partition, partitions, (self,), workers,
+            mp_context))
+
+    def decode_chunked(self, source: TextSource, workers=1,
+                       chunk_size=DEFAULT_CHUNK_SIZE,
+                       mp_context=None) -> Iterator[Bits]:
+        """
+        Decode a stream of cover text encoded with chunked framing.
+        The header of each block is decoded in this process, and the
+        block itself may be decoded by a pool of worker processes.
+
+        :param source: a text file object, or an iterable of strings
+        :param workers: the number of worker processes; if 1, the
+        blocks are decoded in this process, and if None, one worker is
+        started for every CPU
+        :param chunk_size: the number of characters to read from a file
+        object at a time
+        :param mp_context: the multiprocessing context used to start
+        the worker processes, if not the default
+        :return: an iterator over consecutive pieces of the message
+        """
+        workers = resolve_workers(workers)
+        yield from align_bits(map_in_order(
+            _decode_block, self._read_blocks(source, chunk_size),
+            (self,), workers, mp_context))
+
+    def _read_partitions(self, source: TextSource, partition_size: int,
+                         chunk_size: int) -> Iterator[str]:
+        """
+        Split a stream of cover text into partitions of whole symbols.
+        An incomplete last symbol is padded with spaces, with the same
+        warnings as decode_stream.
+        """
+        symbol_length = self.symbol_length
+        pending = []
+        pending_length = 0
+        cover_text_length = 0
+        for text in read_chunks(source, chunk_size):
+            pending.append(text)
+            pending_length += text.__len__()
+            cover_text_length += text.__len__()
+            end = pending_length - pending_length % symbol_length
+            if pending_length >= partition_size and end > 0:
+                text = "".join(pending)
+                yield text[:end]
+                pending = [text[end:]]
+                pending_length -= end
+
+        text = "".join(pending)
+        if symbol_length > cover_text_length:
+            warnings.warn(
+                "Cover text is smaller than the given symbol length. "
+                "Padding with"
+                " spaces.")
+        elif pending_length % symbol_length:
+            warnings.warn(
+                "Cover text is not a multiple of the given symbol length."
+                " Padding with spaces.")
+        if symbol_length > cover_text_length or \
+                pending_length % symbol_length:
+            text += " " * (-pending_length % symbol_length
+                           or symbol_length)
+        if text:
+            yield text
+
+    def _read_blocks(self, source: TextSource,
+                     chunk_size: int) -> Iterator[Tuple[str, int]]:
+        """
+        Split a stream of cover text with chunked framing into blocks,
+        decoding each header.
+
+        :return: an iterator of tuples of the cover text of each block,
+        and the number of bits it encodes
+        """
+        symbol_index = self.symbol_index
+        symbol_length = self.symbol_length
+        chunks = read_chunks(source, chunk_size)
+        text = ""
+        offset = 0
+        while True:
+            header = 0
+            header_length = 0
+            while header_length < CHUNK_HEADER_LENGTH:
+                if text.__len__() - offset < symbol_length:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        if header_length == 0 and \
+                                offset == text.__len__():
+                            return
+                        raise ValueError(
+                            "Cover text ended within the header of a "
+                            "block.")
+                    text = text[offset:] + chunk
+                    offset = 0
+                    continue
+                symbol = text[offset:offset + symbol_length]
+                entry = symbol_index.get(symbol)
+                if entry is None:
+                    raise ValueError(
+                        "Symbol \"{}\" was not found in the Huffman "
+                        "tree.".format(symbol))
+                header = (header << entry[1]) | entry[0]
+                header_length += entry[1]
+                offset += symbol_length
+            # The rest of the last symbol of the header is padding
+            header >>= header_length - CHUNK_HEADER_LENGTH
+            bit_length = header >> CHUNK_HEADER_FIELD_LENGTH
+            symbol_count = header & (
+                    (1 << CHUNK_HEADER_FIELD_LENGTH) - 1)
+
+            pieces = []
+            remaining = symbol_count * symbol_length
+            while remaining > 0:
+                if offset == text.__len__():
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        raise ValueError(
+                            "Cover text ended within a block.")
+                    text = chunk
+                    offset = 0
+                piece = text[offset:offset + remaining]
+                pieces.append(piece)
+                offset += piece.__len__()
+                remaining -= piece.__len__()
+            yield "".join(pieces), bit_length
+
+    def _decode_symbols(self, text: str, end: int, writer: BitWriter):
+        """
+        Decode the symbols in text up to the given end, writing their
+        path codes to the given writer.
+        """
+        symbol_index = self.symbol_index
+        symbol_length = self.symbol_length
+        for start_index in range(0, end, symbol_length):
+            this_symbol = text[start_index:start_index + symbol_length]
+            entry = symbol_index.get(this_symbol)
+            if entry is None:
+                raise ValueError(
+                    "Symbol \"{}\" was not found in the Huffman "
+                    "tree.".format(this_symbol))
+            writer.write(*entry)
+
+
+def _encode_block(encoder: HuffmanEncoder, bits: Bits) -> str:
+    """
+    Encode one block of a message with chunked framing.
+
+    :return: the cover text of the header and the block
+    """
+    symbols = encoder._encode_symbols(BitReader.from_bits(bits), True)
+    header = int_to_bits(len(bits), CHUNK_HEADER_FIELD_LENGTH) + \
+        int_to_bits(symbols.__len__(), CHUNK_HEADER_FIELD_LENGTH)
+    header_symbols = encoder._encode_symbols(
+        BitReader.from_bits(header), True)
+    return "".join(header_symbols) + "".join(symbols)
+
+
+def _decode_partition(decoder: HuffmanDecoder, text: str) -> Bits:
+    """
+    Decode a partition of whole symbols of a cover text.
+
+    :return: the path codes of the symbols
+    """
+    writer = BitWriter()
+    decoder._decode_symbols(text, text.__len__(), writer)
+    return writer.to_bits()
+
+
+def _decode_block(decoder: HuffmanDecoder, text: str,
+                  bit_length: int) -> Bits:
+    """
+    Decode one block of a cover text with chunked framing.
+
+    :return: the bits of the message in the block
+    """
+    bits = _decode_partition(decoder, text)
+    if len(bits) < bit_length:
+        raise ValueError(
+            "Block of cover text was too short for expected {} bits "
+            "of data.".format(bit_length))
+    # The rest of the last symbol of the block is padding
+    return bits[:bit_length]
+
+
+def _build_lookup_table(leaf_codes: List[LeafCode], width: int,
+                        depth: int, lookup_bits: int) -> list:
+    """
+    Build a lookup table for the given leaf codes, indexed by the
+    width bits that follow the first depth bits of every code.
+
+    Every entry is a tuple of a symbol, its code length and None; or,
+    for codes that are too long for this table, a tuple of None, the
+    width of a fallback table and the fallback table itself.
+    """
+    table = [None] * (1 << width)
+    overflow = {}
+    for symbol, code, length in leaf_codes:
+        tail_length = length - depth
+        tail = code & ((1 << tail_length) - 1)
+        if tail_length <= width:
+            start = tail << (width - tail_length)
+            for index in range(start,
+                               start + (1 << (width - tail_length))):
+                if table[index] is not None:
+                    raise HuffmanError(
+                        "The path codes in the given Huffman tree "
+                        "were not prefix-free")
+                table[index] = (symbol, length, None)
+        else:
+            index = tail >> (tail_length - width)
+            overflow.setdefault(index, []).append(
+                (symbol, code, length))
+
+    for index, codes in overflow.items():
+        if table[index] is not None:
+            raise HuffmanError(
+                "The path codes in the given Huffman tree were not "
+                "prefix-free")
+        sub_width = min(lookup_bits, max(
+            length for _, _, length in codes) - depth - width)
+        table[index] = (None, sub_width,
+                        _build_lookup_table(codes, sub_width,
+                                            depth + width,
+                                            lookup_bits))
+    return table
+
+
+def create_tree(string_definitions: StringDefinitions,
+                canonical=False,
+                max_code_length: int = None) -> Tuple[int, HuffmanTree]:
     """
     Construct Huffman tree with all leaf nodes containing values
     according to
@@ -109,28 +781,183 @@ def create_tree(string_definitions: StringDefinitions) -> Tuple[
 
     :param string_definitions: the set of tuples of values and
     their frequencies
+    :param canonical: if true, rearrange the tree so that its path
+    codes will be canonical Huffman codes
+    :param max_code_length: if given, limit the depth of the tree, as
+    in limit_tree_depth
     :return: the created tree
     """
-    pq = queue.PriorityQueue()
+    if not string_definitions:
+        raise ValueError("Cannot create a tree from no symbols.")
+    heap = []
 
+    # Symbols are pushed in a fixed order so that the tree does not
+    # depend on the iteration order of the set
     for symbol in sorted(string_definitions):
-        # Create 1-node trees from each symbol and add to queue with
+        # Create 1-node trees from each symbol and add to heap with
         # frequency as priority
         new_node = HuffmanTree(value=symbol)
-        pq.put((symbol[1], new_node))
+        heapq.heappush(heap, _HeapEntry(symbol[1], new_node))
 
-    while pq.qsize() > 1:
+    while len(heap) > 1:
         # Take out the two smallest trees and create a new tree with
         # them as children
-        right, left = pq.get(), pq.get()
+        right, left = heapq.heappop(heap).pair(), \
+            heapq.heappop(heap).pair()
         new_tree = HuffmanTree(left, right)
-        pq.put((left[0] + right[0], new_tree))
+        heapq.heappush(heap, _HeapEntry(left[0] + right[0], new_tree))
 
-    return pq.get()
+    huffman_tree = heap[0].pair()
+    if max_code_length is not None:
+        huffman_tree = limit_tree_depth(huffman_tree, max_code_length)
+    if canonical:
+        return canonicalise_tree(huffman_tree)
+    return huffman_tree
+
+
+def create_tree_from_sorted(symbols: List[Symbol],
+                            canonical=False,
+                            max_code_length: int = None) -> Tuple[
+        int, HuffmanTree]:
+    """
+    Construct Huffman tree with all leaf nodes containing values
+    according to their frequencies, from a list of symbols that is
+    already sorted by frequency (in either direction), such as a
+    frequency analysis file.
+
+    This takes linear time, because the merged subtrees are created in
+    order of priority and can be kept in a second queue alongside the
+    leaves. On equal priorities, leaves are taken before merged
+    subtrees, and earlier leaves before later ones.
+
+    :param symbols: the list of tuples of values and their
+    frequencies, sorted by frequency
+    :param canonical: if true, rearrange the tree so that its path
+    codes will be canonical Huffman codes
+    :param max_code_length: if given, limit the depth of the tree, as
+    in limit_tree_depth
+    :return: the created tree
+    """
+    if not symbols:
+        raise ValueError("Cannot create a tree from no symbols.")
+    frequencies = [symbol[1] for symbol in symbols]
+    if any(x < y for x, y in zip(frequencies, frequencies[1:])):
+        if any(x > y for x, y in zip(frequencies, frequencies[1:])):
+            raise ValueError("The given symbols were not sorted by "
+                             "frequency.")
+    else:
+        symbols = symbols[::-1]
+
+    leaves = [(symbol[1], HuffmanTree(value=symbol))
+              for symbol in symbols]
+    merged = []
+    leaf_index = 0
+    merged_index = 0
+
+    def pop_smallest():
+        nonlocal leaf_index, merged_index
+        if merged_index < len(merged) and (
+                leaf_index == len(leaves) or
+                merged[merged_index][0] < leaves[leaf_index][0]):
+            merged_index += 1
+            return merged[merged_index - 1]
+        leaf_index += 1
+        return leaves[leaf_index - 1]
+
+    for _ in range(len(leaves) - 1):
+        right, left = pop_smallest(), pop_smallest()
+        merged.append((left[0] + right[0], HuffmanTree(left, right)))
+
+    huffman_tree = merged[-1] if merged else leaves[0]
+    if max_code_length is not None:
+        huffman_tree = limit_tree_depth(huffman_tree, max_code_length)
+    if canonical:
+        return canonicalise_tree(huffman_tree)
+    return huffman_tree
+
+
+def get_limited_code_lengths(symbols: List[Symbol],
+                             max_code_length: int) -> List[
+        Tuple[Symbol, int]]:
+    """
+    Find the optimal code lengths for the given symbols, such that no
+    code is longer than the given maximum, using the package-merge
+    algorithm.
+
+    Starting from the leaves, sorted by frequency, adjacent items are
+    repeatedly paired into packages and merged back with the leaves,
+    once for every level below the root. The length of each code is
+    then the number of times its leaf occurs among the cheapest
+    2n - 2 items.
+
+    :param symbols: the list of tuples of values and their frequencies
+    :param max_code_length: the maximum length of any code
+    :return: a list of the symbols paired with their code lengths
+    """
+    if not symbols:
+        raise ValueError("Cannot create a tree from no symbols.")
+    if max_code_length < 1:
+        raise ValueError("An invalid maximum code length was specified.")
+    if 1 << max_code_length < len(symbols):
+        raise ValueError(
+            "{} symbols cannot have codes of at most {} bits.".format(
+                len(symbols), max_code_length))
+    if len(symbols) == 1:
+        return [(symbols[0], 0)]
+
+    # Every item is a (weight, leaf index, package contents) tuple
+    leaves = [(symbols[index][1], index, None) for index in
+              sorted(range(len(symbols)),
+                     key=lambda i: (symbols[i][1], symbols[i][0]))]
+    items = leaves
+    for _ in range(max_code_length - 1):
+        packages = [(items[i][0] + items[i + 1][0], -1,
+                     (items[i], items[i + 1]))
+                    for i in range(0, len(items) - 1, 2)]
+        items = list(heapq.merge(leaves, packages, key=lambda x: x[0]))
+
+    lengths = [0] * len(symbols)
+    stack = items[:2 * len(symbols) - 2]
+    while stack:
+        _, index, package = stack.pop()
+        if package is None:
+            lengths[index] += 1
+        else:
+            stack.extend(package)
+    return list(zip(symbols, lengths))
+
+
+def limit_tree_depth(huffman_tree: Tuple[int, HuffmanTree],
+                     max_code_length: int) -> Tuple[int, HuffmanTree]:
+    """
+    Rebuild the given Huffman tree, if any of its path codes are
+    longer than the given maximum, with the optimal code lengths
+    subject to that limit. The rebuilt tree has canonical path codes.
+
+    Shorter codes for the rarest symbols come at the cost of longer
+    codes for others; so symbols are encoded slightly less often in
+    proportion to their frequencies.
+
+    :param huffman_tree: the tuple containing a Huffman tree and its
+    cumulative priority
+    :param max_code_length: the maximum length of any path code
+    :return: a tree with no path code longer than max_code_length,
+    with path bits allocated if it was rebuilt
+    """
+    code_lengths = get_code_lengths(huffman_tree)
+    if max(length for _, length in code_lengths) <= max_code_length:
+        return huffman_tree
+    code_lengths = get_limited_code_lengths(
+        [value for value, _ in code_lengths], max_code_length)
+    values = {value[0]: value for value, _ in code_lengths}
+    leaf_codes = get_canonical_codes(
+        [(value[0], length) for value, length in code_lengths])
+    return tree_from_codes([(values[symbol], code, length)
+                            for symbol, code, length in leaf_codes])
 
 
 def allocate_path_bits(huffman_tree: Tuple[int, HuffmanTree],
-                       prefix: Bits = None):
+                       prefix: Bits = None, canonical=False):
     """
     Walk the given HuffmanTree and allocate bits to every path.
 
@@ -144,23 +971,160 @@ def allocate_path_bits(huffman_tree: Tuple[int, HuffmanTree],
     :param prefix: the cumulative bits for the path up until this
     node.
     Leave empty when calling on the whole tree.
+    :param canonical: if true, first rearrange the subtrees of the
+    given tree, keeping every symbol at the same depth, so that the
+    allocated path codes are canonical Huffman codes
     """
     tree = huffman_tree[1]
-    tree.path_code = prefix
+    if canonical:
+        canonical_tree = canonicalise_tree(huffman_tree)[1]
+        tree.left = canonical_tree.left
+        tree.right = canonical_tree.right
+
+    stack = [(tree, prefix)]
+    while stack:
+        tree, path_code = stack.pop()
+        tree.path_code = path_code
+
+        if tree.right is not None:
+            if path_code is None:
+                right_code = one_bit
+            else:
+                right_code = path_code.__add__(one_bit)
+            stack.append((tree.right[1], right_code))
+
+        if tree.left is not None:
+            if path_code is None:
+                left_code = zero_bit
+            else:
+                left_code = path_code.__add__(zero_bit)
+            stack.append((tree.left[1], left_code))
 
-    if tree.left is not None:
-        if prefix is None:
-            left_code = zero_bit
-        else:
-            left_code = prefix.__add__(zero_bit)
-        allocate_path_bits(tree.left, left_code)
 
-    if tree.right is not None:
-        if prefix is None:
-            right_code = one_bit
+def get_code_lengths(huffman_tree: Tuple[int, HuffmanTree]) -> List[
+        Tuple[Symbol, int]]:
+    """
+    Walk the given Huffman tree and find the depth of every leaf
+    node, which is the length of its path code.
+
+    :param huffman_tree: the tuple containing a Huffman tree and its
+    cumulative priority
+    :return: a list of leaf values paired with their code lengths
+    """
+    if isinstance(huffman_tree[1], MappedHuffmanTree):
+        return [((symbol, 0), length) for symbol, _, length in
+                huffman_tree[1].get_leaf_codes()]
+    code_lengths = []
+    stack = [(huffman_tree[1], 0)]
+    while stack:
+        tree, depth = stack.pop()
+        if tree.left is None and tree.right is None:
+            code_lengths.append((tree.value, depth))
         else:
-            right_code = prefix.__add__(one_bit)
-        allocate_path_bits(tree.right, right_code)
+            stack.append((tree.right[1], depth + 1))
+            stack.append((tree.left[1], depth + 1))
+    return code_lengths
+
+
+def get_canonical_codes(code_lengths: List[Tuple[str, int]]) -> \
+        List[LeafCode]:
+    """
+    Assign canonical Huffman codes to a list of symbols and their code
+    lengths. Symbols are ordered by code length, then by value, and
+    each is given the next available code of its length; so the codes
+    are entirely defined by the code lengths.
+
+    Runs in linear time if the input is already in canonical order.
+
+    :param code_lengths: a list of symbols and their code lengths
+    :return: a list of (symbol, code, code length) tuples, in
+    canonical order
+    """
+    leaf_codes = []
+    code = 0
+    previous_length = 0
+    for symbol, length in sorted(code_lengths,
+                                 key=lambda x: (x[1], x[0])):
+        code <<= length - previous_length
+        if code >= 1 << length:
+            raise HuffmanError(
+                "The given code lengths cannot form a prefix code")
+        leaf_codes.append((symbol, code, length))
+        code += 1
+        previous_length = length
+    return leaf_codes
+
+
+def tree_from_codes(leaf_codes: List[Tuple[Symbol, int, int]]) -> \
+        Tuple[int, HuffmanTree]:
+    """
+    Construct a Huffman tree with path bits allocated, in which every
+    leaf node is placed along its given path code. The priority of
+    every subtree is the sum of the frequencies of its leaves.
+
+    :param leaf_codes: a list of (value, code, code length) tuples,
+    where every value is a tuple of a symbol and its frequency
+    :return: the tuple containing the constructed tree and its
+    cumulative priority
+    """
+    root = [0, HuffmanTree()]
+    for value, code, length in leaf_codes:
+        node = root
+        node[0] += value[1]
+        for depth in range(length - 1, -1, -1):
+            tree = node[1]
+            if tree.value is not None:
+                raise HuffmanError(
+                    "The given path codes were not prefix-free")
+            if (code >> depth) & 1:
+                if tree.right is None:
+                    tree.right = [0, HuffmanTree()]
+                node = tree.right
+            else:
+                if tree.left is None:
+                    tree.left = [0, HuffmanTree()]
+                node = tree.left
+            node[0] += value[1]
+        if node[1].left is not None or node[1].value is not None:
+            raise HuffmanError(
+                "The given path codes were not prefix-free")
+        node[1].value = value
+
+    # Freeze every [priority, tree] pair into the expected tuple
+    stack = [root[1]]
+    while stack:
+        tree = stack.pop()
+        if tree.left is not None:
+            tree.left = tuple(tree.left)
+            stack.append(tree.left[1])
+        if tree.right is not None:
+            tree.right = tuple(tree.right)
+            stack.append(tree.right[1])
+    huffman_tree = (root[0], root[1])
+    allocate_path_bits(huffman_tree)
+    return huffman_tree
+
+
+def canonicalise_tree(huffman_tree: Tuple[int, HuffmanTree]) -> \
+        Tuple[int, HuffmanTree]:
+    """
+    Construct a copy of the given Huffman tree in which every symbol
+    is at the same depth, but the leaves are arranged so that the
+    path codes are canonical Huffman codes.
+
+    :param huffman_tree: the tuple containing a Huffman tree and its
+    cumulative priority
+    :return: the canonical tree, with path bits allocated
+    """
+    tree = huffman_tree[1]
+    if tree.left is None and tree.right is None:
+        return huffman_tree
+    code_lengths = get_code_lengths(huffman_tree)
+    values = {value[0]: value for value, _ in code_lengths}
+    leaf_codes = get_canonical_codes(
+        [(value[0], length) for value, length in code_lengths])
+    return tree_from_codes([(values[symbol], code, length)
+                            for symbol, code, length in leaf_codes])
 
 
 def get_tree_leaf_codes(huffman_tree: Tuple[int, HuffmanTree]) -> set:
@@ -174,17 +1138,19 @@ def get_tree_leaf_codes(huffman_tree: Tuple[int, HuffmanTree]) -> set:
     cumulative priority
     :return: a set of path codes
     """
+    if isinstance(huffman_tree[1], MappedHuffmanTree):
+        return set(int_to_bits(code, length) for _, code, length
+                   in huffman_tree[1].get_leaf_codes())
     path_codes = set()
-    tree = huffman_tree[1]
-
-    if tree.left is None and tree.right is None:
-        path_codes.add(tree.path_code)
-        return path_codes
-    else:
-        left_set = get_tree_leaf_codes(tree.left)
-        right_set = get_tree_leaf_codes(tree.right)
-        path_codes = left_set.union(right_set)
-        return path_codes
+    stack = [huffman_tree[1]]
+    while stack:
+        tree = stack.pop()
+        if tree.left is None and tree.right is None:
+            path_codes.add(tree.path_code)
+        else:
+            stack.append(tree.right[1])
+            stack.append(tree.left[1])
+    return path_codes
 
 
 def get_set_average_length(input_set: set):
@@ -231,79 +1197,51 @@ def encode_bits_as_strings(tree: HuffmanTree, bits: Bits,
     exactly, it
     will append 0s until the function can complete.
 
+    This compiles a HuffmanEncoder on every call; use one directly to
+    encode several messages with the same tree.
+
     :param tree: a Huffman tree with path bits allocated
     :param bits: the input bits
-    :param string_prefix: the so-far accumulated string. Leave
-    empty when
-    calling manually
-    :return: a Tuple of the remaining bits and the accumulated
-    string made up
-    of symbols in the Huffman tree
+    :param string_prefix: a string to prepend to the output
+    :return: a Tuple of the remaining (always empty) bits and the
+    accumulated string made up of symbols in the Huffman tree
     """
     if bits is None or bits.__eq__(Bits()):
         return Bits(), string_prefix
 
-    if tree.left is not None and tree.right is not None:
-        # This tree has subtrees
-        left_tree = tree.left[1]
-        right_tree = tree.right[1]
+    return Bits(), string_prefix + HuffmanEncoder(tree).encode(bits)
 
-        if left_tree.path_code is None or right_tree.path_code is \
-                None:
-            raise HuffmanError(
-                "When encoding bits as strings, a node was missing "
-                "a path code")
-        else:
-            if bits.startswith(left_tree.path_code):
-                remaining_bits, accumulated_string = \
-                    encode_bits_as_strings(
-                    left_tree, bits, string_prefix)
-            elif bits.startswith(right_tree.path_code):
-                remaining_bits, accumulated_string = \
-                    encode_bits_as_strings(
-                    right_tree, bits, string_prefix)
-            else:
-                # Binary sequence does not match a leaf value. Must
-                # pad with 0s
-                padded_bits = bits.__add__(zero_bit)
-                return padded_bits, string_prefix
 
-            if tree.path_code is None:
-                # This tree is a root node
-                if bits is None:
-                    # We are out of bits, so we can return the
-                    # final string
-                    return remaining_bits, accumulated_string
-                else:  # Continue recursively processing the
-                    # remaining bits
-                    return encode_bits_as_strings(tree,
-                                                  remaining_bits,
-                                                  accumulated_string)
-            else:
-                return remaining_bits, accumulated_string
-    elif tree.left is None and tree.right is None:  # This tree is
-        # a leaf node
-        if tree.path_code is None:
+def get_leaf_codes(huffman_tree: HuffmanTree) -> List[LeafCode]:
+    """
+    Walk the given Huffman tree and collect the symbol and path code
+    of every leaf node. Each path code is given as an unsigned integer
+    and its length in bits.
+
+    :param huffman_tree: a Huffman tree with path bits allocated
+    :return: a list of (symbol, code, code length) tuples
+    """
+    if isinstance(huffman_tree, MappedHuffmanTree):
+        return huffman_tree.get_leaf_codes()
+    leaf_codes = []
+    stack = [huffman_tree]
+    while stack:
+        tree = stack.pop()
+        if tree.left is None and tree.right is None:
+            if tree.path_code is None or len(tree.path_code) == 0:
+                raise HuffmanError(
+                    "When collecting leaf codes, a leaf node was "
+                    "missing a path code")
+            leaf_codes.append((tree.value[0], tree.path_code.uint,
+                               len(tree.path_code)))
+        elif tree.left is None or tree.right is None:
             raise HuffmanError(
-                "When encoding bits as strings, a leaf node was"
-                " missing a path code")
+                "The given Huffman tree contained a node with "
+                "exactly 1 child tree")
         else:
-            if bits.startswith(tree.path_code):
-                accumulated_string = string_prefix + tree.value[0]
-                if bits.__eq__(tree.path_code):
-                    remaining_bits = None
-                else:
-                    remaining_bits = bits[tree.path_code.length:]
-                return remaining_bits, accumulated_string
-            else:
-                warnings.warn(
-                    "When encoding bits as strings, some unencodable"
-                    " bits were left over")
-                return bits, string_prefix
-    else:
-        raise HuffmanError(
-            "The given Huffman tree contained a node with exactly 1 "
-            "child tree")
+            stack.append(tree.right[1])
+            stack.append(tree.left[1])
+    return leaf_codes
 
 
 def search_tree_for_symbol(huffman_tree: HuffmanTree,
@@ -313,30 +1251,48 @@ def search_tree_for_symbol(huffman_tree: HuffmanTree,
     code of the
     leaf node containing that value.
 
+    To look up many symbols, build an index with get_symbol_index
+    instead.
+
     :param huffman_tree: a Huffman tree with path bits allocated
     :param symbol: the symbol to search for
     :return: the bits corresponding to the given symbol
     """
-    if huffman_tree.left is not None and huffman_tree.right is not \
-            None:
-        left_tree = huffman_tree.left[1]
-        right_tree = huffman_tree.right[1]
+    if isinstance(huffman_tree, MappedHuffmanTree):
+        for this_symbol, code, length in huffman_tree.get_leaf_codes():
+            if this_symbol.__eq__(symbol):
+                return int_to_bits(code, length)
+        return None
+    stack = [huffman_tree]
+    while stack:
+        tree = stack.pop()
+        if tree.left is not None and tree.right is not None:
+            stack.append(tree.right[1])
+            stack.append(tree.left[1])
+        elif tree.value[0].__eq__(symbol):
+            return tree.path_code
 
-        left_result = search_tree_for_symbol(left_tree, symbol)
-        if left_result is not None:
-            return left_result
 
-        right_result = search_tree_for_symbol(right_tree, symbol)
-        if right_result is not None:
-            return right_result
-    else:
-        if huffman_tree.value[0].__eq__(symbol):
-            return huffman_tree.path_code
+def get_symbol_index(huffman_tree: HuffmanTree) -> SymbolIndex:
+    """
+    Build an index from every symbol in the given Huffman tree to the
+    path code of its leaf node, as an unsigned integer and a length
+    in bits.
+
+    The index can be built once and reused to encode any number of
+    strings with the same tree.
+
+    :param huffman_tree: a Huffman tree with path bits allocated
+    :return: a dictionary of symbols to (code, code length) pairs
+    """
+    return {symbol: (code, length) for symbol, code, length in
+            get_leaf_codes(huffman_tree)}
 
 
 def encode_string_as_bits(huffman_tree: HuffmanTree,
                           input_string: str,
-                          symbol_length: int) -> Bits:
+                          symbol_length: int,
+                          symbol_index: SymbolIndex = None) -> Bits:
     """
     Given a string of characters, use the HuffmanTree to to encode
     it as a
@@ -350,40 +1306,12 @@ def encode_string_as_bits(huffman_tree: HuffmanTree,
     :param input_string: the cover text to convert into bits
     :param symbol_length: the correct symbol length used to encode
     the text
+    :param symbol_index: the symbol index of the Huffman tree, if
+    already built
     :return: the secret message contained within the cover text
     """
-    if symbol_length < 1:
-        raise ValueError("An invalid symbol length was specified.")
-
-    cover_text_length = input_string.__len__()
-    if symbol_length > cover_text_length:
-        warnings.warn(
-            "Cover text is smaller than the given symbol length. "
-            "Padding with"
-            " spaces.")
-        padding = " " * (symbol_length - cover_text_length)
-        input_string = input_string.__add__(padding)
-        cover_text_length = input_string.__len__()
-    elif not cover_text_length % symbol_length == 0:
-        warnings.warn(
-            "Cover text is not a multiple of the given symbol length."
-            " Padding with spaces.")
-        padding = " " * (symbol_length - (
-                    cover_text_length % symbol_length))
-        input_string = input_string.__add__(padding)
-        cover_text_length = input_string.__len__()
-    reps = cover_text_length // symbol_length
-
-    bits = Bits()
-    for x in range(0, reps):
-        start_index = symbol_length * x
-        this_symbol = input_string[
-                      start_index:start_index + symbol_length]
-        symbol_bits = search_tree_for_symbol(huffman_tree,
-                                             this_symbol)
-        bits = bits.__add__(symbol_bits)
-
-    return bits
+    return HuffmanDecoder(huffman_tree, symbol_length,
+                          symbol_index).decode(input_string)
 
 
 def has_given_symbol_length(huffman_tree: Tuple[int, HuffmanTree],
@@ -398,6 +1326,8 @@ def has_given_symbol_length(huffman_tree: Tuple[int, HuffmanTree],
     if huffman_tree is None or huffman_tree[1] is None:
         raise ValueError("Given Huffman tree was None.")
     tree = huffman_tree[1]
+    if isinstance(tree, MappedHuffmanTree):
+        return tree.get_symbol(0).__len__() == symbol_length
 
     while value.__eq__(""):
         if tree.value is not None:
@@ -418,24 +1348,29 @@ def tree_to_symbols(huffman_tree: Tuple[int, HuffmanTree]) -> List[
     :return: a list containing all nodes in that tree in ascending
     value order
     """
-    this_tree = huffman_tree[1]
-    left_tree = this_tree.left
-    right_tree = this_tree.right
-
-    if left_tree is not None and right_tree is not None:
-        this_list = tree_to_symbols(left_tree)
-        for item in tree_to_symbols(right_tree):
-            bisect.insort_left(this_list, item)
-    else:  # Leaf node
-        this_list = list()
-        this_tuple = this_tree.value[0], this_tree.value[
-            1], this_tree.path_code
-        this_list.append(this_tuple)
-
-    return this_list
-
-
-def create_from_analysis(analysis_filename=DEFAULT_ANALYSIS_FILE):
+    if isinstance(huffman_tree[1], MappedHuffmanTree):
+        symbols = [(symbol, 0, int_to_bits(code, length))
+                   for symbol, code, length in
+                   huffman_tree[1].get_leaf_codes()]
+        symbols.sort(key=lambda x: (x[0], x[1]))
+        return symbols
+    symbols = list()
+    stack = [huffman_tree[1]]
+    while stack:
+        tree = stack.pop()
+        if tree.left is not None and tree.right is not None:
+            stack.append(tree.right[1])
+            stack.append(tree.left[1])
+        else:  # Leaf node
+            symbols.append((tree.value[0], tree.value[1],
+                            tree.path_code))
+
+    symbols.sort(key=lambda x: (x[0], x[1]))
+    return symbols
+
+
+def create_from_analysis(analysis_filename=DEFAULT_ANALYSIS_FILE,
+                         presorted=False, max_code_length: int = None):
     """
     Read a frequency analysis file and construct a Huffman tree,
     without path
@@ -443,11 +1378,23 @@ def create_from_analysis(analysis_filename=DEFAULT_ANALYSIS_FILE):
 
     :param analysis_filename: The relative location of the analysis
     file.
+    :param presorted: If true, the analysis file must be sorted by
+    frequency, and the tree is constructed in linear time.
+    :param max_code_length: If given, the maximum depth of the tree.
     :return: A Huffman tree without bits allocated to each node
     """
+    if presorted:
+        symbols = TextAnalyser.read_analysis_list(analysis_filename)
+        if symbols:
+            return create_tree_from_sorted(
+                symbols, max_code_length=max_code_length)
+        else:
+            raise IOError("Could not read or generate text analysis")
+
     string_definitions = TextAnalyser.read_analysis(analysis_filename)
     if string_definitions:
-        tree = create_tree(string_definitions)
+        tree = create_tree(string_definitions,
+                           max_code_length=max_code_length)
         return tree
     else:
         raise IOError("Could not read or generate text analysis")
@@ -481,7 +1428,7 @@ def deserialise_tree(tree_dict: dict) -> Optional[
     """
     Convert a serialised tree to a tuple containing a Huffman tree
     object.
-    The integer paired with the tree is added only to preserve the
+    The integer paired with every tree is added only to preserve the
     expected
     structure.
 
@@ -490,50 +1437,200 @@ def deserialise_tree(tree_dict: dict) -> Optional[
     """
     if tree_dict is None or tree_dict.__eq__({}):
         return None
-    tree = HuffmanTree()
+    root = HuffmanTree()
 
-    tree.value = tree_dict.get("value")
-    if tree.value is not None:
-        tree.value = (tree.value, 0)
+    stack = [(tree_dict, root)]
+    while stack:
+        node_dict, tree = stack.pop()
 
-    path_code = tree_dict.get("path_code")
-    if path_code is None:
-        tree.path_code = None
-    else:
-        tree.path_code = Bits(bin=path_code)
+        tree.value = node_dict.get("value")
+        if tree.value is not None:
+            tree.value = (tree.value, 0)
+
+        path_code = node_dict.get("path_code")
+        if path_code is None:
+            tree.path_code = None
+        else:
+            tree.path_code = Bits(bin=path_code)
 
-    tree.left = deserialise_tree(tree_dict.get("left"))
-    tree.right = deserialise_tree(tree_dict.get("right"))
+        left_dict = node_dict.get("left")
+        if left_dict is None or left_dict.__eq__({}):
+            tree.left = None
+        else:
+            tree.left = 0, HuffmanTree()
+            stack.append((left_dict, tree.left[1]))
+
+        right_dict = node_dict.get("right")
+        if right_dict is None or right_dict.__eq__({}):
+            tree.right = None
+        else:
+            tree.right = 0, HuffmanTree()
+            stack.append((right_dict, tree.right[1]))
+
+    return 0, root
+
+
+def deserialise_canonical_tree(code_lengths: list) -> \
+        Tuple[int, HuffmanTree]:
+    """
+    Convert a serialised list of symbols and their code lengths to a
+    tuple containing a Huffman tree object with canonical path codes.
+
+    :param code_lengths: serialised list of [symbol, code length]
+    pairs
+    :return: a tuple of 0 and a Huffman tree
+    """
+    if not code_lengths:
+        raise ValueError("Serialised tree contained no code lengths.")
+    leaf_codes = get_canonical_codes(
+        [(symbol, length) for symbol, length in code_lengths])
+    _, tree = tree_from_codes([((symbol, 0), code, length)
+                               for symbol, code, length in leaf_codes])
     return 0, tree
 
 
+def serialise_canonical_tree(tree: HuffmanTree) -> str:
+    """
+    Serialise a Huffman tree with canonical path codes as a JSON
+    list of symbols and their code lengths, one pair per line.
+
+    :param tree: a Huffman tree with canonical path codes allocated
+    :return: the serialised tree
+    """
+    leaf_codes = get_leaf_codes(tree)
+    canonical_codes = get_canonical_codes(
+        [(symbol, length) for symbol, _, length in leaf_codes])
+    if sorted(leaf_codes) != sorted(canonical_codes):
+        raise HuffmanError(
+            "The given Huffman tree did not have canonical path "
+            "codes.")
+    pairs = ",\n".join(json.dumps([symbol, length])
+                       for symbol, _, length in canonical_codes)
+    return "{{\"{}\": [\n{}\n]}}\n".format(CANONICAL_TREE_KEY, pairs)
+
+
+def serialise_binary_tree(tree: HuffmanTree) -> bytes:
+    """
+    Serialise a Huffman tree in the binary format read by
+    MappedHuffmanTree. Path codes are implied by the structure of the
+    tree, with 0 for every left and 1 for every right child.
+
+    :param tree: a Huffman tree
+    :return: the serialised tree
+    """
+    left = array("i")
+    right = array("i")
+    symbol_offsets = array("I", [0])
+    code_lengths = array("H")
+    blob = bytearray()
+    root = 0
+
+    # Every stacked node is paired with the child array and index
+    # where its reference is stored, if it is not the root
+    stack = [(tree, 0, None, 0)]
+    while stack:
+        node, depth, references, index = stack.pop()
+        if node.left is None and node.right is None:
+            reference = ~code_lengths.__len__()
+            blob += node.value[0].encode("utf-8")
+            symbol_offsets.append(blob.__len__())
+            code_lengths.append(depth)
+        elif node.left is None or node.right is None:
+            raise HuffmanError(
+                "The given Huffman tree contained a node with "
+                "exactly 1 child tree")
+        else:
+            reference = left.__len__()
+            left.append(0)
+            right.append(0)
+            stack.append((node.right[1], depth + 1, right, reference))
+            stack.append((node.left[1], depth + 1, left, reference))
+        if references is None:
+            root = reference
+        else:
+            references[index] = reference
+
+    if sys.byteorder != "little":
+        for values in (left, right, symbol_offsets, code_lengths):
+            values.byteswap()
+    header = BINARY_TREE_HEADER.pack(BINARY_TREE_MAGIC,
+                                     BINARY_TREE_VERSION,
+                                     left.__len__(),
+                                     code_lengths.__len__(), root)
+    return b"".join((header, left.tobytes(), right.tobytes(),
+                     symbol_offsets.tobytes(), code_lengths.tobytes(),
+                     bytes(blob)))
+
+
+def open_tree(tree_filename: str) -> Tuple[int, MappedHuffmanTree]:
+    """
+    Open a binary tree file as a memory-mapped Huffman tree.
+
+    :param tree_filename: the path of the file
+    :return: a tuple of 0 and the mapped tree
+    """
+    try:
+        with open(tree_filename, "rb") as handle:
+            buffer = mmap.mmap(handle.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+    except (IOError, ValueError):
+        raise ValueError(
+            "Could not read tree file {}.".format(tree_filename))
+    return 0, MappedHuffmanTree(buffer)
+
+
 def load_tree(tree_filename=DEFAULT_TREE_FILE) -> \
-        Optional[Tuple[int, HuffmanTree]]:
+        Optional[Tuple[int, Union[HuffmanTree, MappedHuffmanTree]]]:
     """
-    Attempt to load a JSON file as a Huffman tree object.
+    Attempt to load a JSON file as a Huffman tree object. The file
+    may contain either a full serialised tree or, for trees with
+    canonical path codes, only a list of code lengths. A binary tree
+    file is opened as a memory-mapped tree instead.
     :param tree_filename: the path of the file
     :return: the tree object, as long as the file is valid
     """
     try:
+        with open(tree_filename, "rb") as handle:
+            is_binary = handle.read(len(BINARY_TREE_MAGIC)).__eq__(
+                BINARY_TREE_MAGIC)
+        if is_binary:
+            return open_tree(tree_filename)
         with open(tree_filename, "r", encoding="utf-8") as handle:
             data = json.load(handle)
+            if isinstance(data, dict) and CANONICAL_TREE_KEY in data:
+                return deserialise_canonical_tree(
+                    data.get(CANONICAL_TREE_KEY))
             return deserialise_tree(data)
     except IOError:
         raise ValueError(
             "Could not read tree file {}.".format(tree_filename))
 
 
-def save_tree(tree: HuffmanTree, tree_filename=DEFAULT_TREE_FILE):
+def save_tree(tree: HuffmanTree, tree_filename=DEFAULT_TREE_FILE,
+              tree_format=TREE_FORMAT_JSON):
     """
     Save a Huffman tree object as a JSON file.
     :param tree: a Huffman tree object
     :param tree_filename: the desired path of the file
+    :param tree_format: the format of the file; either a full
+    serialised tree, a list of code lengths for a tree with
+    canonical path codes, or a binary tree file
     :return:
     """
+    if tree_format not in TREE_FORMATS:
+        raise ValueError(
+            "Unknown tree format \"{}\".".format(tree_format))
     try:
+        if tree_format == TREE_FORMAT_BINARY:
+            with open(tree_filename, "wb") as handle:
+                handle.write(serialise_binary_tree(tree))
+            return
         with open(tree_filename, "w", encoding="utf-8") as handle:
-            json.dump(tree, handle, indent=2,
-                      default=lambda o: o.__dict__())
+            if tree_format == TREE_FORMAT_CANONICAL:
+                handle.write(serialise_canonical_tree(tree))
+            else:
+                json.dump(tree, handle, indent=2,
+                          default=lambda o: o.__dict__())
     except IOError:
         raise ValueError(
             "Could not write tree file {}.".format(tree_filename))
@@ -1,7 +1,11 @@
 import json
 import random
+from array import array
+from bisect import bisect_left
 from itertools import accumulate
-from typing import Tuple, Set, Optional, Union
+from types import ModuleType
+from typing import Tuple, Set, Optional, Union, List, Iterator, \
+    Callable, Sequence
 
 State = str
 Probability = float
@@ -11,6 +15,10 @@ Transitions = Set[Transition]
 DEFAULT_MARKOV_FILE = "..\\sample\\markov_chain.json"
 
 START_STATE_LABEL = "s0"
+START_STATE_ID = 0
+
+# Either a random.Random instance or the random module itself
+RandomSource = Union[random.Random, ModuleType]
 
 
 class MarkovError(Exception):
@@ -26,12 +34,9 @@ class StateTransitions:
     label and non-zero probability.
     """
     def __init__(self, transitions: Set[Tuple[State, Probability]]):
-        input_transitions = dict(
-            (label, prob) for label, prob in transitions)
-        self.transitions = {}
-        for key, value in input_transitions.items():
-            if value > 0:
-                self.transitions[key] = value
+        input_transitions = dict(transitions)
+        self.transitions = {key: value for key, value in
+                            input_transitions.items() if value > 0}
 
     def __dict__(self):
         serial_dict = {}
@@ -39,6 +44,14 @@ class StateTransitions:
             serial_dict.update({k: v})
         return serial_dict
 
+    # __dict__ is replaced for serialisation, so the attributes to
+    # pickle are given explicitly
+    def __getstate__(self):
+        return {"transitions": self.transitions}
+
+    def __setstate__(self, state):
+        self.transitions = state["transitions"]
+
 
 class MarkovChain:
     """
@@ -51,11 +64,13 @@ class MarkovChain:
     * Any state except s0 may have a transition to s0.
     * Ignoring all transitions to s0, the chain must have no cycles.
     * No transition has probability 0.
+    * Every state reachable from s0 must have outbound transitions.
 
     It is possible that the Markov chain is made up of multiple
     connected components and is not fully connected,
     so not all states are guaranteed to be reachable from s0. Care
-    should be taken when defining transitions.
+    should be taken when defining transitions. The states which are
+    not reachable are kept in unreachable_states.
     """
 
     def __init__(self, states: Set[Union[State, Tuple[State, str]]]):
@@ -77,6 +92,8 @@ class MarkovChain:
             self.markov_chain.update({state: None})
 
         self.current_state = START_STATE_LABEL
+        self.unreachable_states = set()
+        self._compiled = None
 
     def __dict__(self):
         serial_dict = {}
@@ -92,6 +109,22 @@ class MarkovChain:
         serial_dict.update({"chain": chain})
         return serial_dict
 
+    def __getstate__(self):
+        # The compiled chain is not pickled, and is rebuilt when next
+        # needed
+        return {"states": self.states, "wt_refs": self.wt_refs,
+                "markov_chain": self.markov_chain,
+                "current_state": self.current_state,
+                "unreachable_states": self.unreachable_states}
+
+    def __setstate__(self, state):
+        self.states = state["states"]
+        self.wt_refs = state["wt_refs"]
+        self.markov_chain = state["markov_chain"]
+        self.current_state = state["current_state"]
+        self.unreachable_states = state["unreachable_states"]
+        self._compiled = None
+
     def get_current_word_type(self) -> Optional[str]:
         """
         Retrieve the word-type referred to by the current state.
@@ -133,17 +166,15 @@ class MarkovChain:
         """
         self.validate_transitions(transitions)
 
+        markov_chain = self.markov_chain
         for from_state, to_state, prob in transitions:
-            outbound_transitions = self.markov_chain.get(from_state)
+            outbound_transitions = markov_chain.get(from_state)
             if outbound_transitions is None:
-                # noinspection PyTypeChecker
-                self.markov_chain.update(
-                    {from_state: StateTransitions({(to_state, prob)})}
-                )
-            else:
-                self.markov_chain.get(from_state).transitions.update(
-                    {to_state: prob})
-        self.find_cycles()
+                outbound_transitions = StateTransitions(set())
+                markov_chain[from_state] = outbound_transitions
+            outbound_transitions.transitions[to_state] = prob
+        self._compiled = None
+        self.unreachable_states = self.find_cycles()
 
     def validate_transitions(self, transitions: Transitions):
         error_messages = set()
@@ -191,24 +222,27 @@ class MarkovChain:
                 "The given transitions were invalid: \n{}".format(
                     error_messages))
 
-    def find_cycles(self, current_state=START_STATE_LABEL,
-                    visited=None, stack=None):
-        if stack is None:
-            stack = []
-        if visited is None:
-            visited = set()
-
-        transitions = self.markov_chain.get(current_state).transitions
-        visited.add(current_state)
-        for outbound_state in transitions.keys():
-            if outbound_state in stack:
-                if not outbound_state.__eq__(START_STATE_LABEL):
-                    raise MarkovError(
-                        "Found a loop at transition {} to {}".format(
-                            current_state, outbound_state))
-            if outbound_state not in visited:
-                self.find_cycles(outbound_state, visited,
-                                 stack + [current_state])
+    def find_cycles(self, current_state=START_STATE_LABEL) -> \
+            Set[State]:
+        """
+        Walk every state reachable from the given state, to check that
+        there are no cycles except through s0, and that every state
+        reached has outbound transitions. The walk is iterative, and
+        linear in the number of transitions.
+
+        :param current_state: the state to start from
+        :return: the set of states which are not reachable from the
+        given state
+        """
+        reachable = set()
+        for _ in _post_order(self, current_state, reachable):
+            pass
+        for state in reachable:
+            if self.markov_chain.get(state) is None:
+                raise MarkovError(
+                    "State {} is reachable, but has no outbound "
+                    "transitions.".format(state))
+        return self.states - reachable - {START_STATE_LABEL}
 
     def get_outbound_transitions(self) -> StateTransitions:
         """
@@ -247,14 +281,196 @@ class MarkovChain:
         probabilities of all transitions outbound from the current
         state. Set the current state to that state.
         """
-        accum = self.accumulate_transitions()
-        total = accum[len(accum) - 1][1]
-        rand = random.uniform(0, total)
-        for state, prob in accum:
-            if rand <= prob:
-                print("Transitioning to {}".format(state))
-                self.current_state = state
-                return
+        compiled = self.compile()
+        state_id = compiled.transition(
+            compiled.state_ids[self.current_state])
+        self.current_state = compiled.states[state_id]
+
+    def compile(self) -> "CompiledMarkovChain":
+        """
+        Get the compiled form of this Markov chain, for walking it
+        quickly. It is compiled when first needed, and again only
+        after the transitions have been set.
+
+        :return: the compiled chain
+        """
+        if self._compiled is None:
+            self._compiled = CompiledMarkovChain(self)
+        return self._compiled
+
+
+class CompiledMarkovChain:
+    """
+    An immutable snapshot of a Markov chain, with every state given an
+    integer id, and s0 given START_STATE_ID.
+
+    The outbound transitions of every state are stored in flat arrays
+    of target state ids and accumulated probabilities, ordered by
+    target state id; the transitions of the state with id i are at
+    the indexes from offsets[i] to offsets[i + 1]. The next state is
+    chosen by a binary search of the accumulated probabilities.
+
+    Ids are given to states in order of their labels, so that the same
+    random numbers always choose the same states, however the chain
+    was built.
+    """
+
+    def __init__(self, chain: MarkovChain):
+        self.states: List[State] = [START_STATE_LABEL] + sorted(
+            chain.states - {START_STATE_LABEL})
+        self.state_ids = {state: state_id for state_id, state in
+                          enumerate(self.states)}
+        self.word_types: List[Optional[str]] = [
+            chain.wt_refs.get(state) for state in self.states]
+
+        self.targets = array("i")
+        self.accumulated = array("d")
+        self.offsets = array("i", [0])
+        for state in self.states:
+            outbound_transitions = chain.markov_chain.get(state)
+            if outbound_transitions is not None:
+                transitions = sorted(
+                    (self.state_ids[to_state], prob) for to_state, prob
+                    in outbound_transitions.transitions.items())
+                self.targets.extend(
+                    to_state for to_state, _ in transitions)
+                self.accumulated.extend(
+                    accumulate(prob for _, prob in transitions))
+            self.offsets.append(self.targets.__len__())
+
+    def get_word_type(self, state_id: int) -> Optional[str]:
+        """
+        Retrieve the word-type referred to by the state of the given
+        id. Returns None for s0.
+
+        :param state_id: the id of the state
+        :return: the word-type
+        """
+        if state_id == START_STATE_ID:
+            return None
+        word_type = self.word_types[state_id]
+        if word_type is None:
+            raise ValueError(
+                "No state of name {} exists in the Markov "
+                "chain.".format(self.states[state_id]))
+        return word_type
+
+    def transition(self, state_id: int, rng: RandomSource = random) \
+            -> int:
+        """
+        Choose the next state to transition to based on the
+        probabilities of all transitions outbound from the given
+        state.
+
+        :param state_id: the id of the current state
+        :param rng: the source of random numbers; by default, the
+        shared random module
+        :return: the id of the next state
+        """
+        start = self.offsets[state_id]
+        end = self.offsets[state_id + 1]
+        if start == end:
+            raise MarkovError(
+                "State {} has no outbound transitions.".format(
+                    self.states[state_id]))
+        rand = rng.uniform(0, self.accumulated[end - 1])
+        index = bisect_left(self.accumulated, rand, start, end - 1)
+        return self.targets[index]
+
+
+class ChainWalker:
+    """
+    A walk through a compiled Markov chain. The walker holds the
+    current state and its own source of random numbers, so that one
+    chain can be walked by many walkers at once, and a walk can be
+    repeated by giving the same seed.
+    """
+
+    def __init__(self, chain: Union[MarkovChain, CompiledMarkovChain],
+                 rng: random.Random = None, seed=None):
+        """
+        :param chain: the chain to walk, which is compiled if it is
+        not already
+        :param rng: the source of random numbers
+        :param seed: if no source of random numbers is given, the seed
+        of a new one; if neither is given, the shared random module is
+        used
+        """
+        if isinstance(chain, MarkovChain):
+            chain = chain.compile()
+        self.chain = chain
+        if rng is not None:
+            self.rng = rng
+        elif seed is not None:
+            self.rng = random.Random(seed)
+        else:
+            self.rng = random
+        self.state = START_STATE_ID
+
+    @property
+    def current_state(self) -> State:
+        return self.chain.states[self.state]
+
+    def get_current_word_type(self) -> Optional[str]:
+        """
+        Retrieve the word-type referred to by the current state.
+        Returns None if current state is s0.
+
+        :return: the word-type
+        """
+        return self.chain.get_word_type(self.state)
+
+    def transition(self) -> int:
+        """
+        Move to the next state, chosen based on the probabilities of
+        all transitions outbound from the current state.
+
+        :return: the id of the next state
+        """
+        self.state = self.chain.transition(self.state, self.rng)
+        return self.state
+
+
+def _post_order(chain: MarkovChain, from_state: State,
+                done: Set[State]) -> Iterator[State]:
+    """
+    Walk the chain depth-first from the given state, ignoring every
+    transition to s0, and yield each state only after every state it
+    leads to. States in the given set are not walked again, and every
+    state yielded is added to it.
+
+    :return: an iterator of states
+    """
+    markov_chain = chain.markov_chain
+
+    # The states are walked in sorted order, so that any loop reported
+    # does not depend on the order of iteration over sets
+    def outbound_states(state: State) -> Iterator[State]:
+        transitions = markov_chain.get(state)
+        return iter(() if transitions is None
+                    else sorted(transitions.transitions.keys()))
+
+    in_progress = {from_state}
+    stack = [(from_state, outbound_states(from_state))]
+    while stack:
+        state, outbound = stack[-1]
+        for outbound_state in outbound:
+            if outbound_state in done or \
+                    outbound_state.__eq__(START_STATE_LABEL):
+                continue
+            if outbound_state in in_progress:
+                raise MarkovError(
+                    "Found a loop at transition {} to {}".format(
+                        state, outbound_state))
+            in_progress.add(outbound_state)
+            stack.append((outbound_state,
+                          outbound_states(outbound_state)))
+            break
+        else:
+            stack.pop()
+            in_progress.discard(state)
+            done.add(state)
+            yield state
 
 
 def get_number_of_paths(chain: MarkovChain,
@@ -264,26 +480,99 @@ def get_number_of_paths(chain: MarkovChain,
     Calculate the total number of distinct paths to s0 in the
     chain, starting from the given state.
 
+    Every state is counted once, after the states it leads to, so the
+    time taken is linear in the number of transitions.
+
+    :param path_counts: a dictionary to fill in with the number of
+    paths from every state counted; states already in it are not
+    counted again
     :return: the number of paths
     """
     if path_counts is None:
         path_counts = {}
 
-    outbound_states = set(
-        chain.markov_chain.get(from_state).transitions.keys())
-    number_of_paths = 0
+    for state in _post_order(chain, from_state, set(path_counts)):
+        transitions = chain.markov_chain.get(state)
+        number_of_paths = 0
+        if transitions is not None:
+            for outbound_state in transitions.transitions.keys():
+                if outbound_state.__eq__(START_STATE_LABEL):
+                    number_of_paths += 1
+                else:
+                    number_of_paths += path_counts.get(outbound_state)
+        path_counts.update({state: number_of_paths})
 
-    if START_STATE_LABEL in outbound_states:
-        number_of_paths += 1
-        outbound_states.remove(START_STATE_LABEL)
+    return path_counts.get(from_state)
 
-    for state in outbound_states:
-        number_of_paths += get_number_of_paths(chain, state,
-                                               path_counts)
 
-    path_counts.update({from_state: number_of_paths})
+def get_expected_total(chain: MarkovChain,
+                       state_value: Callable[[State], float],
+                       from_state=START_STATE_LABEL,
+                       expected_totals=None) -> float:
+    """
+    Calculate the expected sum of some value of every state visited
+    on a walk through the chain to s0, starting from the given state.
+    The value of the starting state itself is not included.
+
+    e.g. with a value of 1 for every state, the expected number of
+    words in a sentence
+
+    :param state_value: a function giving the value of a state
+    :param expected_totals: a dictionary to fill in with the expected
+    total from every state calculated; states already in it are not
+    calculated again
+    :return: the expected total
+    """
+    if expected_totals is None:
+        expected_totals = {}
+
+    tuple_totals = {state: (total,)
+                    for state, total in expected_totals.items()}
+    get_expected_totals(chain, (state_value,), from_state, tuple_totals)
+    expected_totals.update({state: totals[0]
+                            for state, totals in tuple_totals.items()})
+
+    return expected_totals.get(from_state)
 
-    return number_of_paths
+
+def get_expected_totals(chain: MarkovChain,
+                        state_values: Sequence[Callable[[State], float]],
+                        from_state=START_STATE_LABEL,
+                        expected_totals=None) -> Tuple[float, ...]:
+    """
+    Calculate the expected sums of several values of every state
+    visited on a walk through the chain to s0, starting from the given
+    state, all in a single walk of the chain. The values of the
+    starting state itself are not included.
+
+    :param state_values: functions each giving a value of a state
+    :param expected_totals: a dictionary to fill in with the tuple of
+    expected totals from every state calculated; states already in it
+    are not calculated again
+    :return: a tuple of the expected totals, one for each function
+    """
+    if expected_totals is None:
+        expected_totals = {}
+
+    no_totals = (0.0,) * state_values.__len__()
+    for state in _post_order(chain, from_state, set(expected_totals)):
+        transitions = chain.markov_chain.get(state)
+        if transitions is None:
+            expected_totals.update({state: no_totals})
+            continue
+        expected_total = [0.0] * state_values.__len__()
+        total_prob = 0.0
+        for outbound_state, prob in transitions.transitions.items():
+            total_prob += prob
+            if not outbound_state.__eq__(START_STATE_LABEL):
+                onward_totals = expected_totals.get(outbound_state)
+                for i, state_value in enumerate(state_values):
+                    expected_total[i] += prob * (
+                        state_value(outbound_state) + onward_totals[i])
+        expected_totals.update({state: tuple(
+            total / total_prob for total in expected_total)})
+
+    return expected_totals.get(from_state)
 
 
 def deserialise_markov_chain(markov_dict: dict) -> MarkovChain:
@@ -307,18 +596,23 @@ def deserialise_markov_chain(markov_dict: dict) -> MarkovChain:
     states = set(wt_refs.keys()).union({START_STATE_LABEL})
     markov_chain = MarkovChain(states)
     markov_chain.wt_refs = wt_refs
-    transitions = set()
-    for state in states:
+    # Transitions are listed state by state, in the order of the file
+    transitions = []
+    for state in [START_STATE_LABEL] + [
+            x for x in wt_refs.keys() if not x.__eq__(START_STATE_LABEL)]:
         if chain.get(state) is None:
             print(
                 "State {} declared in word-type mappings, but not "
                 "used.".format(
                     state))
         else:
-            transitions.update(
-                {(state, x, y) for x, y in chain.get(state).items()})
+            transitions.extend(
+                (state, x, y) for x, y in chain.get(state).items())
     # noinspection PyTypeChecker
     markov_chain.set_transitions(transitions)
+    if markov_chain.unreachable_states.__len__() > 0:
+        print("States {} are not reachable from the start state.".format(
+            markov_chain.unreachable_states))
 
     return markov_chain
 
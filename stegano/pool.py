@@ -0,0 +1,65 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+# The model used by a worker process
+_worker_model = None
+
+
+def _init_worker(model: tuple):
+    global _worker_model
+    _worker_model = model
+
+
+def _call_with_worker_model(function, *arguments):
+    return function(*_worker_model, *arguments)
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """
+    :param workers: a number of worker processes, or None for one
+    worker for every CPU
+    :return: the number of worker processes to start
+    """
+    if workers is None:
+        return os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("Number of workers must be greater than 0.")
+    return workers
+
+
+def map_in_order(function, arguments: Iterable[tuple], model: tuple,
+                 workers: int, mp_context=None) -> Iterator:
+    """
+    Call a function with the model and each tuple of arguments, either
+    in this process or in a pool of worker processes, which each
+    receive a copy of the model once. Only a few calls per worker are
+    made ahead of the result being consumed, so the arguments may be
+    read lazily from a stream.
+
+    :param function: a module-level function, called with the items
+    of the model followed by the items of each tuple of arguments
+    :param arguments: an iterable of tuples of arguments
+    :param model: the leading arguments of every call
+    :param workers: the number of worker processes; if 1, every call
+    is made in this process
+    :param mp_context: the multiprocessing context used to start the
+    worker processes, if not the default
+    :return: an iterator of the results, in the order of the arguments
+    """
+    if workers == 1:
+        for argument in arguments:
+            yield function(*model, *argument)
+        return
+    with ProcessPoolExecutor(workers, mp_context, _init_worker,
+                             (model,)) as executor:
+        window = workers * 2
+        pending = deque()
+        for argument in arguments:
+            pending.append(executor.submit(_call_with_worker_model,
+                                           function, *argument))
+            if pending.__len__() >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -83,7 +83,17 @@ class TextAnalyser:
         Attempt to read the analysis file and return a set of
         tuples representing the analysis
         """
-        string_definitions = set()
+        return set(TextAnalyser.read_analysis_list(analysis_filename))
+
+    @staticmethod
+    def read_analysis_list(
+            analysis_filename=DEFAULT_ANALYSIS_FILE) -> list:
+        """
+        Attempt to read the analysis file and return a list of
+        tuples representing the analysis, in the order they appear in
+        the file
+        """
+        string_definitions = list()
         try:
             with open(analysis_filename, "r",
                       encoding="utf-8") as file:
@@ -96,7 +106,7 @@ class TextAnalyser:
                     if int(freq_tuple[
                                2]) > 0:  # Second part must be a
                         # natural integer
-                        string_definitions.add(
+                        string_definitions.append(
                             (freq_tuple[0], int(freq_tuple[2])))
                     else:
                         replaced = line.replace("\n", "")
@@ -1,13 +1,106 @@
 import json
-from typing import Tuple, Set, Dict
+import mmap
+import struct
+import sys
+from array import array
+from collections import Counter
+from typing import Tuple, Set, Dict, Optional, List, Iterable
 
 from bitstring import Bits
 
+from stegano.bitio import int_to_bits, read_array
+
 Mapping = Tuple[str, Bits]
 Mappings = Set[Mapping]
 
 DEFAULT_DICT_FILE = "..\\sample\\word_type_dict.json"
 
+DICT_FORMAT_JSON = "json"
+DICT_FORMAT_BINARY = "binary"
+DICT_FORMATS = [DICT_FORMAT_JSON, DICT_FORMAT_BINARY]
+
+# Binary dictionary files start with a header of the magic number, the
+# format version and the number of word-types, followed by a table of
+# one section per word-type: the offset and length of its name, its
+# number of words, the offset of its data and whether it encodes
+# spaces; all little-endian
+BINARY_DICT_MAGIC = b"WTDT"
+BINARY_DICT_VERSION = 1
+BINARY_DICT_HEADER = struct.Struct("<4sB3xI")
+BINARY_DICT_SECTION = struct.Struct("<IIIIB3x")
+# Codes are stored as unsigned 64-bit integers
+BINARY_DICT_MAX_CODE_LENGTH = 64
+
+
+class _Mappings(dict):
+    """
+    A dictionary of words to their bit-strings, which counts every
+    change made to it so that indexes built from it can be
+    invalidated.
+    """
+    __slots__ = ("version",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def _changed(self):
+        # Unpickling sets items before the version is restored
+        self.version = getattr(self, "version", 0) + 1
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def __ior__(self, other):
+        result = super().__ior__(other)
+        self._changed()
+        return result
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        result = super().setdefault(key, default)
+        self._changed()
+        return result
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self._changed()
+        return result
+
+    def popitem(self):
+        result = super().popitem()
+        self._changed()
+        return result
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+
+class EncodingIndex:
+    """
+    An index of the words in a mapping dictionary by their bit-strings,
+    for encoding. Each word is keyed by the length of its bit-string
+    and its value as an unsigned integer, so that a word can be found
+    with one lookup for each distinct bit-string length.
+    """
+
+    def __init__(self, mappings: Dict[str, Bits]):
+        # Later words replace earlier words with the same bit-string
+        self.words = {(len(bits), bits.uint if len(bits) > 0 else 0): word
+                      for word, bits in mappings.items()}
+        self.lengths = sorted(set(length for length, _ in self.words),
+                              reverse=True)
+        self.longest = self.lengths[0] if self.lengths else 0
+
 
 class MappingDictionary:
     """
@@ -19,12 +112,62 @@ class MappingDictionary:
     def __init__(self, mappings: Mappings, encode_spaces=True):
         input_mappings = dict(
             (string, bits) for string, bits in mappings)
-        self.mappings = {}
+        unique_mappings = {}
+        unique_values = set()
         for key, value in input_mappings.items():
-            if value not in self.mappings.values():
-                self.mappings[key] = value
+            if value not in unique_values:
+                unique_values.add(value)
+                unique_mappings[key] = value
+        self.mappings = unique_mappings
         self.encode_spaces = encode_spaces
 
+    @property
+    def mappings(self) -> Dict[str, Bits]:
+        return self._mappings
+
+    @mappings.setter
+    def mappings(self, mappings: Dict[str, Bits]):
+        self._mappings = _Mappings(mappings)
+        self._encoding_index = None
+
+    def get_encoding_index(self) -> EncodingIndex:
+        """
+        Get the encoding index of this dictionary's mappings. It is
+        built when first needed, and rebuilt only after the mappings
+        have changed.
+
+        :return: the encoding index
+        """
+        if self._encoding_index is None or \
+                self._encoding_index[0] != self._mappings.version:
+            self._encoding_index = (self._mappings.version,
+                                    EncodingIndex(self._mappings))
+        return self._encoding_index[1]
+
+    def get_expected_statistics(self) -> Tuple[float, float]:
+        """
+        Calculate the expected number of bits encoded by a word from
+        this dictionary, and its expected number of characters,
+        including any space before it. The bits encoded are assumed
+        to be uniformly random, so that each word is chosen with
+        probability proportional to 2^-(length of its bit-string).
+
+        :return: a tuple of the expected number of bits and of
+        characters
+        """
+        total_prob = 0.0
+        expected_bits = 0.0
+        expected_chars = 0.0
+        space_length = 1 if self.encode_spaces else 0
+        for word, bits in self.mappings.items():
+            prob = 2.0 ** -bits.__len__()
+            total_prob += prob
+            expected_bits += prob * bits.__len__()
+            expected_chars += prob * (word.__len__() + space_length)
+        if total_prob == 0:
+            return 0.0, 0.0
+        return expected_bits / total_prob, expected_chars / total_prob
+
     def __dict__(self):
         serial_dict = {}
         serial_dict.update({"encode_spaces": self.encode_spaces})
@@ -33,15 +176,104 @@ class MappingDictionary:
         serial_dict.update({"mappings": d})
         return serial_dict
 
+    # __dict__ is replaced for serialisation, so the attributes to
+    # pickle are given explicitly. The encoding index is not pickled,
+    # and is rebuilt when next needed
+    def __getstate__(self):
+        return {"mappings": dict(self.mappings),
+                "encode_spaces": self.encode_spaces}
+
+    def __setstate__(self, state):
+        self.mappings = state["mappings"]
+        self.encode_spaces = state["encode_spaces"]
+
 
 WTDict = Dict[str, MappingDictionary]
 
+# Key of the entry in a trie node for the word ending at that node
+_WORD_KEY = ""
+
+
+class WordAutomaton:
+    """
+    A trie of every word in a word-type dictionary, for decoding. It
+    finds the longest word at any position of a cover text in a single
+    scan, comparing the text in lower case.
+    """
+
+    def __init__(self, wt_dict: WTDict):
+        self.root = {}
+        self.longest = 0
+        for word_type, mapping_dict in wt_dict.items():
+            for word, bits in mapping_dict.mappings.items():
+                node = self.root
+                for char in word:
+                    node = node.setdefault(char, {})
+                # A word under several word-types is decoded as the
+                # first of them
+                if _WORD_KEY not in node:
+                    node[_WORD_KEY] = (word, word_type, bits)
+                if word.__len__() > self.longest:
+                    self.longest = word.__len__()
+
+    def match(self, text: str, start=0, length_bound: int = None) -> \
+            Optional[Tuple[str, str, Bits]]:
+        """
+        Find the longest word at the given position of the text. The
+        word may not contain a space, except as its first character.
+
+        :param text: the text to search
+        :param start: the position of the first character of the word
+        :param length_bound: the maximum number of characters to scan
+        :return: a tuple of the word found, its word-type and its
+        bit-string; or None if no word was found
+        """
+        end = text.__len__()
+        if length_bound is not None and start + length_bound < end:
+            end = start + length_bound
+        node = self.root
+        found = None
+        for index in range(start, end):
+            char = text[index]
+            if char.__eq__(" ") and index > start:
+                break
+            for folded_char in char.lower():
+                node = node.get(folded_char)
+                if node is None:
+                    return found
+            entry = node.get(_WORD_KEY)
+            if entry is not None:
+                found = entry
+        return found
+
+
+def _index_words(index: Dict[str, Set[str]], lengths: Counter,
+                 word_type: str, words):
+    for word in words:
+        word_types = index.get(word)
+        if word_types is None:
+            index[word] = {word_type}
+            lengths[word.__len__()] += 1
+        else:
+            word_types.add(word_type)
+
 
 class WordTypeDictionary:
     """
     A word-type dictionary consists of unique mapping dictionaries.
+
+    It keeps an index of the word-types of every word, and the number
+    of words of every length, which its methods update as they change
+    the dictionary. If the mapping dictionaries are changed directly,
+    the index is rebuilt when next needed.
     """
     def __init__(self, wt_dict: WTDict):
+        # The word automaton and the sources it was built from
+        self._word_automaton = None
+        # The word index, the number of words of every length, and the
+        # sources they were built from, replaced together so that
+        # other threads never see them half-built
+        self._word_index = None
         if wt_dict is None:
             self.wt_dict = {}
         else:
@@ -61,6 +293,101 @@ class WordTypeDictionary:
             serial_dict.update({mapping_key: mapping_dict.__dict__()})
         return serial_dict
 
+    def __getstate__(self):
+        # The word index and automaton are not pickled, and are
+        # rebuilt when next needed
+        return {"wt_dict": self.wt_dict}
+
+    def __setstate__(self, state):
+        self.__init__(None)
+        self.wt_dict = state["wt_dict"]
+
+    def _get_sources(self) -> List[tuple]:
+        """
+        :return: the identity and version of every mapping dictionary,
+        to tell when a cached index has gone out of date
+        """
+        if self.wt_dict is None:
+            return []
+        return [(key, mapping_dict, mapping_dict.mappings,
+                 mapping_dict.mappings.version)
+                for key, mapping_dict in self.wt_dict.items()]
+
+    def _is_current(self, sources: Optional[List[tuple]]) -> bool:
+        if sources is None:
+            return False
+        wt_dict = {} if self.wt_dict is None else self.wt_dict
+        if sources.__len__() != wt_dict.__len__():
+            return False
+        for (key, mapping_dict), source in zip(wt_dict.items(),
+                                               sources):
+            if key is not source[0] or mapping_dict is not source[1] \
+                    or mapping_dict.mappings is not source[2] \
+                    or mapping_dict.mappings.version != source[3]:
+                return False
+        return True
+
+    def _get_indexes(self) -> Tuple[Dict[str, Set[str]], Counter]:
+        """
+        Get the index of every word to the set of word-types that
+        contain it, and the number of words of every length,
+        rebuilding them first if they are out of date.
+
+        :return: a tuple of the word index and the word lengths
+        """
+        word_index = self._word_index
+        if word_index is None or not self._is_current(word_index[2]):
+            index = {}
+            lengths = Counter()
+            if self.wt_dict is not None:
+                for key, mapping_dict in self.wt_dict.items():
+                    _index_words(index, lengths, key,
+                                 mapping_dict.mappings)
+            word_index = (index, lengths, self._get_sources())
+            self._word_index = word_index
+        return word_index[0], word_index[1]
+
+    def _get_word_index(self) -> Dict[str, Set[str]]:
+        """
+        :return: the index of every word to the set of word-types that
+        contain it
+        """
+        return self._get_indexes()[0]
+
+    # The methods below update the word index along with the mapping
+    # dictionaries, which it would otherwise be rebuilt from
+
+    def _index_words(self, word_type: str, words):
+        index, lengths, _ = self._word_index
+        _index_words(index, lengths, word_type, words)
+
+    def _unindex_word(self, word_type: str, word: str):
+        index, lengths, _ = self._word_index
+        word_types = index.get(word)
+        if word_types is None:
+            return
+        word_types.discard(word_type)
+        if word_types.__len__() == 0:
+            del index[word]
+            lengths[word.__len__()] -= 1
+            if lengths[word.__len__()] == 0:
+                del lengths[word.__len__()]
+
+    def _update_index_sources(self):
+        """
+        Mark the word index as up to date after this dictionary's
+        methods have changed both.
+        """
+        index, lengths, _ = self._word_index
+        self._word_index = (index, lengths, self._get_sources())
+
+    def get_longest_word_length(self) -> int:
+        """
+        :return: the length of the longest word in this dictionary,
+        under any word-type; or 0 if it is empty
+        """
+        return max(self._get_indexes()[1], default=0)
+
     def append_word_type(self, input_dict: WTDict):
         """
         Add to this word-type dictionary the mappings of another
@@ -73,6 +400,8 @@ class WordTypeDictionary:
         for key in input_keys:
             if input_dict.get(key).mappings.__eq__({}):
                 continue
+            if self.wt_dict is None:
+                self.wt_dict = {}
 
             mapping_dict = self.wt_dict.get(key)
 
@@ -83,13 +412,17 @@ class WordTypeDictionary:
             for duplicate_value in duplicate_values:
                 print("{} ({})".format(
                     duplicate_value[0], duplicate_value[1]))
-                del input_dict.get(key).mappings[duplicate_value[0]]
+                input_dict.get(key).mappings.pop(duplicate_value[0],
+                                                 None)
 
+            new_words = input_dict.get(key).mappings.keys()
             if mapping_dict is None:
                 self.wt_dict.update({key: input_dict.get(key)})
             else:
                 mapping_dict.mappings.update(
                     input_dict.get(key).mappings)
+            self._index_words(key, new_words)
+            self._update_index_sources()
 
     def contains_any_words_from_set(self, pairs: set,
                                     exclude_key=None) -> Set[
@@ -104,13 +437,12 @@ class WordTypeDictionary:
         dictionary
         :return: a subset of pairs
         """
-        words = set(key for key, value in pairs)
+        word_index = self._get_word_index()
         present_words = set()
-        for key, value in self.wt_dict.items():
-            if not key.__eq__(exclude_key):
-                for item in value.mappings:
-                    if item in words:
-                        present_words.add((item, key))
+        for word, _ in pairs:
+            for key in word_index.get(word, ()):
+                if key != exclude_key:
+                    present_words.add((word, key))
         return present_words
 
     def remove_word_type(self, word_types: set):
@@ -125,11 +457,16 @@ class WordTypeDictionary:
         """
         if len(word_types) == 0:
             return
+        self._get_word_index()
         for item in word_types:
-            if self.wt_dict.get(item) is not None:
+            if self.wt_dict is not None and \
+                    self.wt_dict.get(item) is not None:
+                for word in self.wt_dict.get(item).mappings:
+                    self._unindex_word(item, word)
                 del self.wt_dict[item]
-            if self.wt_dict.__eq__({}):
+            if self.wt_dict is not None and self.wt_dict.__eq__({}):
                 self.wt_dict = None
+        self._update_index_sources()
 
     def remove_word(self, word_types: set):
         """
@@ -144,16 +481,35 @@ class WordTypeDictionary:
         """
         if len(word_types) == 0:
             return
+        word_index = self._get_word_index()
         remove_word_types = set()
-        for key, value in self.wt_dict.items():
-            mappings = self.wt_dict.get(key).mappings
-            for item in word_types:
-                if mappings.get(item) is not None:
-                    del self.wt_dict.get(key).mappings[item]
-            if self.wt_dict.get(key).mappings.__eq__({}):
-                remove_word_types.add(key)
+        for item in word_types:
+            for key in tuple(word_index.get(item, ())):
+                mappings = self.wt_dict.get(key).mappings
+                del mappings[item]
+                if mappings.__eq__({}):
+                    remove_word_types.add(key)
+                self._unindex_word(key, item)
+        self._update_index_sources()
         self.remove_word_type(remove_word_types)
 
+    def get_word_automaton(self) -> WordAutomaton:
+        """
+        Get a word automaton over every word in this dictionary. It is
+        built when first needed, and rebuilt only after any word-type
+        or its mappings have changed.
+
+        :return: the word automaton
+        """
+        word_automaton = self._word_automaton
+        if word_automaton is None or \
+                not self._is_current(word_automaton[1]):
+            word_automaton = (WordAutomaton(
+                {} if self.wt_dict is None else self.wt_dict),
+                self._get_sources())
+            self._word_automaton = word_automaton
+        return word_automaton[0]
+
     def generate_state_definitions(self) -> list:
         """
         From this word-type dictionary, generate a list of distinct
@@ -185,16 +541,245 @@ def deserialise_dict(wt_dict: dict) -> WTDict:
     return deserialised_dict
 
 
-def load_dict(dict_filename=DEFAULT_DICT_FILE) -> WordTypeDictionary:
+class MappedWordTypeDictionary:
     """
-    Attempt to load a JSON file as a word-type dictionary object.
+    A read-only view of the word-types in a binary dictionary file,
+    which is usually memory-mapped. Only the section table is read
+    when the file is opened; the mappings of a word-type are read from
+    its section when it is asked for.
+
+    The data of each section is aligned to 8 bytes, and contains the
+    code of every word (uint64), the offset of every word in the
+    section's string blob followed by the blob's length (uint32), the
+    code length of every word (uint16), and the UTF-8 blob of all of
+    its words.
+    """
+
+    def __init__(self, buffer):
+        """
+        :param buffer: the contents of a binary dictionary file, as a
+        bytes object or memory map
+        """
+        if len(buffer) < BINARY_DICT_HEADER.size:
+            raise ValueError("The binary dictionary file was truncated.")
+        magic, version, section_count = \
+            BINARY_DICT_HEADER.unpack_from(buffer)
+        if magic != BINARY_DICT_MAGIC:
+            raise ValueError(
+                "The given file was not a binary dictionary.")
+        if version != BINARY_DICT_VERSION:
+            raise ValueError(
+                "Unsupported binary dictionary version {}.".format(
+                    version))
+        if len(buffer) < BINARY_DICT_HEADER.size + \
+                section_count * BINARY_DICT_SECTION.size:
+            raise ValueError("The binary dictionary file was truncated.")
+
+        self._buffer = buffer
+        self.sections = {}
+        for index in range(section_count):
+            name_offset, name_length, word_count, data_offset, \
+                encode_spaces = BINARY_DICT_SECTION.unpack_from(
+                    buffer, BINARY_DICT_HEADER.size +
+                    index * BINARY_DICT_SECTION.size)
+            if name_offset + name_length > len(buffer):
+                raise ValueError(
+                    "The binary dictionary file was truncated.")
+            name = bytes(buffer[name_offset:name_offset + name_length])
+            self.sections.update({name.decode("utf-8"): (
+                word_count, data_offset, bool(encode_spaces))})
+
+    @property
+    def word_types(self) -> List[str]:
+        return list(self.sections.keys())
+
+    def get_mapping_dict(self, word_type: str) -> \
+            Optional[MappingDictionary]:
+        """
+        Read the mappings of a word-type from its section.
+
+        :param word_type: the name of the word-type
+        :return: the mapping dictionary of the word-type; or None if
+        there is no such word-type
+        """
+        section = self.sections.get(word_type)
+        if section is None:
+            return None
+        word_count, position, encode_spaces = section
+        codes = word_offsets = code_lengths = None
+        try:
+            codes, position = read_array(self._buffer, position, "Q",
+                                         word_count)
+            word_offsets, position = read_array(self._buffer, position,
+                                                "I", word_count + 1)
+            code_lengths, position = read_array(self._buffer, position,
+                                                "H", word_count)
+            blob_end = position + word_offsets[word_count]
+            if blob_end > len(self._buffer):
+                raise ValueError(
+                    "The binary dictionary file was truncated.")
+            blob = bytes(self._buffer[position:blob_end])
+
+            # The values were unique when saved, so the mappings are
+            # set directly rather than deduplicated again
+            mappings = {}
+            for index in range(word_count):
+                word = blob[word_offsets[index]:word_offsets[index + 1]]
+                mappings[word.decode("utf-8")] = int_to_bits(
+                    codes[index], code_lengths[index])
+        finally:
+            # The memory map cannot be closed while any view of it is
+            # held, such as by the traceback of an error
+            for values in (codes, word_offsets, code_lengths):
+                if isinstance(values, memoryview):
+                    values.release()
+        mapping_dict = MappingDictionary(set(), encode_spaces)
+        mapping_dict.mappings = mappings
+        return mapping_dict
+
+    def to_wt_dict(self, word_types: Iterable[str] = None) -> WTDict:
+        """
+        Read the mappings of several word-types.
+
+        :param word_types: the names of the word-types to read, in any
+        order; or None to read all of them. Names which are not in the
+        file are ignored.
+        :return: a WTDict of the word-types read, in file order
+        """
+        if word_types is None:
+            names = self.sections.keys()
+        else:
+            word_types = set(word_types)
+            names = [name for name in self.sections.keys()
+                     if name in word_types]
+        return {name: self.get_mapping_dict(name) for name in names}
+
+    def close(self):
+        """
+        Release the underlying memory map, if any.
+        """
+        self.sections = {}
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+
+def serialise_binary_dict(dictionary: WordTypeDictionary) -> bytes:
+    """
+    Serialise a word-type dictionary in the binary format read by
+    MappedWordTypeDictionary.
+
+    :param dictionary: a dictionary object
+    :return: the serialised dictionary
+    """
+    wt_dict = {} if dictionary.wt_dict is None else dictionary.wt_dict
+    names = [name.encode("utf-8") for name in wt_dict.keys()]
+    position = BINARY_DICT_HEADER.size + \
+        names.__len__() * BINARY_DICT_SECTION.size
+    name_offsets = []
+    for name in names:
+        name_offsets.append(position)
+        position += name.__len__()
+
+    table = []
+    sections = []
+    for name, name_offset, mapping_dict in zip(names, name_offsets,
+                                               wt_dict.values()):
+        codes = array("Q")
+        word_offsets = array("I", [0])
+        code_lengths = array("H")
+        blob = bytearray()
+        for word, bits in mapping_dict.mappings.items():
+            if bits.__len__() > BINARY_DICT_MAX_CODE_LENGTH:
+                raise ValueError(
+                    "Word \"{}\" had a bit-string longer than {} "
+                    "bits.".format(word, BINARY_DICT_MAX_CODE_LENGTH))
+            codes.append(bits.uint if bits.__len__() > 0 else 0)
+            code_lengths.append(bits.__len__())
+            blob += word.encode("utf-8")
+            word_offsets.append(blob.__len__())
+        if sys.byteorder != "little":
+            for values in (codes, word_offsets, code_lengths):
+                values.byteswap()
+
+        padding = -position % 8
+        sections.append(bytes(padding))
+        position += padding
+        table.append(BINARY_DICT_SECTION.pack(
+            name_offset, name.__len__(), code_lengths.__len__(),
+            position, mapping_dict.encode_spaces))
+        section = b"".join((codes.tobytes(), word_offsets.tobytes(),
+                            code_lengths.tobytes(), bytes(blob)))
+        sections.append(section)
+        position += section.__len__()
+
+    header = BINARY_DICT_HEADER.pack(BINARY_DICT_MAGIC,
+                                     BINARY_DICT_VERSION, names.__len__())
+    return b"".join([header] + table + names + sections)
+
+
+def open_dict(dict_filename: str) -> MappedWordTypeDictionary:
+    """
+    Open a binary dictionary file as a memory-mapped dictionary.
+
+    :param dict_filename: the path of the file
+    :return: the mapped dictionary
+    """
+    try:
+        with open(dict_filename, "rb") as handle:
+            buffer = mmap.mmap(handle.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+    except (IOError, ValueError):
+        raise ValueError(
+            "Could not read dictionary file {}.".format(dict_filename))
+    try:
+        return MappedWordTypeDictionary(buffer)
+    except ValueError:
+        buffer.close()
+        raise
+
+
+def get_dict_format(dict_filename: str) -> str:
+    """
+    :param dict_filename: the path of a dictionary file
+    :return: the format of the file; JSON if it is not a binary
+    dictionary file, or could not be read
+    """
+    try:
+        with open(dict_filename, "rb") as handle:
+            if handle.read(len(BINARY_DICT_MAGIC)).__eq__(
+                    BINARY_DICT_MAGIC):
+                return DICT_FORMAT_BINARY
+    except IOError:
+        pass
+    return DICT_FORMAT_JSON
+
+
+def load_dict(dict_filename=DEFAULT_DICT_FILE,
+              word_types: Iterable[str] = None) -> WordTypeDictionary:
+    """
+    Attempt to load a JSON or binary file as a word-type dictionary
+    object.
 
     :param dict_filename: the path of the file
+    :param word_types: the names of the word-types to load; or None to
+    load all of them. Only these word-types are read from a binary
+    file.
     :return: the dictionary object, as long as the file is valid
     """
     try:
+        if get_dict_format(dict_filename) == DICT_FORMAT_BINARY:
+            mapped_dict = open_dict(dict_filename)
+            try:
+                wt_dict = mapped_dict.to_wt_dict(word_types)
+            finally:
+                mapped_dict.close()
+            return WordTypeDictionary(wt_dict)
         with open(dict_filename, "r", encoding="utf-8") as handle:
             data = json.load(handle)
+            if word_types is not None:
+                word_types = set(word_types)
+                data = {key: value for key, value in data.items()
+                        if key in word_types}
             wt_dict = deserialise_dict(data)
             return WordTypeDictionary(wt_dict)
     except IOError:
@@ -202,14 +787,24 @@ def load_dict(dict_filename=DEFAULT_DICT_FILE) -> WordTypeDictionary:
 
 
 def save_dict(dictionary: WordTypeDictionary,
-              dict_filename=DEFAULT_DICT_FILE):
+              dict_filename=DEFAULT_DICT_FILE,
+              dict_format=DICT_FORMAT_JSON):
     """
-    Save a word-type dictionary object as a JSON file.
+    Save a word-type dictionary object as a JSON or binary file.
 
     :param dictionary: a dictionary object
     :param dict_filename: the desired path of the file
+    :param dict_format: the format of the file
     """
+    if dict_format not in DICT_FORMATS:
+        raise ValueError(
+            "Unknown dictionary format \"{}\".".format(dict_format))
     try:
+        if dict_format == DICT_FORMAT_BINARY:
+            data = serialise_binary_dict(dictionary)
+            with open(dict_filename, "wb") as handle:
+                handle.write(data)
+            return
         with open(dict_filename, "w", encoding="utf-8") as handle:
             json.dump(dictionary, handle, indent=2,
                       default=lambda o: o.__dict__())
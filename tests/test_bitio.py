@@ -0,0 +1,105 @@
+import io
+import unittest
+
+from bitstring import Bits
+
+from stegano import bitio
+
+
+class TestBitReader(unittest.TestCase):
+    def test_read(self):
+        reader = bitio.BitReader.from_bits(Bits(bin="1011001110"))
+        self.assertEqual(10, reader.remaining())
+        self.assertEqual(0b101, reader.read(3))
+        self.assertEqual(0b10011, reader.read(5))
+        self.assertEqual(2, reader.remaining())
+        self.assertEqual(Bits(bin="10"), reader.to_bits())
+        self.assertRaises(ValueError, reader.read, 3)
+
+    def test_peek_padded(self):
+        reader = bitio.BitReader(b"\xff", 3)
+        self.assertEqual(0b111, reader.peek(3))
+        self.assertEqual(0b11100000, reader.peek(8))
+        self.assertEqual(0b1000, reader.peek(4, 2))
+        self.assertEqual(0, reader.peek(5, 20))
+        self.assertEqual(0, reader.position)
+
+    def test_skip(self):
+        reader = bitio.BitReader(b"\x0f\xf0")
+        reader.skip(4)
+        self.assertEqual(0xff, reader.read(8))
+        reader.skip(10)
+        self.assertEqual(0, reader.remaining())
+
+    def test_feed(self):
+        bits = Bits(bin="0110100111010001011101")
+        reader = bitio.BitReader()
+        for start in range(0, len(bits), 3):
+            reader.feed(bits[start:start + 3])
+            reader.skip(2)
+        self.assertEqual(len(bits) - 16, reader.remaining())
+        self.assertEqual(bits[16:], reader.to_bits())
+
+    def test_feed_bytes(self):
+        reader = bitio.BitReader(b"\xa0", 4)
+        reader.feed(b"\x5f\xff", 12)
+        self.assertEqual(16, reader.remaining())
+        self.assertEqual(0xa5ff, reader.read(16))
+
+
+class TestBitWriter(unittest.TestCase):
+    def test_write(self):
+        writer = bitio.BitWriter()
+        writer.write(0b101, 3)
+        writer.write_bits(Bits(bin="0011"))
+        writer.write(0, 0)
+        self.assertEqual(7, len(writer))
+        self.assertEqual(Bits(bin="1010011"), writer.to_bits())
+
+    def test_write_long(self):
+        bits = Bits(bytes=bytes(range(100)), length=797)
+        writer = bitio.BitWriter()
+        for start in range(0, len(bits), 13):
+            writer.write_bits(bits[start:start + 13])
+        self.assertEqual(bits, writer.to_bits())
+
+    def test_flush(self):
+        writer = bitio.BitWriter()
+        writer.write(0xabc, 12)
+        self.assertEqual(b"\xab", writer.flush())
+        self.assertEqual(b"", writer.flush())
+        writer.write(0xd, 4)
+        self.assertEqual(b"\xcd", writer.flush())
+        self.assertEqual(Bits(), writer.to_bits())
+        self.assertEqual(16, len(writer))
+
+
+class TestIntToBits(unittest.TestCase):
+    def test_int_to_bits(self):
+        self.assertEqual(Bits(bin="0011"), bitio.int_to_bits(3, 4))
+        self.assertEqual(Bits(), bitio.int_to_bits(0, 0))
+
+
+class TestStreams(unittest.TestCase):
+    def test_read_chunks(self):
+        self.assertEqual(["ab", "cd", "e"], list(bitio.read_chunks(io.StringIO("abcde"), 2)))
+        self.assertEqual([b"abc"], list(bitio.read_chunks(io.BytesIO(b"abc"), 4)))
+        self.assertEqual(["abc", "d"], list(bitio.read_chunks(["abc", "d"], 1)))
+
+    def test_split_bits(self):
+        bits = Bits(bin="0110100111010001011101")
+        pieces = list(bitio.split_bits([bits[:3], bits[3:].tobytes()[:1], bits[11:]], 5))
+        self.assertEqual([5, 5, 5, 5, 2], [len(piece) for piece in pieces])
+        self.assertEqual(bits, Bits().join(pieces))
+        self.assertEqual([], list(bitio.split_bits([], 5)))
+
+    def test_align_bits(self):
+        bits = Bits(bin="0110100111010001011101")
+        pieces = list(bitio.align_bits([bits[:3], bits[3:13], Bits(), bits[13:]]))
+        self.assertEqual([Bits(bin="01101001"), Bits(bin="11010001"), Bits(bin="011101")], pieces)
+        self.assertEqual(bits, bitio.join_bits([bits[:3], bits[3:13], bits[13:]]))
+        self.assertEqual(Bits(), bitio.join_bits([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,11 @@
+import io
+import random
 import unittest
 
 from bitstring import Bits
 
 from stegano import extendedcoder
-from stegano.markov import MarkovChain
+from stegano.markov import MarkovChain, ChainWalker
 from stegano.wtdict import MappingDictionary, WordTypeDictionary
 
 
@@ -27,6 +29,12 @@ class TestRetrieveWord(unittest.TestCase):
         word = extendedcoder.retrieve_word_from_mappings(bits, self.mapping_dict, True)
         self.assertEqual("dog", word)
 
+    def test_retrieve_word_after_change(self):
+        bits = Bits(bin="0111")
+        self.assertEqual("giraffe", extendedcoder.retrieve_word_from_mappings(bits, self.mapping_dict, True))
+        self.mapping_dict.mappings["elephant"] = Bits(bin="0111")
+        self.assertEqual("elephant", extendedcoder.retrieve_word_from_mappings(bits, self.mapping_dict, True))
+
     def test_retrieve_word_no_padding(self):
         bits = Bits(bin="1")
         self.assertRaises(ValueError, extendedcoder.retrieve_word_from_mappings, bits, self.mapping_dict, False)
@@ -101,6 +109,46 @@ class TestEncodeBits(unittest.TestCase):
         words = extendedcoder.encode_bits_as_words(self.markov_chain, self.wt_dict, bits, False)
         self.assertEqual(1, len(words))  # 1 word from stationery or animals
 
+    def test_encode_bits_as_string_seeded(self):
+        bits = Bits(bin="00101011100101010")
+        words = extendedcoder.encode_bits_as_words(self.markov_chain, self.wt_dict, bits, rng=random.Random(7))
+        self.assertListEqual(words, extendedcoder.encode_bits_as_words(self.markov_chain, self.wt_dict, bits,
+                                                                       rng=random.Random(7)))
+        self.assertEqual("s0", self.markov_chain.current_state)
+
+    def test_encode_bits_as_string_walker(self):
+        walker = ChainWalker(self.markov_chain, seed=7)
+        words = extendedcoder.encode_bits_as_words(walker, self.wt_dict, Bits(bin="01"), False)
+        self.assertEqual(1, len(words))
+        self.assertIn(walker.current_state, {"animals", "stationery"})
+        self.assertEqual("s0", self.markov_chain.current_state)
+
+    def test_expected_sentence_statistics(self):
+        expected_words, expected_bits, expected_chars = extendedcoder.get_expected_sentence_statistics(
+            self.markov_chain, self.wt_dict)
+        # animals is visited with probability 2/3, stationery 0.8 and x (colours) always
+        self.assertAlmostEqual(2 / 3 + 0.8 + 1, expected_words)
+        self.assertAlmostEqual(2 / 3 * 2.25 + 0.8 * 1.5 + 2.25, expected_bits)
+        self.assertGreater(expected_chars, expected_words)
+
+        self.wt_dict.remove_word_type({"colours"})
+        self.assertRaises(ValueError, extendedcoder.get_expected_sentence_statistics, self.markov_chain, self.wt_dict)
+
+    def test_expected_sentence_statistics_branched(self):
+        wt_dict = WordTypeDictionary({
+            "a": MappingDictionary({("cat", Bits(bin="0")), ("dog", Bits(bin="1"))}),
+            "b": MappingDictionary({("x", Bits(bin="0")), ("yy", Bits(bin="10")), ("zzz", Bits(bin="11"))}, False)})
+        markov_chain = MarkovChain({("s1", "a"), ("s2", "b")})
+        markov_chain.set_transitions({("s0", "s1", 1), ("s0", "s2", 3), ("s1", "s2", 1), ("s1", "s0", 1),
+                                      ("s2", "s0", 1)})
+        expected_words, expected_bits, expected_chars = extendedcoder.get_expected_sentence_statistics(
+            markov_chain, wt_dict)
+        # s1 is visited with probability 0.25 and s2 with 0.75 + 0.25 * 0.5
+        # a word of a encodes 1 bit in 4 characters, of b 1.5 bits in 0.5 * 1 + 0.25 * 2 + 0.25 * 3 characters
+        self.assertAlmostEqual(0.25 + 0.875, expected_words)
+        self.assertAlmostEqual(0.25 * 1 + 0.875 * 1.5, expected_bits)
+        self.assertAlmostEqual(0.25 * 4 + 0.875 * 1.75, expected_chars)
+
 
 class TestListToCoverText(unittest.TestCase):
     def setUp(self):
@@ -246,6 +294,97 @@ class TestEncodeMessage(unittest.TestCase):
         self.assertRaises(ValueError, extendedcoder.encode_message, self.markov_chain, self.wt_dict, bits,
                           header_length)
 
+    def test_encode_message_stream(self):
+        bits = Bits(bytes=bytes(range(40)))
+        cover_text = extendedcoder.encode_message(self.markov_chain, self.wt_dict, bits, 10, random.Random(3))
+        sentences = list(extendedcoder.encode_message_stream(self.markov_chain, self.wt_dict, io.BytesIO(bits.bytes),
+                                                             len(bits), 10, random.Random(3), chunk_size=3))
+        self.assertGreater(len(sentences), 1)
+        self.assertEqual(cover_text, "".join(sentences))
+
+        chunks = [bits[start:start + 7] for start in range(0, len(bits), 7)]
+        sentences = extendedcoder.encode_message_stream(self.markov_chain, self.wt_dict, chunks, len(bits), 10,
+                                                        random.Random(3))
+        self.assertEqual(cover_text, "".join(sentences))
+
+    def test_encode_message_stream_length(self):
+        bits = Bits(bin="0100101110010110100101")
+        cover_text = extendedcoder.encode_message(self.markov_chain, self.wt_dict, bits[:20], 6, random.Random(3))
+        sentences = extendedcoder.encode_message_stream(self.markov_chain, self.wt_dict, [bits], 20, 6,
+                                                        random.Random(3))
+        self.assertEqual(cover_text, "".join(sentences))
+        sentences = extendedcoder.encode_message_stream(self.markov_chain, self.wt_dict, [bits], 30, 6)
+        self.assertRaises(ValueError, list, sentences)
+
+    def test_get_block_header(self):
+        for block_length in [0, 1, 4096, 65535]:
+            header = extendedcoder.get_block_header(block_length)
+            self.assertEqual(extendedcoder.BLOCK_HEADER_LENGTH, len(header))
+            self.assertEqual(block_length, extendedcoder.get_block_length_from_header(header))
+        self.assertRaises(ValueError, extendedcoder.get_block_header, 65536)
+
+    def test_encode_message_chunked(self):
+        bits = Bits(bytes=bytes(range(256)) * 3)
+        cover_text = extendedcoder.encode_message(self.markov_chain, self.wt_dict, bits, rng=random.Random(3),
+                                                  framing=extendedcoder.FRAMING_CHUNKED)
+        message = extendedcoder.decode_cover_text(self.wt_dict, cover_text, framing=extendedcoder.FRAMING_CHUNKED)
+        self.assertEqual(bits, message)
+
+        sentences = extendedcoder.encode_message_stream(self.markov_chain, self.wt_dict, io.BytesIO(bits.bytes), None,
+                                                        rng=random.Random(3), chunk_size=100,
+                                                        framing=extendedcoder.FRAMING_CHUNKED)
+        self.assertEqual(cover_text, "".join(sentences))
+
+    def test_decode_cover_text_chunked_end(self):
+        bits = Bits(bin="0100101110010110100101")
+        cover_text = extendedcoder.encode_message(self.markov_chain, self.wt_dict, bits,
+                                                  framing=extendedcoder.FRAMING_CHUNKED)
+        pieces = extendedcoder.decode_cover_text_stream(self.wt_dict, [cover_text, " Unknown words."],
+                                                        framing=extendedcoder.FRAMING_CHUNKED)
+        self.assertEqual(bits, Bits().join(pieces))
+
+    def test_encode_message_segments(self):
+        bits = Bits(bytes=bytes(range(256)) * 2)
+        cover_text = "".join(extendedcoder.encode_message_segments(self.markov_chain, self.wt_dict, [bits],
+                                                                   random.Random(3), segment_length=1000))
+        self.assertEqual(4, cover_text.count(extendedcoder.SEGMENT_SEPARATOR))
+        parallel_cover_text = "".join(extendedcoder.encode_message_segments(
+            self.markov_chain, self.wt_dict, io.BytesIO(bits.bytes), random.Random(3), workers=2, segment_length=1000))
+        self.assertEqual(cover_text, parallel_cover_text)
+
+        message = extendedcoder.decode_cover_text(self.wt_dict, cover_text, framing=extendedcoder.FRAMING_SEGMENTED)
+        self.assertEqual(bits, message)
+        pieces = extendedcoder.decode_cover_text_stream(self.wt_dict, io.StringIO(cover_text), chunk_size=5,
+                                                        framing=extendedcoder.FRAMING_SEGMENTED)
+        self.assertEqual(bits, Bits().join(pieces))
+        pieces = extendedcoder.decode_cover_text_parallel(self.wt_dict, io.StringIO(cover_text), chunk_size=5,
+                                                          framing=extendedcoder.FRAMING_SEGMENTED, workers=2)
+        self.assertEqual(bits, Bits().join(pieces))
+
+    def test_decode_cover_text_parallel_chunked(self):
+        bits = Bits(bytes=bytes(range(256)) * 2)
+        cover_text = extendedcoder.encode_message(self.markov_chain, self.wt_dict, bits, rng=random.Random(3),
+                                                  framing=extendedcoder.FRAMING_CHUNKED)
+        for workers in (1, 2):
+            pieces = extendedcoder.decode_cover_text_parallel(self.wt_dict, [cover_text, " pen pen"],
+                                                              framing=extendedcoder.FRAMING_CHUNKED, workers=workers,
+                                                              partition_size=500)
+            self.assertEqual(bits, Bits().join(pieces))
+
+    def test_encode_message_segmented(self):
+        bits = Bits(bin="0100101110010110100101")
+        cover_text = extendedcoder.encode_message(self.markov_chain, self.wt_dict, bits, rng=random.Random(3),
+                                                  framing=extendedcoder.FRAMING_SEGMENTED)
+        self.assertNotIn(extendedcoder.SEGMENT_SEPARATOR, cover_text)
+        message = extendedcoder.decode_cover_text(self.wt_dict, cover_text, framing=extendedcoder.FRAMING_SEGMENTED)
+        self.assertEqual(bits, message)
+
+    def test_unknown_framing(self):
+        bits = Bits(bin="0100101110010110100101")
+        self.assertRaises(ValueError, extendedcoder.encode_message, self.markov_chain, self.wt_dict, bits,
+                          framing="unknown")
+        self.assertRaises(ValueError, extendedcoder.decode_cover_text, self.wt_dict, "pen", framing="unknown")
+
 
 class TestDecodeMessage(unittest.TestCase):
     def setUp(self):
@@ -323,6 +462,22 @@ class TestDecodeMessage(unittest.TestCase):
         self.assertEqual(Bits(bin="1"), trailing_bits)
         self.assertEqual(". every funny telephone!", cover_text)
 
+    def test_fixed_size_decode_at(self):
+        cover_text = "the scary dog. every funny telephone!"
+        bits, trailing_bits, offset = extendedcoder.fixed_size_decode_at(self.wt_dict, cover_text, 5)
+        self.assertEqual(Bits(bin="01101"), bits)
+        self.assertEqual(Bits(bin="1"), trailing_bits)
+        self.assertEqual(13, offset)
+        bits, trailing_bits, offset = extendedcoder.fixed_size_decode_at(self.wt_dict, cover_text, 1, offset)
+        self.assertEqual(Bits(bin="1"), bits)
+        self.assertEqual(15, offset)
+
+    def test_fixed_size_decode_at_whitespace(self):
+        cover_text = "  the\nscary \t dog"
+        bits, trailing_bits, offset = extendedcoder.fixed_size_decode_at(self.wt_dict, cover_text, 4)
+        self.assertEqual(Bits(bin="0110"), bits)
+        self.assertEqual(14, offset)
+
     def test_fixed_size_decode_short_message(self):
         cover_text = "the scary dog"
         self.assertRaises(ValueError, extendedcoder.fixed_size_decode, self.wt_dict, cover_text, 7)
@@ -336,3 +491,48 @@ class TestDecodeMessage(unittest.TestCase):
         cover_text = "the scary funny roof."  # header = b01 = d3. total = b011011011
         message = extendedcoder.decode_cover_text(self.wt_dict, cover_text, 2)
         self.assertEqual(Bits(bin="101"), message)
+
+    def test_decode_cover_text_stream(self):
+        cover_text = "the scary funny roof."
+        pieces = extendedcoder.decode_cover_text_stream(self.wt_dict, io.StringIO(cover_text), 3, chunk_size=1)
+        self.assertEqual(Bits(bin="011011"), Bits().join(pieces))
+        pieces = extendedcoder.decode_cover_text_stream(self.wt_dict, ["th", "e sc", "ary\n", " funny ro", "of."], 3)
+        self.assertEqual(Bits(bin="011011"), Bits().join(pieces))
+        self.assertEqual([], list(extendedcoder.decode_cover_text_stream(self.wt_dict, [], 3)))
+
+    def test_decode_cover_text_stream_pieces(self):
+        nouns = {"00": "sky", "01": "roof", "10": "telephone", "11": "dog"}
+        bits = Bits(bytes=bytes(range(1, 12)))
+        encoded = (extendedcoder.get_fixed_length_header(len(bits), 8) + bits).bin
+        cover_text = " ".join(nouns[encoded[start:start + 2]] for start in range(0, len(encoded), 2))
+        pieces = list(extendedcoder.decode_cover_text_stream(self.wt_dict, io.StringIO(cover_text), 8, chunk_size=16))
+        self.assertGreater(len(pieces), 1)
+        for piece in pieces[:-1]:
+            self.assertEqual(0, len(piece) % 8)
+        self.assertEqual(bits, Bits().join(pieces))
+
+    def test_decode_cover_text_stream_short(self):
+        pieces = extendedcoder.decode_cover_text_stream(self.wt_dict, ["the scary funny"], 3)
+        self.assertRaises(ValueError, list, pieces)
+        # The error gives the message length in the header, not the bits missing from the current piece
+        pieces = extendedcoder.decode_cover_text_stream(self.wt_dict, ["the scary funny"], 3, chunk_size=2)
+        self.assertRaisesRegex(ValueError, "expected 6 bits", list, pieces)
+
+    def test_decode_cover_text_parallel(self):
+        nouns = {"00": "sky", "01": "roof", "10": "telephone", "11": "dog"}
+        bits = Bits(bytes=bytes(range(1, 12)))
+        encoded = (extendedcoder.get_fixed_length_header(len(bits), 8) + bits).bin
+        cover_text = " ".join(nouns[encoded[start:start + 2]] for start in range(0, len(encoded), 2))
+        for workers in (1, 2):
+            pieces = list(extendedcoder.decode_cover_text_parallel(self.wt_dict, io.StringIO(cover_text), 8,
+                                                                   workers=workers, partition_size=20, chunk_size=16))
+            for piece in pieces[:-1]:
+                self.assertEqual(0, len(piece) % 8)
+            self.assertEqual(bits, Bits().join(pieces))
+
+    def test_decode_cover_text_parallel_unknown_word(self):
+        cover_text = "the scary funny roof. unknown"
+        pieces = extendedcoder.decode_cover_text_parallel(self.wt_dict, [cover_text], 3, workers=1, partition_size=4)
+        self.assertEqual(Bits(bin="011011"), Bits().join(pieces))
+        pieces = extendedcoder.decode_cover_text_parallel(self.wt_dict, [cover_text], 4, workers=1, partition_size=4)
+        self.assertRaises(extendedcoder.ExtendedCoderError, list, pieces)
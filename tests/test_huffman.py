@@ -1,3 +1,7 @@
+import io
+import json
+import os
+import tempfile
 import unittest
 from typing import Tuple, Set
 
@@ -33,6 +37,35 @@ class TestHuffman(unittest.TestCase):
         self.assertIsInstance(test_huffman[0], int)
         self.assertIsInstance(test_huffman[1], HuffmanTree)
 
+    def test_tree_created_deterministic(self):
+        serial_tree = huffman.create_tree(self.string_definitions)[1].__dict__()
+        for _ in range(3):
+            definitions = set(sorted(self.string_definitions, reverse=True))
+            self.assertDictEqual(serial_tree, huffman.create_tree(definitions)[1].__dict__())
+
+    def test_tree_created_empty(self):
+        self.assertRaises(ValueError, huffman.create_tree, set())
+        self.assertRaises(ValueError, huffman.create_tree_from_sorted, [])
+
+    def test_tree_created_from_sorted(self):
+        symbols = sorted(self.string_definitions, key=lambda x: x[1], reverse=True)
+        test_huffman = huffman.create_tree_from_sorted(symbols)
+        self.assertEqual(41, test_huffman[0])
+        self.assertTrue(has_correct_leaves(test_huffman))
+        huffman.allocate_path_bits(test_huffman)
+
+        # Both constructions must give optimal trees of the same total cost
+        reference = huffman.create_tree(self.string_definitions)
+        cost = lambda t: sum(v[1] * length for v, length in huffman.get_code_lengths(t))
+        self.assertEqual(cost(reference), cost(test_huffman))
+
+        ascending = huffman.create_tree_from_sorted(symbols[::-1])
+        self.assertEqual(cost(reference), cost(ascending))
+
+    def test_tree_created_from_unsorted(self):
+        symbols = [("a", 3), ("b", 5), ("c", 1)]
+        self.assertRaises(ValueError, huffman.create_tree_from_sorted, symbols)
+
     def test_serialise_tree(self):
         test_huffman = huffman.create_tree(self.string_definitions)
         serial_tree = test_huffman[1].__dict__()
@@ -177,6 +210,44 @@ class TestHuffman(unittest.TestCase):
         self.assertEqual(output[0], Bits())
         self.assertEqual(output[1], "")
 
+    def test_huffman_encoder(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        for lookup_bits in (1, 2, 3, huffman.DEFAULT_LOOKUP_BITS):
+            encoder = huffman.HuffmanEncoder(test_huffman[1], lookup_bits)
+            self.assertEqual("steganalysegana", encoder.encode(Bits(bin="010011101")))
+            self.assertEqual("stegaanalynalysstegastegaganal", encoder.encode(Bits(bin="011100011010110")))
+            self.assertEqual("", encoder.encode(Bits()))
+
+    def test_huffman_encoder_long_message(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        encoder = huffman.HuffmanEncoder(test_huffman[1], 2)
+        bits = Bits(bytes=bytes(range(256)) * 200)
+        cover_text = encoder.encode(bits)
+        self.assertEqual(0, len(cover_text) % 5)
+        decoded = huffman.encode_string_as_bits(test_huffman[1], cover_text[:5000], 5)
+        self.assertTrue(bits.startswith(decoded))
+
+    def test_huffman_encoder_stream(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        encoder = huffman.HuffmanEncoder(test_huffman[1], 2)
+        bits = Bits(bytes=bytes(range(256)) * 4) + Bits(bin="101")
+        expected = encoder.encode(bits)
+        for chunk_length in (1, 3, 5, 8, 100):
+            chunks = [bits[i:i + chunk_length] for i in range(0, len(bits), chunk_length)]
+            self.assertEqual(expected, "".join(encoder.encode_stream(chunks)))
+        stream = io.BytesIO(bits.tobytes())
+        self.assertEqual(encoder.encode(Bits(bytes=bits.tobytes())), "".join(encoder.encode_stream(stream, 7)))
+        self.assertEqual("", "".join(encoder.encode_stream([])))
+
+    def test_huffman_encoder_single_child(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        test_huffman[1].right = None
+        self.assertRaises(huffman.HuffmanError, huffman.HuffmanEncoder, test_huffman[1])
+
     def test_search_tree_for_symbol(self):
         test_huffman = huffman.create_tree(self.string_definitions)
         huffman.allocate_path_bits(test_huffman)
@@ -193,6 +264,81 @@ class TestHuffman(unittest.TestCase):
         bits = huffman.encode_string_as_bits(test_huffman[1], "stegaalysilysissis 0tegan", 5)
         self.assertEqual(bits, Bits(bin="0b0100101110111100000"))
 
+    def test_huffman_decoder_stream(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        encoder = huffman.HuffmanEncoder(test_huffman[1])
+        decoder = huffman.HuffmanDecoder(test_huffman[1], 5)
+        cover_text = encoder.encode(Bits(bytes=bytes(range(256)) * 4))
+        expected = huffman.encode_string_as_bits(test_huffman[1], cover_text, 5)
+        for chunk_length in (1, 3, 5, 7, 1000):
+            chunks = [cover_text[i:i + chunk_length] for i in range(0, len(cover_text), chunk_length)]
+            decoded = list(decoder.decode_stream(chunks))
+            self.assertEqual(expected, Bits().join(decoded))
+            self.assertTrue(all(len(bits) % 8 == 0 for bits in decoded[:-1]))
+        self.assertEqual(expected, Bits().join(decoder.decode_stream(io.StringIO(cover_text), 4)))
+
+    def test_huffman_decoder_stream_padding(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        decoder = huffman.HuffmanDecoder(test_huffman[1], 5)
+        with self.assertWarns(UserWarning):
+            bits = Bits().join(decoder.decode_stream(["st", "ega", "ysi", "s"]))
+        self.assertEqual(huffman.encode_string_as_bits(test_huffman[1], "stegaysis ", 5), bits)
+        self.assertRaises(ValueError, huffman.HuffmanDecoder, test_huffman[1], 0)
+
+    def test_huffman_decoder_parallel(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        encoder = huffman.HuffmanEncoder(test_huffman[1])
+        decoder = huffman.HuffmanDecoder(test_huffman[1], 5)
+        cover_text = encoder.encode(Bits(bytes=bytes(range(256)) * 4))
+        expected = list(decoder.decode_stream([cover_text]))
+        for workers in (1, 2):
+            decoded = list(decoder.decode_parallel(io.StringIO(cover_text), workers, partition_size=99,
+                                                   chunk_size=7))
+            self.assertEqual(Bits().join(expected), Bits().join(decoded))
+            self.assertTrue(all(len(bits) % 8 == 0 for bits in decoded[:-1]))
+        with self.assertWarns(UserWarning):
+            bits = Bits().join(decoder.decode_parallel(["st", "ega", "ysi", "s"], 1, partition_size=3))
+        self.assertEqual(huffman.encode_string_as_bits(test_huffman[1], "stegaysis ", 5), bits)
+
+    def test_huffman_chunked(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        encoder = huffman.HuffmanEncoder(test_huffman[1])
+        decoder = huffman.HuffmanDecoder(test_huffman[1], 5)
+        bits = Bits(bytes=bytes(range(256)) * 4) + Bits(bin="101")
+        cover_text = "".join(encoder.encode_chunked([bits], block_length=1000))
+        self.assertEqual(cover_text, "".join(encoder.encode_chunked([bits[:500], bits[500:]], 2, 1000)))
+        for workers in (1, 2):
+            decoded = decoder.decode_chunked(io.StringIO(cover_text), workers, chunk_size=7)
+            self.assertEqual(bits, Bits().join(decoded))
+        self.assertEqual("", "".join(encoder.encode_chunked([])))
+        self.assertRaises(ValueError, list, decoder.decode_chunked([cover_text[:-5]]))
+        self.assertRaises(ValueError, list, encoder.encode_chunked([bits], block_length=0))
+
+    def test_get_symbol_index(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        symbol_index = huffman.get_symbol_index(test_huffman[1])
+        self.assertEqual(10, len(symbol_index))
+        self.assertTupleEqual((0b0010, 4), symbol_index.get("alysi"))
+        self.assertTupleEqual((0b11100, 5), symbol_index.get("sis 0"))
+
+    def test_encode_string_as_bits_indexed(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        symbol_index = huffman.get_symbol_index(test_huffman[1])
+        cover_text = "stegaalysilysissis 0tegan" * 40
+        bits = huffman.encode_string_as_bits(test_huffman[1], cover_text, 5, symbol_index)
+        self.assertEqual(Bits(bin="0b0100101110111100000" * 40), bits)
+
+    def test_encode_string_as_bits_unknown_symbol(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        self.assertRaises(ValueError, huffman.encode_string_as_bits, test_huffman[1], "stegaxxxxx", 5)
+
     def test_has_given_symbol_length(self):
         test_huffman = huffman.create_tree(self.string_definitions)
         self.assertFalse(huffman.has_given_symbol_length(test_huffman, 4))
@@ -229,6 +375,141 @@ class TestHuffman(unittest.TestCase):
         huffman.allocate_path_bits(test_huffman)
         self.assertTrue(has_correct_bits(test_huffman, Bits()), "Huffman tree did not have correct bits for every node")
 
+    def test_canonical_codes(self):
+        codes = huffman.get_canonical_codes([("d", 3), ("a", 2), ("c", 3), ("b", 1)])
+        self.assertListEqual([("b", 0b0, 1), ("a", 0b10, 2), ("c", 0b110, 3), ("d", 0b111, 3)], codes)
+        self.assertRaises(huffman.HuffmanError, huffman.get_canonical_codes, [("a", 1), ("b", 1), ("c", 1)])
+
+    def test_allocate_canonical_path_bits(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        lengths = sorted((value[0], length) for value, length in huffman.get_code_lengths(test_huffman))
+
+        huffman.allocate_path_bits(test_huffman, canonical=True)
+        self.assertTrue(has_correct_leaves(test_huffman))
+        self.assertTrue(has_correct_bits(test_huffman, Bits()))
+        canonical_lengths = sorted((value[0], length) for value, length in huffman.get_code_lengths(test_huffman))
+        self.assertListEqual(lengths, canonical_lengths)
+        leaf_codes = sorted(huffman.get_leaf_codes(test_huffman[1]))
+        self.assertListEqual(sorted(huffman.get_canonical_codes(lengths)), leaf_codes)
+
+    def test_create_canonical_tree(self):
+        test_huffman = huffman.create_tree(self.string_definitions, canonical=True)
+        self.assertEqual(41, test_huffman[0])
+        self.assertTrue(has_correct_bits(test_huffman, Bits()))
+        symbol_index = huffman.get_symbol_index(test_huffman[1])
+        self.assertTupleEqual((0b00, 2), symbol_index.get("stega"))
+
+    def test_canonical_tree_round_trip(self):
+        test_huffman = huffman.create_tree(self.string_definitions, canonical=True)
+        serial_tree = json.loads(huffman.serialise_canonical_tree(test_huffman[1]))
+        _, tree = huffman.deserialise_canonical_tree(serial_tree.get(huffman.CANONICAL_TREE_KEY))
+        self.assertDictEqual(huffman.get_symbol_index(test_huffman[1]), huffman.get_symbol_index(tree))
+
+    def test_serialise_non_canonical_tree(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        self.assertRaises(huffman.HuffmanError, huffman.serialise_canonical_tree, test_huffman[1])
+
+    def test_limited_code_lengths(self):
+        symbols = [("a", 1), ("b", 1), ("c", 2), ("d", 4), ("e", 8), ("f", 16)]
+        code_lengths = dict((value[0], length) for value, length in huffman.get_limited_code_lengths(symbols, 3))
+        self.assertEqual({"a": 3, "b": 3, "c": 3, "d": 3, "e": 2, "f": 2}, code_lengths)
+        code_lengths = dict((value[0], length) for value, length in huffman.get_limited_code_lengths(symbols, 5))
+        self.assertEqual({"a": 5, "b": 5, "c": 4, "d": 3, "e": 2, "f": 1}, code_lengths)
+        self.assertEqual([(("a", 1), 0)], huffman.get_limited_code_lengths([("a", 1)], 1))
+        self.assertRaises(ValueError, huffman.get_limited_code_lengths, symbols, 2)
+        self.assertRaises(ValueError, huffman.get_limited_code_lengths, [], 2)
+
+    def test_limit_tree_depth(self):
+        symbols = set(("{:03}".format(i), 2 ** i) for i in range(40))
+        unconstrained = huffman.create_tree(symbols)
+        self.assertEqual(39, max(length for _, length in huffman.get_code_lengths(unconstrained)))
+        test_huffman = huffman.create_tree(symbols, max_code_length=8)
+        code_lengths = huffman.get_code_lengths(test_huffman)
+        self.assertEqual(8, max(length for _, length in code_lengths))
+        self.assertEqual(1, sum(2 ** -length for _, length in code_lengths))
+        self.assertEqual(symbols, set(value for value, _ in code_lengths))
+        self.assertEqual(unconstrained[0], test_huffman[0])
+        encoder = huffman.HuffmanEncoder(test_huffman[1])
+        self.assertEqual(8, encoder.lookup_bits)
+        bits = Bits(bytes=bytes(range(256)))
+        cover_text = encoder.encode(bits)
+        self.assertTrue(huffman.encode_string_as_bits(test_huffman[1], cover_text, 3).startswith(bits))
+
+        test_huffman = huffman.create_tree(self.string_definitions)
+        self.assertIs(test_huffman, huffman.limit_tree_depth(test_huffman, 10))
+
+    def test_binary_tree(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        mapped_tree = huffman.MappedHuffmanTree(huffman.serialise_binary_tree(test_huffman[1]))
+        self.assertEqual(len(self.string_definitions), mapped_tree.leaf_count)
+        self.assertEqual(huffman.get_leaf_codes(test_huffman[1]), huffman.get_leaf_codes(mapped_tree))
+        self.assertEqual(Bits(bin="0010"), huffman.search_tree_for_symbol(mapped_tree, "alysi"))
+        self.assertTrue(huffman.has_given_symbol_length((0, mapped_tree), 5))
+        self.assertEqual(huffman.get_tree_leaf_codes(test_huffman), huffman.get_tree_leaf_codes((0, mapped_tree)))
+        self.assertEqual([(x, 0, z) for x, y, z in huffman.tree_to_symbols(test_huffman)],
+                         huffman.tree_to_symbols((0, mapped_tree)))
+        self.assertEqual("steganalysegana", huffman.HuffmanEncoder(mapped_tree).encode(Bits(bin="010011101")))
+        self.assertEqual(Bits(bin="0b0100101110111100000"),
+                         huffman.encode_string_as_bits(mapped_tree, "stegaalysilysissis 0tegan", 5))
+        self.assertEqual(huffman.deserialise_tree(json.loads(json.dumps(test_huffman[1],
+                                                                        default=lambda o: o.__dict__()))),
+                         mapped_tree.to_tree())
+
+    def test_binary_tree_save_load(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        with tempfile.TemporaryDirectory() as directory:
+            tree_filename = os.path.join(directory, "tree.bin")
+            huffman.save_tree(test_huffman[1], tree_filename, huffman.TREE_FORMAT_BINARY)
+            loaded_tree = huffman.load_tree(tree_filename)
+            self.assertIsInstance(loaded_tree[1], huffman.MappedHuffmanTree)
+            self.assertEqual(huffman.get_leaf_codes(test_huffman[1]), huffman.get_leaf_codes(loaded_tree[1]))
+            loaded_tree[1].close()
+
+    def test_binary_tree_invalid(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        data = huffman.serialise_binary_tree(test_huffman[1])
+        self.assertRaises(huffman.HuffmanError, huffman.MappedHuffmanTree, b"JSON" + data[4:])
+        self.assertRaises(huffman.HuffmanError, huffman.MappedHuffmanTree, data[:-1])
+        self.assertRaises(huffman.HuffmanError, huffman.MappedHuffmanTree, data[:8])
+
+    def test_tree_equality(self):
+        test_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(test_huffman)
+        other_huffman = huffman.create_tree(self.string_definitions)
+        huffman.allocate_path_bits(other_huffman)
+        self.assertEqual(test_huffman[1], other_huffman[1])
+
+        node = other_huffman[1]
+        while node.right is not None:
+            node = node.right[1]
+        node.path_code = Bits(bin="0")
+        self.assertNotEqual(test_huffman[1], other_huffman[1])
+
+    def test_deep_tree(self):
+        # A completely skewed tree, far deeper than the recursion limit
+        depth = 1500
+        leaf_codes = [(("s" + str(i), 1), ((1 << i) - 1) << 1, i + 1) for i in range(depth - 1)]
+        leaf_codes.append((("last", 1), (1 << (depth - 1)) - 1, depth - 1))
+        test_huffman = huffman.tree_from_codes(leaf_codes)
+        self.assertEqual(depth, len(huffman.get_tree_leaf_codes(test_huffman)))
+        self.assertEqual(depth, len(huffman.tree_to_symbols(test_huffman)))
+        self.assertEqual(Bits(bin="1" * (depth - 1)), huffman.search_tree_for_symbol(test_huffman[1], "last"))
+
+        serial_tree = {"value": "last", "path_code": "1" * (depth - 1), "left": None, "right": None}
+        for i in range(depth - 2, -1, -1):
+            leaf = {"value": "s" + str(i), "path_code": "1" * i + "0", "left": None, "right": None}
+            serial_tree = {"value": None, "path_code": "1" * i or None, "left": leaf, "right": serial_tree}
+        _, tree = huffman.deserialise_tree(serial_tree)
+        self.assertDictEqual(huffman.get_symbol_index(test_huffman[1]), huffman.get_symbol_index(tree))
+
+        huffman.allocate_path_bits((0, tree))
+        self.assertEqual(test_huffman[1].right[1].right[1].left[1].path_code, tree.right[1].right[1].left[1].path_code)
+
     def test_load_tree(self):
         test_huffman = huffman.load_tree(TEST_TREE_FILE)[1]
         self.assertIsInstance(test_huffman, HuffmanTree)
@@ -1,3 +1,5 @@
+import pickle
+import random
 import unittest
 
 from stegano import markov
@@ -152,6 +154,58 @@ class TestMarkovChainTransitions(unittest.TestCase):
         self.markov_chain.transition()
         self.assertEqual("s0", self.markov_chain.current_state)
 
+    def test_compile(self):
+        self.markov_chain.set_transitions(self.transitions)
+        compiled = self.markov_chain.compile()
+        self.assertIs(compiled, self.markov_chain.compile())
+        self.assertListEqual(["s0", "s1", "s2", "s3", "s4"], compiled.states)
+        self.assertEqual(markov.START_STATE_ID, compiled.state_ids.get("s0"))
+        self.assertIsNone(compiled.get_word_type(markov.START_STATE_ID))
+        self.assertEqual("dict", compiled.get_word_type(compiled.state_ids.get("s4")))
+
+        start, end = compiled.offsets[0], compiled.offsets[1]
+        self.assertListEqual([1, 2], list(compiled.targets[start:end]))
+        self.assertListEqual([2, 5], list(compiled.accumulated[start:end]))
+
+        state = compiled.transition(markov.START_STATE_ID)
+        self.assertIn(compiled.states[state], {"s1", "s2"})
+        state = compiled.transition(state)
+        self.assertIn(compiled.states[state], {"s3", "s4"})
+        self.assertEqual(markov.START_STATE_ID, compiled.transition(state))
+
+    def test_pickle(self):
+        self.markov_chain.set_transitions(self.transitions)
+        self.markov_chain.compile()
+        markov_chain = pickle.loads(pickle.dumps(self.markov_chain))
+        self.assertDictEqual(self.markov_chain.__dict__(), markov_chain.__dict__())
+        self.assertSetEqual(self.markov_chain.states, markov_chain.states)
+        self.assertListEqual(self.markov_chain.compile().states, markov_chain.compile().states)
+
+    def test_compile_invalidated(self):
+        self.markov_chain.set_transitions(self.transitions)
+        compiled = self.markov_chain.compile()
+        self.markov_chain.set_transitions({("s0", "s2", 1), ("s2", "s0", 1)})
+        self.assertIsNot(compiled, self.markov_chain.compile())
+
+    def test_compile_no_transitions(self):
+        self.markov_chain = MarkovChain(self.states.union({"s5"}))
+        self.markov_chain.set_transitions(self.transitions)
+        compiled = self.markov_chain.compile()
+        self.assertRaises(MarkovError, compiled.transition, compiled.state_ids.get("s5"))
+
+    def test_chain_walker(self):
+        self.markov_chain.set_transitions(self.transitions)
+        walker = markov.ChainWalker(self.markov_chain, seed=1)
+        self.assertIs(self.markov_chain.compile(), walker.chain)
+        self.assertEqual("s0", walker.current_state)
+        walk = [walker.transition() for _ in range(20)]
+        self.assertEqual("s0", self.markov_chain.current_state)
+
+        other_walker = markov.ChainWalker(self.markov_chain.compile(), random.Random(1))
+        self.assertListEqual(walk, [other_walker.transition() for _ in range(20)])
+        other_walker.state = other_walker.chain.state_ids.get("s4")
+        self.assertEqual("dict", other_walker.get_current_word_type())
+
     def test_find_2_cycle(self):
         self.transitions.add(("s4", "s2", 1))
         self.assertRaises(MarkovError, self.markov_chain.set_transitions, self.transitions)
@@ -162,6 +216,28 @@ class TestMarkovChainTransitions(unittest.TestCase):
         self.transitions.add(("s3", "s1", 1))
         self.assertRaises(MarkovError, self.markov_chain.set_transitions, self.transitions)
 
+    def test_find_cycle_message(self):
+        self.transitions.add(("s4", "s2", 1))
+        with self.assertRaises(MarkovError) as context:
+            self.markov_chain.set_transitions(self.transitions)
+        self.assertEqual("Found a loop at transition s2 to s4", str(context.exception))
+
+    def test_find_unreachable_states(self):
+        self.markov_chain.set_transitions(self.transitions)
+        self.assertSetEqual(set(), self.markov_chain.unreachable_states)
+
+        self.markov_chain = MarkovChain(self.states.union({"s5", "s6"}))
+        self.transitions.add(("s5", "s6", 1))
+        self.transitions.add(("s6", "s0", 1))
+        self.markov_chain.set_transitions(self.transitions)
+        self.assertSetEqual({"s5", "s6"}, self.markov_chain.unreachable_states)
+        self.assertSetEqual({"s1", "s2", "s3", "s4"}, self.markov_chain.find_cycles("s5"))
+
+    def test_find_state_without_transitions(self):
+        self.markov_chain = MarkovChain(self.states.union({"s5"}))
+        self.transitions.add(("s4", "s5", 1))
+        self.assertRaises(MarkovError, self.markov_chain.set_transitions, self.transitions)
+
     def test_ignore_non_cycle(self):
         self.transitions.add(("s1", "s2", 1))
         self.markov_chain.set_transitions(self.transitions)
@@ -180,6 +256,53 @@ class TestMarkovChainTransitions(unittest.TestCase):
         no_of_paths = markov.get_number_of_paths(self.markov_chain)
         self.assertEqual(6, no_of_paths)
 
+    def test_get_number_of_paths_counts(self):
+        self.markov_chain.set_transitions(self.transitions)
+        path_counts = {}
+        self.assertEqual(3, markov.get_number_of_paths(self.markov_chain, path_counts=path_counts))
+        self.assertDictEqual({"s0": 3, "s1": 2, "s2": 1, "s3": 1, "s4": 1}, path_counts)
+        self.assertEqual(2, markov.get_number_of_paths(self.markov_chain, "s1"))
+
+    def test_get_number_of_paths_deep(self):
+        # a ladder of pairs of states, each leading to both of the next pair
+        depth = 2000
+        states = {"a{}".format(i) for i in range(depth)}.union({"b{}".format(i) for i in range(depth)})
+        transitions = {("s0", "a0", 1), ("s0", "b0", 1), ("a{}".format(depth - 1), "s0", 1),
+                       ("b{}".format(depth - 1), "s0", 1)}
+        for i in range(depth - 1):
+            for x in "ab":
+                transitions.add(("{}{}".format(x, i), "a{}".format(i + 1), 1))
+                transitions.add(("{}{}".format(x, i), "b{}".format(i + 1), 1))
+        self.markov_chain = MarkovChain(states)
+        self.markov_chain.set_transitions(transitions)
+        self.assertEqual(2 ** depth, markov.get_number_of_paths(self.markov_chain))
+        self.assertAlmostEqual(depth, markov.get_expected_total(self.markov_chain, lambda state: 1))
+
+    def test_get_expected_total(self):
+        self.markov_chain.set_transitions(self.transitions)
+        # s0 > s1 (0.4) > s3 or s4; s0 > s2 (0.6) > s4
+        self.assertAlmostEqual(2, markov.get_expected_total(self.markov_chain, lambda state: 1))
+        values = {"s1": 1, "s2": 2, "s3": 4, "s4": 8}
+        expected_totals = {}
+        self.assertAlmostEqual(0.4 * (1 + 6) + 0.6 * (2 + 8),
+                               markov.get_expected_total(self.markov_chain, values.get,
+                                                         expected_totals=expected_totals))
+        self.assertAlmostEqual(6, expected_totals.get("s1"))
+        self.assertAlmostEqual(0, expected_totals.get("s4"))
+
+    def test_get_expected_totals(self):
+        self.markov_chain.set_transitions(self.transitions)
+        values = {"s1": 1, "s2": 2, "s3": 4, "s4": 8}
+        expected_totals = {}
+        totals = markov.get_expected_totals(self.markov_chain, (lambda state: 1, values.get),
+                                            expected_totals=expected_totals)
+        self.assertEqual(2, len(totals))
+        self.assertAlmostEqual(2, totals[0])
+        self.assertAlmostEqual(0.4 * (1 + 6) + 0.6 * (2 + 8), totals[1])
+        self.assertEqual(2, len(expected_totals.get("s1")))
+        self.assertAlmostEqual(6, expected_totals.get("s1")[1])
+        self.assertEqual((0.0, 0.0), expected_totals.get("s4"))
+
     @unittest.skip
     def test_save(self):
         self.markov_chain.set_transitions(self.transitions)
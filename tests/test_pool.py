@@ -0,0 +1,21 @@
+import unittest
+
+from stegano import pool
+
+
+class TestMapInOrder(unittest.TestCase):
+    def test_map_in_order(self):
+        arguments = [(exponent,) for exponent in range(20)]
+        expected = [pow(3, exponent) for exponent in range(20)]
+        for workers in (1, 2):
+            self.assertEqual(expected, list(pool.map_in_order(pow, iter(arguments), (3,), workers)))
+        self.assertEqual([], list(pool.map_in_order(pow, [], (3,), 2)))
+
+    def test_resolve_workers(self):
+        self.assertEqual(3, pool.resolve_workers(3))
+        self.assertGreaterEqual(pool.resolve_workers(None), 1)
+        self.assertRaises(ValueError, pool.resolve_workers, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,11 @@
+import os
+import pickle
+import sys
+import tempfile
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
 from bitstring import Bits
 
@@ -50,6 +57,34 @@ class TestMappingDictionary(unittest.TestCase):
         self.assertIsInstance(mappings, dict)
         self.assertEqual(0, len(mappings))
 
+    def test_expected_statistics(self):
+        mapping_dict = MappingDictionary({("a", Bits(bin="0")), ("bc", Bits(bin="10")), ("def", Bits(bin="11"))})
+        expected_bits, expected_chars = mapping_dict.get_expected_statistics()
+        self.assertAlmostEqual(1.5, expected_bits)
+        self.assertAlmostEqual(0.5 * 2 + 0.25 * 3 + 0.25 * 4, expected_chars)
+        mapping_dict.encode_spaces = False
+        self.assertAlmostEqual(0.5 + 0.25 * 2 + 0.25 * 3, mapping_dict.get_expected_statistics()[1])
+
+    def test_encoding_index(self):
+        index = self.mapping_dict.get_encoding_index()
+        self.assertEqual({(2, 0): "penguin", (2, 1): "tiger", (2, 3): "giraffe"}, index.words)
+        self.assertEqual([2], index.lengths)
+        self.assertEqual(2, index.longest)
+        self.assertIs(index, self.mapping_dict.get_encoding_index())
+
+    def test_encoding_index_invalidated(self):
+        index = self.mapping_dict.get_encoding_index()
+        self.mapping_dict.mappings["ossifrage"] = Bits(bin="100")
+        index = self.mapping_dict.get_encoding_index()
+        self.assertEqual("ossifrage", index.words.get((3, 4)))
+        self.assertEqual([3, 2], index.lengths)
+        del self.mapping_dict.mappings["tiger"]
+        self.assertIsNone(self.mapping_dict.get_encoding_index().words.get((2, 1)))
+        self.mapping_dict.mappings.update({"tiger": Bits(bin="101")})
+        self.assertEqual("tiger", self.mapping_dict.get_encoding_index().words.get((3, 5)))
+        self.mapping_dict.mappings = {"cat": Bits(bin="0")}
+        self.assertEqual({(1, 0): "cat"}, self.mapping_dict.get_encoding_index().words)
+
 
 class TestWordTypeDictionary(unittest.TestCase):
     def setUp(self):
@@ -235,6 +270,74 @@ class TestWordTypeDictionary(unittest.TestCase):
         self.wt_dict.remove_word_type(remove_set)
         self.assertIsNone(self.wt_dict.wt_dict)
 
+    def test_word_automaton(self):
+        automaton = self.wt_dict.get_word_automaton()
+        self.assertEqual(7, automaton.longest)
+        self.assertEqual(("pencil", "stationery", Bits(bin="01")), automaton.match("Pencil paper"))
+        self.assertEqual(("pen", "stationery", Bits(bin="00")), automaton.match("the pen", 4))
+        self.assertEqual(("pen", "stationery", Bits(bin="00")), automaton.match("pencil", 0, 5))
+        self.assertIsNone(automaton.match("pe ncil"))
+        self.assertIsNone(automaton.match("tig"))
+        self.assertIs(automaton, self.wt_dict.get_word_automaton())
+
+    def test_word_automaton_invalidated(self):
+        automaton = self.wt_dict.get_word_automaton()
+        self.wt_dict.wt_dict.get("animals").mappings["tigers"] = Bits(bin="10")
+        self.assertIsNot(automaton, self.wt_dict.get_word_automaton())
+        self.assertEqual(("tigers", "animals", Bits(bin="10")), self.wt_dict.get_word_automaton().match("tigers"))
+        self.wt_dict.remove_word_type({"animals"})
+        self.assertIsNone(self.wt_dict.get_word_automaton().match("tigers"))
+
+    def test_word_index(self):
+        self.assertEqual(7, self.wt_dict.get_longest_word_length())
+        self.assertSetEqual({("pen", "stationery")}, self.wt_dict.contains_any_words_from_set(
+            {("pen", Bits(bin="10")), ("ink", Bits(bin="11"))}))
+        self.assertSetEqual(set(), self.wt_dict.contains_any_words_from_set({("pen", Bits(bin="10"))}, "stationery"))
+        self.wt_dict.remove_word({"penguin", "giraffe"})
+        self.assertEqual(6, self.wt_dict.get_longest_word_length())
+        self.wt_dict.append_word_type({"tools": MappingDictionary({("screwdriver", Bits(bin="0"))})})
+        self.assertEqual(11, self.wt_dict.get_longest_word_length())
+        self.wt_dict.remove_word_type({"tools", "animals", "stationery"})
+        self.assertEqual(0, self.wt_dict.get_longest_word_length())
+
+    def test_word_index_invalidated(self):
+        self.wt_dict.get_longest_word_length()
+        self.wt_dict.wt_dict.get("animals").mappings["rhinoceros"] = Bits(bin="10")
+        self.assertEqual(10, self.wt_dict.get_longest_word_length())
+        self.assertSetEqual({("rhinoceros", "animals")},
+                            self.wt_dict.contains_any_words_from_set({("rhinoceros", Bits(bin="0"))}))
+        self.wt_dict.remove_word({"rhinoceros"})
+        self.assertNotIn("rhinoceros", self.wt_dict.wt_dict.get("animals").mappings)
+        self.assertEqual(7, self.wt_dict.get_longest_word_length())
+
+    def test_word_index_threads(self):
+        words = {("w" * (1 + index % 40) + str(index), Bits(uint=index, length=12)) for index in range(4000)}
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for _ in range(5):
+                wt_dict = WordTypeDictionary({"words": MappingDictionary(words)})
+                barrier = threading.Barrier(8)
+
+                def get_length():
+                    barrier.wait()
+                    return wt_dict.get_longest_word_length()
+
+                with ThreadPoolExecutor(8) as executor:
+                    futures = [executor.submit(get_length) for _ in range(8)]
+                    self.assertEqual([44] * 8, [future.result() for future in futures])
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+    def test_pickle(self):
+        self.wt_dict.get_word_automaton()
+        wt_dict = pickle.loads(pickle.dumps(self.wt_dict))
+        self.assertDictEqual(self.wt_dict.__dict__(), wt_dict.__dict__())
+        self.assertFalse(wt_dict.wt_dict.get("stationery").encode_spaces)
+        self.assertEqual(7, wt_dict.get_longest_word_length())
+        wt_dict.wt_dict.get("animals").mappings["rhinoceros"] = Bits(bin="10")
+        self.assertEqual(10, wt_dict.get_longest_word_length())
+
     def test_generate_state_definitions(self):
         state_definitions = self.wt_dict.generate_state_definitions()
         self.assertIsInstance(state_definitions, list)
@@ -285,6 +388,62 @@ class TestWTDict(unittest.TestCase):
         self.assertIsInstance(wt_dict.wt_dict, dict)
         self.assertDictEqual({}, wt_dict.wt_dict)
 
+    def test_binary_dict(self):
+        wt_dict = WordTypeDictionary(wtdict.deserialise_dict({
+            "animals": {"encode_spaces": True, "mappings": {"penguin": "00", "tiger": "01", "giraffe": "1"}},
+            "stationery": {"encode_spaces": False, "mappings": {"pen": "0", "pâpier": "10", "": ""}}
+        }))
+        mapped_dict = wtdict.MappedWordTypeDictionary(wtdict.serialise_binary_dict(wt_dict))
+        self.assertListEqual(["animals", "stationery"], mapped_dict.word_types)
+        self.assertIsNone(mapped_dict.get_mapping_dict("verbs"))
+        stationery = mapped_dict.get_mapping_dict("stationery")
+        self.assertFalse(stationery.encode_spaces)
+        self.assertDictEqual(wt_dict.wt_dict.get("stationery").mappings, stationery.mappings)
+        self.assertDictEqual(wt_dict.__dict__(), WordTypeDictionary(mapped_dict.to_wt_dict()).__dict__())
+        self.assertListEqual(["stationery"], list(mapped_dict.to_wt_dict({"stationery", "verbs"}).keys()))
+
+    def test_binary_dict_save_load(self):
+        wt_dict = WordTypeDictionary(wtdict.deserialise_dict({
+            "animals": {"encode_spaces": True, "mappings": {"penguin": "00", "tiger": "01", "giraffe": "11"}},
+            "stationery": {"encode_spaces": False, "mappings": {"pen": "00", "paper": "11"}}
+        }))
+        with tempfile.TemporaryDirectory() as directory:
+            dict_filename = os.path.join(directory, "dict.bin")
+            wtdict.save_dict(wt_dict, dict_filename, wtdict.DICT_FORMAT_BINARY)
+            self.assertEqual(wtdict.DICT_FORMAT_BINARY, wtdict.get_dict_format(dict_filename))
+            self.assertDictEqual(wt_dict.__dict__(), wtdict.load_dict(dict_filename).__dict__())
+            loaded_dict = wtdict.load_dict(dict_filename, ["animals"])
+            self.assertListEqual(["animals"], list(loaded_dict.wt_dict.keys()))
+
+            wtdict.save_dict(WordTypeDictionary({}), dict_filename, wtdict.DICT_FORMAT_BINARY)
+            self.assertDictEqual({}, wtdict.load_dict(dict_filename).wt_dict)
+
+    def test_binary_dict_invalid(self):
+        wt_dict = WordTypeDictionary(wtdict.deserialise_dict({
+            "animals": {"encode_spaces": True, "mappings": {"penguin": "00", "tiger": "01"}}
+        }))
+        data = wtdict.serialise_binary_dict(wt_dict)
+        self.assertRaises(ValueError, wtdict.MappedWordTypeDictionary, b"JSON" + data[4:])
+        self.assertRaises(ValueError, wtdict.MappedWordTypeDictionary, data[:12])
+        self.assertRaises(ValueError, wtdict.MappedWordTypeDictionary(data[:-1]).get_mapping_dict, "animals")
+        wt_dict.wt_dict.get("animals").mappings["lion"] = Bits(uint=1, length=65)
+        self.assertRaises(ValueError, wtdict.serialise_binary_dict, wt_dict)
+        self.assertRaises(ValueError, wtdict.save_dict, wt_dict, "dict.xml", "xml")
+
+    def test_binary_dict_load_invalid_closed(self):
+        wt_dict = WordTypeDictionary(wtdict.deserialise_dict({
+            "animals": {"encode_spaces": True, "mappings": {"penguin": "00", "tiger": "01"}}
+        }))
+        with tempfile.TemporaryDirectory() as directory:
+            dict_filename = os.path.join(directory, "dict.bin")
+            with open(dict_filename, "wb") as handle:
+                handle.write(wtdict.serialise_binary_dict(wt_dict)[:-1])
+            close = wtdict.MappedWordTypeDictionary.close
+            with mock.patch.object(wtdict.MappedWordTypeDictionary, "close", autospec=True,
+                                   side_effect=close) as mock_close:
+                self.assertRaises(ValueError, wtdict.load_dict, dict_filename)
+            mock_close.assert_called_once()
+
 
 if __name__ == '__main__':
     unittest.main()